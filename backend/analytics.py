@@ -0,0 +1,210 @@
+"""Indicadores de estoque: giro, consumo médio e dias de cobertura.
+
+Os agregados saem de `movimentacoes_diarias` (uma linha por produto e dia), e
+não do livro de movimentações: o custo de uma consulta depende do número de
+dias × produtos do período, não do tamanho do histórico. A tabela é mantida
+incrementalmente (ver `rollup.py`); as consultas só leem (pool somente
+leitura) e, se ela estiver atrasada (inserções feitas direto no banco),
+respondem com `X-Diarias-Pendentes` enquanto a atualização roda em segundo
+plano.
+
+Rotas:
+- GET /api/v1/analytics/consumo   (?desde=&ate=&por=produto|categoria|fornecedor)
+- GET /api/v1/analytics/serie     (?desde=&ate=&intervalo=dia|semana e filtros
+                                   produto_id/categoria/fornecedor)
+
+Sem datas, o período é dos últimos 30 dias. `consumo` traz até `limit` grupos
+(os de maior saída) e `truncado: true` quando há mais.
+"""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Any
+
+from flask import Flask, request
+
+import db
+from api import json_response, parse_limit
+from archive import intervalo_datas
+from rollup import atualizador_do_app, avisar_pendentes
+
+JANELA_PADRAO_DIAS = 30
+
+AGRUPAMENTOS = {
+    "produto": "p.id",
+    "categoria": "p.categoria",
+    "fornecedor": "p.fornecedor",
+}
+INTERVALOS = {
+    "dia": "d.dia",
+    # Segunda-feira da semana.
+    "semana": "date(d.dia, 'weekday 0', '-6 days')",
+}
+
+
+def _janela(desde: str | None, ate: str | None) -> tuple[str, str, int] | None:
+    """(desde, ate exclusivo, dias) do período pedido, ou None se inválido."""
+
+    intervalo = intervalo_datas(desde, ate)
+    if intervalo is None:
+        return None
+    fim = intervalo[1] or (date.today() + timedelta(days=1)).isoformat()
+    inicio = (
+        intervalo[0]
+        or (date.fromisoformat(fim) - timedelta(days=JANELA_PADRAO_DIAS)).isoformat()
+    )
+    dias = (date.fromisoformat(fim) - date.fromisoformat(inicio)).days
+    if dias <= 0:
+        return None
+    return inicio, fim, dias
+
+
+def indicadores(
+    entradas: int, saidas: int, quantidade: int, dias: int
+) -> dict[str, Any]:
+    consumo = saidas / dias
+    return {
+        "entradas": entradas,
+        "saidas": saidas,
+        "quantidade_atual": quantidade,
+        "consumo_medio_diario": round(consumo, 4),
+        "dias_cobertura": round(quantidade / consumo, 1) if consumo else None,
+        # Giro do período usando o estoque atual como estoque médio.
+        "giro": round(saidas / quantidade, 4) if quantidade else None,
+    }
+
+
+def register_analytics_routes(app: Flask, *, db_path: str) -> None:
+    def erro(msg: str, status: int = 400):
+        return json_response({"erro": msg}, status=status)
+
+    atualizador = atualizador_do_app(app, db_path)
+
+    def consultar(sql: str, params: tuple) -> tuple[list[tuple[Any, ...]], int]:
+        """(linhas, movimentações ainda não somadas nos totais diários)."""
+
+        faltam = atualizador.verificar()
+        return db.query_rows(db_path, sql, params)[1], faltam
+
+    @app.get("/api/v1/analytics/consumo")
+    def analytics_consumo():
+        janela = _janela(request.args.get("desde"), request.args.get("ate"))
+        if janela is None:
+            return erro("Período inválido (use AAAA-MM-DD, desde < ate).")
+        por = request.args.get("por") or "produto"
+        if por not in AGRUPAMENTOS:
+            return erro("por deve ser produto, categoria ou fornecedor.")
+        inicio, fim, dias = janela
+        limit = parse_limit(request.args.get("limit"))
+
+        chave = AGRUPAMENTOS[por]
+        if por == "produto":
+            colunas = ["p.id", "p.sku", "p.nome", "p.categoria", "p.fornecedor"]
+        else:
+            colunas = [chave, "COUNT(p.id)"]
+        # Saídas somadas por produto antes do JOIN, para não multiplicar o
+        # estoque pelas linhas diárias.
+        rows, faltam = consultar(
+            f"""
+            SELECT {", ".join(colunas)},
+                   SUM(p.quantidade_atual),
+                   COALESCE(SUM(d.entradas), 0),
+                   COALESCE(SUM(d.saidas), 0)
+            FROM produtos p
+            LEFT JOIN (
+                SELECT produto_id,
+                       SUM(total_entrada) AS entradas,
+                       SUM(total_saida) AS saidas
+                FROM movimentacoes_diarias
+                WHERE dia >= ? AND dia < ?
+                GROUP BY produto_id
+            ) d ON d.produto_id = p.id
+            GROUP BY {chave}
+            ORDER BY {len(colunas) + 3} DESC
+            LIMIT ?
+            """,
+            (inicio, fim, limit + 1),
+        )
+        truncado = len(rows) > limit
+
+        itens = []
+        for r in rows[:limit]:
+            *ident, quantidade, entradas, saidas = r
+            if por == "produto":
+                item = dict(
+                    zip(("id", "sku", "nome", "categoria", "fornecedor"), ident)
+                )
+            else:
+                item = {por: ident[0], "produtos": ident[1]}
+            item.update(indicadores(entradas, saidas, quantidade or 0, dias))
+            itens.append(item)
+        return avisar_pendentes(
+            json_response(
+                {
+                    "desde": inicio,
+                    "ate": fim,
+                    "dias": dias,
+                    "por": por,
+                    "itens": itens,
+                    "truncado": truncado,
+                }
+            ),
+            faltam,
+        )
+
+    @app.get("/api/v1/analytics/serie")
+    def analytics_serie():
+        janela = _janela(request.args.get("desde"), request.args.get("ate"))
+        if janela is None:
+            return erro("Período inválido (use AAAA-MM-DD, desde < ate).")
+        intervalo = request.args.get("intervalo") or "dia"
+        if intervalo not in INTERVALOS:
+            return erro("intervalo deve ser dia ou semana.")
+        inicio, fim, _ = janela
+
+        where = ["d.dia >= ?", "d.dia < ?"]
+        params: list[Any] = [inicio, fim]
+        join = ""
+        produto_id = request.args.get("produto_id") or ""
+        if produto_id.isdigit():
+            where.append("d.produto_id = ?")
+            params.append(int(produto_id))
+        for campo in ("categoria", "fornecedor"):
+            valor = request.args.get(campo)
+            if valor:
+                join = "JOIN produtos p ON p.id = d.produto_id"
+                where.append(f"p.{campo} = ?")
+                params.append(valor)
+
+        balde = INTERVALOS[intervalo]
+        rows, faltam = consultar(
+            f"""
+            SELECT {balde} AS periodo, SUM(d.total_entrada), SUM(d.total_saida),
+                   SUM(d.movimentos)
+            FROM movimentacoes_diarias d {join}
+            WHERE {" AND ".join(where)}
+            GROUP BY periodo
+            ORDER BY periodo
+            """,
+            tuple(params),
+        )
+        return avisar_pendentes(
+            json_response(
+                {
+                    "desde": inicio,
+                    "ate": fim,
+                    "intervalo": intervalo,
+                    "itens": [
+                        {
+                            "periodo": periodo,
+                            "entradas": entradas,
+                            "saidas": saidas,
+                            "movimentos": movimentos,
+                        }
+                        for periodo, entradas, saidas, movimentos in rows
+                    ],
+                }
+            ),
+            faltam,
+        )
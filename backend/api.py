@@ -0,0 +1,271 @@
+"""API JSON versionada (v1).
+
+Pensada para integrações (coletores, sincronização com ERP) que só precisam dos
+dados: reaproveita o SQL e a validação da UI, mas devolve JSON compacto em vez
+de HTML.
+
+Rotas:
+- GET  /api/v1/produtos            (filtros q/categoria/fornecedor)
+- POST /api/v1/produtos
+- GET  /api/v1/produtos/<id>
+- GET  /api/v1/movimentacoes       (filtros produto_id, desde/ate)
+- POST /api/v1/movimentacoes
+
+Listagens são paginadas por cursor (`limit` + `cursor`, devolvido em
+`proximo`) e aceitam `fields=a,b,c` para limitar as colunas retornadas.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import sqlite3
+from collections.abc import Sequence
+from typing import Any
+
+from flask import Flask, Response, request
+
+import db
+from archive import fonte_movimentacoes, intervalo_datas
+from events import barramento
+from movements_ui import registrar_movimentacao
+from products_ui import (
+    INSERT_PRODUTO_SQL,
+    PRODUTO_CAMPOS,
+    filtros_produtos,
+    parse_float,
+    validar_produto,
+)
+
+MOVIMENTACAO_CAMPOS = (
+    "id",
+    "produto_id",
+    "tipo",
+    "quantidade",
+    "observacao",
+    "criado_em",
+)
+
+PRODUTO_INTEIROS = ("quantidade_atual", "estoque_minimo")
+PRODUTO_DECIMAIS = ("custo", "preco")
+
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+
+
+def json_response(payload: Any, status: int = 200) -> Response:
+    """Serializa sem ordenar chaves nem indentar (caminho rápido do jsonify)."""
+
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return Response(data, status=status, mimetype="application/json")
+
+
+def selecionar_campos(raw: str | None, permitidos: Sequence[str]) -> list[str] | None:
+    """Interpreta `fields=` contra a whitelist. Retorna None se houver campo inválido.
+
+    O `id` é sempre incluído, pois é ele que alimenta o cursor de paginação.
+    """
+
+    if not raw:
+        return list(permitidos)
+    campos = ["id"]
+    for campo in raw.split(","):
+        campo = campo.strip()
+        if not campo or campo in campos:
+            continue
+        if campo not in permitidos:
+            return None
+        campos.append(campo)
+    return campos
+
+
+def e_inteiro(valor: Any) -> bool:
+    # bool é subclasse de int, mas `true` não é uma quantidade.
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+def e_numero(valor: Any) -> bool:
+    return e_inteiro(valor) or (isinstance(valor, float) and math.isfinite(valor))
+
+
+def validar_tipos_produto(body: dict[str, Any]) -> str | None:
+    """Rejeita campos numéricos que não são números (ou texto decimal válido).
+
+    O formulário HTML trata valor ilegível como 0; numa integração isso
+    gravaria estoque errado em silêncio, então aqui é erro 400.
+    """
+
+    for campo in PRODUTO_INTEIROS:
+        valor = body.get(campo)
+        if valor is not None and not e_inteiro(valor):
+            return f"{campo} deve ser um inteiro."
+    for campo in PRODUTO_DECIMAIS:
+        valor = body.get(campo)
+        # Texto com vírgula decimal ("2,50") continua aceito, como no formulário.
+        if isinstance(valor, str):
+            valor = parse_float(valor, math.nan)
+        if valor is not None and not e_numero(valor):
+            return f"{campo} deve ser um número."
+    return None
+
+
+def parse_limit(raw: str | None) -> int:
+    if raw is None or not raw.isdigit():
+        return LIMITE_PADRAO
+    return max(1, min(int(raw), LIMITE_MAXIMO))
+
+
+def register_api_routes(app: Flask, *, db_path: str) -> None:
+    def query_rows(
+        sql: str, params: tuple = ()
+    ) -> tuple[list[str], list[tuple[Any, ...]]]:
+        # Sem sqlite3.Row: tuplas + nomes de coluna saem mais baratas para
+        # serializar em lote.
+        return db.query_rows(db_path, sql, params)
+
+    def as_dicts(cols: list[str], rows: list[tuple[Any, ...]]) -> list[dict[str, Any]]:
+        return [dict(zip(cols, r)) for r in rows]
+
+    def page(
+        cols: list[str], rows: list[tuple[Any, ...]], limit: int
+    ) -> dict[str, Any]:
+        # Buscamos limit+1 linhas para saber se há próxima página sem COUNT(*).
+        proximo = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            proximo = rows[-1][cols.index("id")]
+        return {"itens": as_dicts(cols, rows), "proximo": proximo}
+
+    def erro(msg: str, status: int = 400) -> Response:
+        return json_response({"erro": msg}, status=status)
+
+    @app.get("/api/v1/produtos")
+    def api_produtos_list():
+        campos = selecionar_campos(request.args.get("fields"), PRODUTO_CAMPOS)
+        if campos is None:
+            return erro("Campo inválido em fields.")
+        limit = parse_limit(request.args.get("limit"))
+        cursor = request.args.get("cursor") or ""
+
+        where, params = filtros_produtos(
+            (request.args.get("q") or "").strip(),
+            (request.args.get("categoria") or "").strip(),
+            (request.args.get("fornecedor") or "").strip(),
+        )
+        args: list[Any] = list(params)
+        if cursor.isdigit():
+            where += (" AND " if where else " WHERE ") + "id > ?"
+            args.append(int(cursor))
+        args.append(limit + 1)
+
+        # Ordenação por id (não por nome) para paginação por cursor estável e
+        # barata via chave primária.
+        cols, rows = query_rows(
+            f"SELECT {', '.join(campos)} FROM produtos{where} ORDER BY id LIMIT ?",
+            tuple(args),
+        )
+        return json_response(page(cols, rows, limit))
+
+    @app.get("/api/v1/produtos/<int:produto_id>")
+    def api_produtos_detail(produto_id: int):
+        campos = selecionar_campos(request.args.get("fields"), PRODUTO_CAMPOS)
+        if campos is None:
+            return erro("Campo inválido em fields.")
+        cols, rows = query_rows(
+            f"SELECT {', '.join(campos)} FROM produtos WHERE id=?", (produto_id,)
+        )
+        if not rows:
+            return erro("Produto não encontrado.", 404)
+        return json_response(as_dicts(cols, rows)[0])
+
+    @app.post("/api/v1/produtos")
+    def api_produtos_create():
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return erro("Corpo JSON inválido.")
+
+        msg = validar_tipos_produto(body)
+        if msg:
+            return erro(msg)
+        # validar_produto espera strings, como no formulário HTML.
+        dados = {k: None if v is None else str(v) for k, v in body.items()}
+        valores, msg = validar_produto(dados)
+        if msg:
+            return erro(msg)
+
+        try:
+            produto_id = db.execute(db_path, INSERT_PRODUTO_SQL, valores)
+        except sqlite3.IntegrityError:
+            return erro("SKU já existe. Use um SKU diferente.", 409)
+        barramento.publicar(
+            "produto", acao="criado", produto_id=produto_id, categoria=valores[2]
+        )
+
+        cols, rows = query_rows(
+            f"SELECT {', '.join(PRODUTO_CAMPOS)} FROM produtos WHERE id=?",
+            (produto_id,),
+        )
+        return json_response(as_dicts(cols, rows)[0], status=201)
+
+    @app.get("/api/v1/movimentacoes")
+    def api_movimentacoes_list():
+        campos = selecionar_campos(request.args.get("fields"), MOVIMENTACAO_CAMPOS)
+        if campos is None:
+            return erro("Campo inválido em fields.")
+        limit = parse_limit(request.args.get("limit"))
+        cursor = request.args.get("cursor") or ""
+        produto_id = request.args.get("produto_id") or ""
+        intervalo = intervalo_datas(request.args.get("desde"), request.args.get("ate"))
+        if intervalo is None:
+            return erro("Datas inválidas (use AAAA-MM-DD).")
+        desde, ate = intervalo
+
+        where = []
+        args: list[Any] = []
+        if produto_id.isdigit():
+            where.append("produto_id = ?")
+            args.append(int(produto_id))
+        if desde:
+            where.append("criado_em >= ?")
+            args.append(desde)
+        if ate:
+            where.append("criado_em < ?")
+            args.append(ate)
+        if cursor.isdigit():
+            where.append("id < ?")
+            args.append(int(cursor))
+        args.append(limit + 1)
+
+        with db.leitura(db_path) as conn:
+            fonte = fonte_movimentacoes(conn, desde=desde, ate=ate)
+        sql = f"SELECT {', '.join(campos)} FROM {fonte}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        # Mais recentes primeiro, como no histórico HTML.
+        sql += " ORDER BY id DESC LIMIT ?"
+
+        cols, rows = query_rows(sql, tuple(args))
+        return json_response(page(cols, rows, limit))
+
+    @app.post("/api/v1/movimentacoes")
+    def api_movimentacoes_create():
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return erro("Corpo JSON inválido.")
+
+        produto_id = body.get("produto_id")
+        quantidade = body.get("quantidade")
+        if not e_inteiro(produto_id) or not e_inteiro(quantidade):
+            return erro("produto_id e quantidade devem ser inteiros.")
+        observacao = (str(body.get("observacao") or "")).strip() or None
+
+        ok, msg = registrar_movimentacao(
+            db_path,
+            produto_id=produto_id,
+            tipo=str(body.get("tipo") or "").strip(),
+            quantidade=quantidade,
+            observacao=observacao,
+        )
+        if not ok:
+            return erro(msg)
+        return json_response({"ok": True, "msg": msg}, status=201)
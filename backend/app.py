@@ -1,12 +1,22 @@
 import os
-import sqlite3
 from contextlib import closing
 
 from flask import Flask, redirect, render_template_string, url_for
 
+import db
+from analytics import register_analytics_routes
+from api import register_api_routes
+from backup import register_backup_routes
+from changes import register_changes_routes
+from coalescimento import ROTAS_PADRAO, parse_rotas, register_coalescimento
 from csv_ui import register_csv_routes
+from events import register_events_routes
+from metrics import register_metrics_routes
+from migrations import migrar
 from movements_ui import register_movements_routes
 from products_ui import register_products_routes
+from profiling import register_profiling
+from reorder import register_reorder_routes
 
 
 def create_app() -> Flask:
@@ -14,6 +24,19 @@ def create_app() -> Flask:
 
     port = int(os.getenv("PORT", "3000"))
     db_path = os.getenv("DB_PATH", "/data/app.db")
+    metrics_enabled = os.getenv("METRICS_ENABLED", "0") == "1"
+    slow_query_ms = os.getenv("SLOW_QUERY_MS")
+    profiling_enabled = os.getenv("PROFILING_ENABLED", "0") == "1"
+    admin_token = os.getenv("ADMIN_TOKEN")
+    csv_processos = os.getenv("CSV_IMPORT_PROCESSOS")
+    backup_dir = os.getenv("BACKUP_DIR") or os.path.join(
+        os.path.dirname(db_path), "backups"
+    )
+    import_erros_dir = os.getenv("IMPORT_ERROS_DIR")
+    export_dir = os.getenv("EXPORT_DIR")
+    # Conexões somente leitura reaproveitadas pelas consultas (0 desliga o pool).
+    pool_leitura = int(os.getenv("DB_POOL_LEITURA", "8"))
+    coalescer_rotas = parse_rotas(os.getenv("COALESCER_ROTAS", ROTAS_PADRAO))
 
     base_style = """
 <style>
@@ -67,65 +90,18 @@ def create_app() -> Flask:
 
     def init_db() -> None:
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        with closing(sqlite3.connect(db_path)) as conn:
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS app_state (
-                    key TEXT PRIMARY KEY,
-                    value TEXT NOT NULL
-                )
-                """
-            )
-            conn.execute(
-                "INSERT OR IGNORE INTO app_state(key, value) VALUES ('visitas', '0')"
-            )
-
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS produtos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nome TEXT NOT NULL,
-                    sku TEXT NOT NULL UNIQUE,
-                    categoria TEXT,
-                    fornecedor TEXT,
-                    custo REAL NOT NULL DEFAULT 0,
-                    preco REAL NOT NULL DEFAULT 0,
-                    quantidade_atual INTEGER NOT NULL DEFAULT 0,
-                    estoque_minimo INTEGER NOT NULL DEFAULT 0,
-                    criado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    atualizado_em DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-                """
-            )
-
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS movimentacoes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    produto_id INTEGER NOT NULL,
-                    tipo TEXT NOT NULL CHECK(tipo IN ('entrada', 'saida')),
-                    quantidade INTEGER NOT NULL CHECK(quantidade > 0),
-                    observacao TEXT,
-                    criado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY(produto_id) REFERENCES produtos(id)
-                )
-                """
-            )
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_mov_produto_em ON movimentacoes(produto_id, criado_em DESC)"
-            )
-
-            conn.commit()
+        migrar(db_path)
+        db.configurar_leitura(db_path, pool_leitura)
 
     def get_visitas() -> int:
-        with closing(sqlite3.connect(db_path)) as conn:
+        with closing(db.connect(db_path)) as conn:
             row = conn.execute(
                 "SELECT value FROM app_state WHERE key='visitas'"
             ).fetchone()
             return int(row[0]) if row else 0
 
     def set_visitas(value: int) -> None:
-        with closing(sqlite3.connect(db_path)) as conn:
+        with closing(db.connect(db_path)) as conn:
             conn.execute(
                 "UPDATE app_state SET value=? WHERE key='visitas'",
                 (str(value),),
@@ -136,9 +112,30 @@ def create_app() -> Flask:
     def health():
         return {"ok": True}
 
+    register_metrics_routes(app, habilitado=metrics_enabled)
+    register_profiling(
+        app,
+        slow_query_ms=float(slow_query_ms) if slow_query_ms else None,
+        habilitado=profiling_enabled,
+    )
+    register_coalescimento(app, rotas=coalescer_rotas)
+
     register_products_routes(app, db_path=db_path, base_style=base_style)
     register_movements_routes(app, db_path=db_path, base_style=base_style)
-    register_csv_routes(app, db_path=db_path, base_style=base_style)
+    register_csv_routes(
+        app,
+        db_path=db_path,
+        base_style=base_style,
+        processos=int(csv_processos) if csv_processos else None,
+        erros_dir=import_erros_dir,
+        export_dir=export_dir,
+    )
+    register_api_routes(app, db_path=db_path)
+    register_analytics_routes(app, db_path=db_path)
+    register_reorder_routes(app, db_path=db_path)
+    register_changes_routes(app, db_path=db_path)
+    register_events_routes(app)
+    register_backup_routes(app, db_path=db_path, token=admin_token, destino=backup_dir)
 
     @app.get("/")
     def index():
@@ -162,7 +159,16 @@ def create_app() -> Flask:
     return app
 
 
-app = create_app()
+def __getattr__(name: str) -> Flask:
+    # `app` é criado sob demanda (ex.: servidor WSGI apontando para app:app), e
+    # não no import: `from app import create_app` não toca no banco.
+    if name == "app":
+        instancia = create_app()
+        globals()["app"] = instancia
+        return instancia
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == "__main__":
+    app = create_app()
     app.run(host="0.0.0.0", port=app.config["PORT"])
@@ -0,0 +1,258 @@
+"""Arquivamento do histórico antigo de movimentações.
+
+Movimentações anteriores a um corte saem de `movimentacoes` e vão para tabelas
+por período (`movimentacoes_arq_2024`, ou `movimentacoes_arq_2024_03` com
+`--periodo mes`) no mesmo banco, registradas em `arquivo_periodos`. Assim as
+listagens e exportações do dia a dia varrem só o histórico recente.
+
+O saldo líquido do que foi arquivado fica por produto em
+`movimentacoes_saldo_inicial`: saldo inicial + movimentações ativas continua
+reconstruindo o estoque. Consultas que pedem um intervalo (`desde`/`ate`)
+usam `fonte_movimentacoes`, que une de forma transparente só as tabelas de
+arquivo que cobrem o intervalo.
+
+A cópia é feita em lotes, cada um na sua transação (BEGIN IMMEDIATE), então as
+escritas de movimentações só esperam pelo lote corrente.
+
+Uso:
+    python archive.py --dias 365          # arquiva o que tem mais de 1 ano
+    python archive.py --antes-de 2025-01-01 --periodo mes
+    python archive.py --status
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from contextlib import closing
+from datetime import date, timedelta
+
+import db
+from rollup import atualizar_diarias
+
+COLUNAS = "id, produto_id, tipo, quantidade, observacao, criado_em"
+PERIODOS = {"ano": 4, "mes": 7}
+
+
+def tabela_do_periodo(criado_em: str, periodo: str) -> str:
+    chave = criado_em[: PERIODOS[periodo]].replace("-", "_")
+    if not chave.replace("_", "").isdigit():
+        raise ValueError(f"data inválida para arquivamento: {criado_em!r}")
+    return f"movimentacoes_arq_{chave}"
+
+
+def _garantir_tabela(conn: sqlite3.Connection, tabela: str) -> None:
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {tabela} (
+            id INTEGER PRIMARY KEY,
+            produto_id INTEGER NOT NULL,
+            tipo TEXT NOT NULL,
+            quantidade INTEGER NOT NULL,
+            observacao TEXT,
+            criado_em DATETIME
+        )
+        """
+    )
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{tabela}_produto_em "
+        f"ON {tabela}(produto_id, criado_em DESC)"
+    )
+
+
+def arquivado_ate(conn: sqlite3.Connection) -> str | None:
+    row = conn.execute(
+        "SELECT value FROM app_state WHERE key='arquivado_ate'"
+    ).fetchone()
+    return row[0] if row else None
+
+
+def arquivar(
+    db_path: str,
+    *,
+    antes_de: date,
+    periodo: str = "ano",
+    lote: int = 5000,
+    pausa: float = 0.0,
+    progresso: Callable[[str], None] | None = None,
+) -> int:
+    """Move as movimentações com `criado_em < antes_de`. Retorna quantas moveu."""
+
+    if periodo not in PERIODOS:
+        raise ValueError(f"período inválido: {periodo!r}")
+    corte = antes_de.isoformat()
+    movidas = 0
+    with closing(db.connect(db_path)) as conn:
+        # A tabela diária precisa contar as linhas antes que saiam do livro ativo.
+        atualizar_diarias(conn)
+        while True:
+            db.begin_immediate(conn)
+            linhas = conn.execute(
+                f"""
+                SELECT {COLUNAS} FROM movimentacoes
+                WHERE criado_em < ?
+                ORDER BY criado_em, id
+                LIMIT ?
+                """,
+                (corte, lote),
+            ).fetchall()
+            if not linhas:
+                conn.commit()
+                break
+
+            por_tabela: dict[str, list[tuple]] = defaultdict(list)
+            saldos: dict[int, int] = defaultdict(int)
+            for linha in linhas:
+                por_tabela[tabela_do_periodo(linha[5], periodo)].append(linha)
+                saldos[linha[1]] += linha[3] if linha[2] == "entrada" else -linha[3]
+
+            for tabela, grupo in por_tabela.items():
+                _garantir_tabela(conn, tabela)
+                conn.executemany(
+                    f"INSERT INTO {tabela}({COLUNAS}) VALUES(?, ?, ?, ?, ?, ?)", grupo
+                )
+                conn.execute(
+                    """
+                    INSERT INTO arquivo_periodos(tabela, inicio, fim, linhas)
+                    VALUES(?, ?, ?, ?)
+                    ON CONFLICT(tabela) DO UPDATE SET
+                        inicio = min(inicio, excluded.inicio),
+                        fim = max(fim, excluded.fim),
+                        linhas = linhas + excluded.linhas
+                    """,
+                    (tabela, grupo[0][5], grupo[-1][5], len(grupo)),
+                )
+            conn.executemany(
+                """
+                INSERT INTO movimentacoes_saldo_inicial(produto_id, saldo)
+                VALUES(?, ?)
+                ON CONFLICT(produto_id) DO UPDATE SET saldo = saldo + excluded.saldo
+                """,
+                saldos.items(),
+            )
+            conn.executemany(
+                "DELETE FROM movimentacoes WHERE id=?",
+                [(linha[0],) for linha in linhas],
+            )
+            conn.execute(
+                """
+                INSERT INTO app_state(key, value) VALUES('arquivado_ate', ?)
+                ON CONFLICT(key) DO UPDATE SET value = max(value, excluded.value)
+                """,
+                (corte,),
+            )
+            conn.commit()
+
+            movidas += len(linhas)
+            if progresso is not None:
+                progresso(f"  {movidas} movimentações arquivadas (até {linhas[-1][5]})")
+            if pausa:
+                time.sleep(pausa)
+    return movidas
+
+
+def fonte_movimentacoes(
+    conn: sqlite3.Connection, *, desde: str | None = None, ate: str | None = None
+) -> str:
+    """Expressão para `FROM`: a tabela ativa, ou ela unida aos arquivos do intervalo.
+
+    Sem `desde` nem `ate` só o histórico ativo é consultado (o caso comum); com
+    algum dos dois, entram as tabelas de arquivo cujo intervalo [inicio, fim]
+    cruza o pedido (só com `ate`, todas as que começam antes dele).
+    """
+
+    if not desde and not ate:
+        return "movimentacoes"
+    tabelas = [
+        r[0]
+        for r in conn.execute(
+            """
+            SELECT tabela FROM arquivo_periodos
+            WHERE (? IS NULL OR fim >= ?) AND (? IS NULL OR inicio < ?)
+            ORDER BY inicio
+            """,
+            (desde, desde, ate, ate),
+        )
+    ]
+    if not tabelas:
+        return "movimentacoes"
+    partes = [f"SELECT {COLUNAS} FROM movimentacoes"]
+    partes += [f"SELECT {COLUNAS} FROM {t}" for t in tabelas]
+    return "(" + " UNION ALL ".join(partes) + ")"
+
+
+def intervalo_datas(
+    desde: str | None, ate: str | None
+) -> tuple[str | None, str | None] | None:
+    """Valida `desde`/`ate` (AAAA-MM-DD, inclusivos).
+
+    Retorna (desde, ate exclusivo) para comparar com `criado_em`, ou None se
+    alguma data for inválida.
+    """
+
+    try:
+        inicio = date.fromisoformat(desde).isoformat() if desde else None
+        fim = (date.fromisoformat(ate) + timedelta(days=1)).isoformat() if ate else None
+    except ValueError:
+        return None
+    return inicio, fim
+
+
+def saldo_reconstruido(conn: sqlite3.Connection, produto_id: int) -> int:
+    """Saldo inicial (arquivado) + movimentações ativas do produto."""
+
+    row = conn.execute(
+        """
+        SELECT
+            COALESCE((SELECT saldo FROM movimentacoes_saldo_inicial
+                      WHERE produto_id = :id), 0)
+            + COALESCE((SELECT SUM(CASE tipo WHEN 'entrada' THEN quantidade
+                                             ELSE -quantidade END)
+                        FROM movimentacoes WHERE produto_id = :id), 0)
+        """,
+        {"id": produto_id},
+    ).fetchone()
+    return int(row[0])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db", default=os.getenv("DB_PATH", "/data/app.db"))
+    corte = parser.add_mutually_exclusive_group()
+    corte.add_argument("--antes-de", type=date.fromisoformat, help="AAAA-MM-DD")
+    corte.add_argument("--dias", type=int, help="manter os últimos N dias ativos")
+    parser.add_argument("--periodo", choices=tuple(PERIODOS), default="ano")
+    parser.add_argument("--lote", type=int, default=5000)
+    parser.add_argument("--pausa", type=float, default=0.05, help="s entre lotes")
+    parser.add_argument("--status", action="store_true", help="só listar arquivos")
+    args = parser.parse_args()
+
+    if args.status or (args.antes_de is None and args.dias is None):
+        with closing(db.connect(args.db)) as conn:
+            print(f"arquivado até: {arquivado_ate(conn) or '-'}")
+            for tabela, inicio, fim, linhas in conn.execute(
+                "SELECT tabela, inicio, fim, linhas FROM arquivo_periodos ORDER BY inicio"
+            ):
+                print(f"{tabela}: {linhas} linhas ({inicio} .. {fim})")
+        return
+
+    antes_de = args.antes_de or date.today() - timedelta(days=args.dias)
+    movidas = arquivar(
+        args.db,
+        antes_de=antes_de,
+        periodo=args.periodo,
+        lote=args.lote,
+        pausa=args.pausa,
+        progresso=print,
+    )
+    print(f"movimentações arquivadas: {movidas}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Backup online (a quente) do SQLite, sem parar os containers.
+
+Usa a API de backup incremental do SQLite: as páginas são copiadas em passos de
+`paginas` páginas, com uma pausa entre passos, então as escritas de
+movimentações só esperam pelo passo corrente. O arquivo resultante passa por
+`PRAGMA integrity_check`, pode ser comprimido (gzip) e apenas os `manter`
+backups mais recentes são mantidos no diretório.
+
+Se a origem for alterada por outra conexão durante a cópia, o SQLite a recomeça;
+depois de `max_reinicios` recomeços o restante é copiado num único passo (que
+segura o lock de leitura até o fim).
+
+Uso:
+    python backup.py --destino /data/backups --comprimir --manter 7
+
+Rota (só registrada quando ADMIN_TOKEN está definido):
+- POST /admin/backup   (header `Authorization: Bearer <ADMIN_TOKEN>`)
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import gzip
+import hmac
+import os
+import shutil
+import sqlite3
+import time
+from collections.abc import Callable
+from contextlib import closing
+from datetime import datetime
+from typing import Any
+
+from flask import Flask, request
+
+import db
+
+PREFIXO = "app-"
+
+
+class _MuitosReinicios(Exception):
+    pass
+
+
+def _aplicar_retencao(destino: str, manter: int) -> list[str]:
+    arquivos = sorted(glob.glob(os.path.join(destino, f"{PREFIXO}*.db*")))
+    arquivos = [a for a in arquivos if not a.endswith(".parcial")]
+    removidos = arquivos[:-manter] if manter > 0 else []
+    for caminho in removidos:
+        os.remove(caminho)
+    return removidos
+
+
+def fazer_backup(
+    db_path: str,
+    destino: str,
+    *,
+    paginas: int = 256,
+    pausa: float = 0.005,
+    comprimir: bool = False,
+    manter: int = 7,
+    max_reinicios: int = 3,
+    progresso: Callable[[int, int], None] | None = None,
+) -> dict[str, Any]:
+    """Copia o banco para `destino` e retorna um resumo do backup.
+
+    Levanta RuntimeError se o arquivo copiado não passar no integrity_check.
+    """
+
+    os.makedirs(destino, exist_ok=True)
+    nome = f"{PREFIXO}{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.db"
+    final = os.path.join(destino, nome)
+    parcial = final + ".parcial"
+
+    estado = {"anterior": -1, "reinicios": 0}
+
+    def passo(status: int, restantes: int, total: int) -> None:
+        if progresso is not None:
+            progresso(total - restantes, total)
+        # Escrita de outra conexão na origem faz o SQLite recomeçar a cópia:
+        # `restantes` volta ao valor do primeiro passo em vez de diminuir. Sob
+        # escrita contínua isso nunca termina, então passo sem progresso conta
+        # como recomeço e, após alguns, a cópia é concluída num passo só.
+        if estado["anterior"] != -1 and restantes >= estado["anterior"]:
+            estado["reinicios"] += 1
+            if estado["reinicios"] > max_reinicios:
+                raise _MuitosReinicios
+        estado["anterior"] = restantes
+        # Throttling: entre passos o lock de leitura da origem está liberado.
+        if pausa and restantes:
+            time.sleep(pausa)
+
+    inicio = time.perf_counter()
+    with (
+        closing(db.connect(db_path)) as origem,
+        closing(sqlite3.connect(parcial)) as copia,
+    ):
+        try:
+            origem.backup(copia, pages=paginas, progress=passo)
+        except _MuitosReinicios:
+            origem.backup(copia, pages=-1)
+        total_paginas = copia.execute("PRAGMA page_count").fetchone()[0]
+        integridade = copia.execute("PRAGMA integrity_check").fetchone()[0]
+    if integridade != "ok":
+        os.remove(parcial)
+        raise RuntimeError(f"backup corrompido (integrity_check: {integridade})")
+
+    if comprimir:
+        final += ".gz"
+        with open(parcial, "rb") as src, gzip.open(final + ".parcial", "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.remove(parcial)
+        parcial = final + ".parcial"
+    os.replace(parcial, final)
+
+    removidos = _aplicar_retencao(destino, manter)
+    return {
+        "arquivo": final,
+        "bytes": os.path.getsize(final),
+        "paginas": total_paginas,
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "integridade": integridade,
+        "reinicios": estado["reinicios"],
+        "removidos": [os.path.basename(r) for r in removidos],
+    }
+
+
+def register_backup_routes(
+    app: Flask, *, db_path: str, token: str | None, destino: str
+) -> None:
+    if not token:
+        return
+
+    @app.post("/admin/backup")
+    def admin_backup():
+        enviado = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(enviado.encode(), token.encode()):
+            return {"erro": "não autorizado"}, 401
+
+        manter = request.args.get("manter") or "7"
+        if not manter.isdigit():
+            return {"erro": "manter deve ser um inteiro >= 0"}, 400
+
+        try:
+            resumo = fazer_backup(
+                db_path,
+                destino,
+                comprimir=request.args.get("comprimir") == "1",
+                manter=int(manter),
+            )
+        except (RuntimeError, sqlite3.Error) as e:
+            return {"erro": str(e)}, 500
+        return resumo
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db", default=os.getenv("DB_PATH", "/data/app.db"))
+    parser.add_argument(
+        "--destino", default=None, help="padrão: <dir do banco>/backups"
+    )
+    parser.add_argument("--comprimir", action="store_true")
+    parser.add_argument("--manter", type=int, default=7)
+    parser.add_argument("--paginas", type=int, default=256, help="páginas por passo")
+    parser.add_argument("--pausa", type=float, default=0.005, help="s entre passos")
+    args = parser.parse_args()
+
+    destino = args.destino or os.path.join(os.path.dirname(args.db), "backups")
+
+    def progresso(copiadas: int, total: int) -> None:
+        print(f"\r{copiadas}/{total} páginas", end="", flush=True)
+
+    resumo = fazer_backup(
+        args.db,
+        destino,
+        paginas=args.paginas,
+        pausa=args.pausa,
+        comprimir=args.comprimir,
+        manter=args.manter,
+        progresso=progresso,
+    )
+    print()
+    for chave, valor in resumo.items():
+        print(f"{chave}: {valor}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+"""Benchmarks do backend (não fazem parte da suíte de testes).
+
+Executar a partir de `backend/`, por exemplo: `python -m bench.api_vs_html`.
+"""
@@ -0,0 +1,87 @@
+"""Compara a listagem HTML de produtos com a API JSON.
+
+Uso: python -m bench.api_vs_html [--produtos 5000] [--repeticoes 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from contextlib import closing
+
+from flask import Flask
+
+
+def seed(db_path: str, n: int) -> None:
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.executemany(
+            """
+            INSERT INTO produtos(
+                nome, sku, categoria, fornecedor, custo, preco,
+                quantidade_atual, estoque_minimo
+            ) VALUES(?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                (
+                    f"Produto {i:06d}",
+                    f"SKU-{i:06d}",
+                    f"Cat {i % 20}",
+                    f"Forn {i % 50}",
+                    1.5,
+                    3.0,
+                    i % 30,
+                    10,
+                )
+                for i in range(n)
+            ),
+        )
+        conn.commit()
+
+
+def medir(app: Flask, url: str, repeticoes: int) -> tuple[float, int]:
+    client = app.test_client()
+    client.get(url)  # aquecimento (compilação de templates etc.)
+    tempos = []
+    tamanho = 0
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        res = client.get(url)
+        tempos.append(time.perf_counter() - t0)
+        tamanho = len(res.data)
+    return statistics.median(tempos) * 1000, tamanho
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--produtos", type=int, default=5000)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DB_PATH"] = os.path.join(tmp, "app.db")
+        from app import create_app
+
+        app = create_app()
+        seed(app.config["DB_PATH"], args.produtos)
+
+        # A API pagina em no máximo 1000 itens; comparamos o mesmo volume.
+        n = min(args.produtos, 1000)
+        cenarios = [
+            ("html /produtos (todos)", "/produtos"),
+            (f"json /api/v1/produtos?limit={n}", f"/api/v1/produtos?limit={n}"),
+            (
+                f"json /api/v1/produtos?limit={n}&fields=nome,sku",
+                f"/api/v1/produtos?limit={n}&fields=nome,sku",
+            ),
+        ]
+        for nome, url in cenarios:
+            ms, tamanho = medir(app, url, args.repeticoes)
+            print(f"{nome:55s} mediana={ms:8.2f} ms  bytes={tamanho}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Throughput (linhas/s) da leitura e conversão do CSV de produtos, sem banco.
+
+Compara o caminho anterior da importação (csv.DictReader, um dict por linha e
+conversores recriados a cada linha) com o esquema compilado (`csv_schema`) e,
+com `--processos`, com a validação em paralelo (`csv_paralelo`, inclui subir o
+pool e a divisão em blocos).
+
+Uso: python -m bench.csv_parse [--linhas 200000] [--repeticoes 5] [--processos 1,2,4]
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import statistics
+import time
+from collections.abc import Callable
+
+import csv_paralelo
+from bench import datagen
+from csv_schema import EsquemaImportacao
+
+
+def caminho_dictreader(text: str) -> int:
+    """Reprodução do parse de `upsert_produto` antes do esquema compilado."""
+
+    validas = 0
+    for row in csv.DictReader(io.StringIO(text)):
+        sku = (row.get("sku") or "").strip()
+        nome = (row.get("nome") or "").strip()
+        if not sku or not nome:
+            continue
+        _ = (row.get("categoria") or "").strip() or None
+        _ = (row.get("fornecedor") or "").strip() or None
+
+        def parse_int(value: str | None) -> int:
+            v = (value or "").strip()
+            if v == "":
+                return 0
+            if not v.lstrip("-").isdigit():
+                raise ValueError("inteiro inválido")
+            return int(v)
+
+        def parse_float(value: str | None) -> float:
+            v = (value or "").strip().replace(",", ".")
+            if v == "":
+                return 0.0
+            return float(v)
+
+        try:
+            parse_float(row.get("custo"))
+            parse_float(row.get("preco"))
+            parse_int(row.get("quantidade_atual"))
+            parse_int(row.get("estoque_minimo"))
+        except ValueError:
+            continue
+        validas += 1
+    return validas
+
+
+def caminho_esquema(text: str) -> int:
+    reader = csv.reader(io.StringIO(text))
+    esquema = EsquemaImportacao(next(reader, []))
+    return sum(1 for _, v in esquema.linhas(reader) if not isinstance(v, str))
+
+
+def caminho_paralelo(processos: int) -> Callable[[str], int]:
+    def converter(text: str) -> int:
+        header_texto, blocos = csv_paralelo.dividir(
+            io.StringIO(text), max(1, len(text) // (4 * processos))
+        )
+        header = next(csv.reader(io.StringIO(header_texto)), [])
+        return sum(
+            1
+            for _, v in csv_paralelo.converter_em_paralelo(
+                header, blocos, processos=processos
+            )
+            if not isinstance(v, str)
+        )
+
+    return converter
+
+
+def medir(fn: Callable[[str], int], text: str, repeticoes: int) -> tuple[float, int]:
+    tempos = []
+    validas = 0
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        validas = fn(text)
+        tempos.append(time.perf_counter() - t0)
+    return statistics.median(tempos), validas
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--linhas", type=int, default=200_000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--processos",
+        type=lambda v: [int(x) for x in v.split(",") if x],
+        default=[],
+        help="ex.: 1,2,4",
+    )
+    args = parser.parse_args()
+
+    header = (
+        "sku,nome,categoria,fornecedor,custo,preco,quantidade_atual,estoque_minimo\n"
+    )
+    text = header + "".join(datagen.linhas_csv(args.linhas, args.seed))
+
+    base = None
+    caminhos: list[tuple[str, Callable[[str], int]]] = [
+        ("DictReader (anterior)", caminho_dictreader),
+        ("esquema compilado", caminho_esquema),
+    ]
+    caminhos += [
+        (f"paralelo, {n} processos", caminho_paralelo(n)) for n in args.processos
+    ]
+    for nome, fn in caminhos:
+        seg, validas = medir(fn, text, args.repeticoes)
+        taxa = args.linhas / seg
+        base = base or taxa
+        print(
+            f"{nome:<24} {taxa:>12,.0f} linhas/s  ({validas} válidas, "
+            f"{taxa / base:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
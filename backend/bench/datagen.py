@@ -0,0 +1,166 @@
+"""Gerador determinístico de catálogo e livro de movimentações.
+
+A popularidade dos produtos segue uma distribuição Zipf (poucos SKUs concentram
+a maior parte das movimentações), as datas se espalham pelos `dias` anteriores a
+`fim` (uma data fixa, não "hoje", para o livro ser o mesmo em qualquer dia) e o
+`quantidade_atual` final de cada produto bate com o saldo das movimentações.
+
+Uso: python -m bench.datagen /tmp/app.db --produtos 10000 --movimentos 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import itertools
+import os
+import random
+import sqlite3
+from collections.abc import Iterator
+from contextlib import closing
+from datetime import date, datetime, time, timedelta
+
+from rollup import atualizar_diarias
+
+CATEGORIAS = 40
+FORNECEDORES = 120
+FIM_PADRAO = date(2026, 1, 1)
+
+
+def _pesos_zipf(n: int, s: float) -> list[float]:
+    acumulado = list(itertools.accumulate(1.0 / (i**s) for i in range(1, n + 1)))
+    total = acumulado[-1]
+    return [a / total for a in acumulado]
+
+
+def linhas_produtos(n: int, seed: int = 42) -> Iterator[tuple]:
+    """Tuplas na ordem de INSERT_PRODUTO_SQL (quantidade_atual zerada)."""
+
+    rng = random.Random(seed)
+    for i in range(1, n + 1):
+        custo = round(rng.uniform(0.5, 200.0), 2)
+        yield (
+            f"Produto {i:07d}",
+            f"SKU-{i:07d}",
+            f"Categoria {rng.randrange(CATEGORIAS):02d}",
+            f"Fornecedor {rng.randrange(FORNECEDORES):03d}",
+            custo,
+            round(custo * rng.uniform(1.2, 2.5), 2),
+            0,
+            rng.randrange(0, 50),
+        )
+
+
+def linhas_csv(n: int, seed: int = 42) -> Iterator[str]:
+    """Linhas de CSV de produtos (sem cabeçalho), com decimais no formato BR."""
+
+    rng = random.Random(seed + 1)
+    for nome, sku, cat, forn, custo, preco, _, minimo in linhas_produtos(n, seed):
+        qtd = rng.randrange(0, 200)
+        yield (
+            f'{sku},{nome},{cat},{forn},"{str(custo).replace(".", ",")}",'
+            f'"{str(preco).replace(".", ",")}",{qtd},{minimo}\n'
+        )
+
+
+def gerar(
+    db_path: str,
+    *,
+    produtos: int,
+    movimentos: int,
+    seed: int = 42,
+    dias: int = 365,
+    skew: float = 1.1,
+    fim: date = FIM_PADRAO,
+) -> None:
+    """Popula um banco já inicializado (schema criado por create_app)."""
+
+    rng = random.Random(seed)
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.executemany(
+            """
+            INSERT INTO produtos(
+                nome, sku, categoria, fornecedor, custo, preco,
+                quantidade_atual, estoque_minimo
+            ) VALUES(?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            linhas_produtos(produtos, seed),
+        )
+        ids = [r[0] for r in conn.execute("SELECT id FROM produtos ORDER BY id")]
+        if not ids or movimentos <= 0:
+            conn.commit()
+            return
+
+        # Embaralha quais produtos são "populares" para não correlacionar com id.
+        ranking = ids[:]
+        rng.shuffle(ranking)
+        pesos = _pesos_zipf(len(ranking), skew)
+        saldo = dict.fromkeys(ids, 0)
+
+        inicio = datetime.combine(fim, time()) - timedelta(days=dias)
+        passo = dias * 86400 / movimentos
+
+        def linhas_movimentos() -> Iterator[tuple]:
+            for i in range(movimentos):
+                produto_id = ranking[bisect.bisect_left(pesos, rng.random())]
+                quantidade = rng.randint(1, 20)
+                tipo = "saida" if rng.random() < 0.55 else "entrada"
+                if tipo == "saida" and saldo[produto_id] < quantidade:
+                    tipo = "entrada"
+                saldo[produto_id] += quantidade if tipo == "entrada" else -quantidade
+                criado = inicio + timedelta(seconds=i * passo)
+                yield (
+                    produto_id,
+                    tipo,
+                    quantidade,
+                    None,
+                    criado.strftime("%Y-%m-%d %H:%M:%S"),
+                )
+
+        conn.executemany(
+            """
+            INSERT INTO movimentacoes(produto_id, tipo, quantidade, observacao, criado_em)
+            VALUES(?, ?, ?, ?, ?)
+            """,
+            linhas_movimentos(),
+        )
+        conn.executemany(
+            "UPDATE produtos SET quantidade_atual=? WHERE id=?",
+            ((q, pid) for pid, q in saldo.items() if q),
+        )
+        conn.commit()
+        # Inserção em lote não passa por `somar_movimentacao`: dobra os totais
+        # diários aqui, como `python rollup.py` depois de uma carga.
+        atualizar_diarias(conn)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("db_path")
+    parser.add_argument("--produtos", type=int, default=10_000)
+    parser.add_argument("--movimentos", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--fim",
+        type=date.fromisoformat,
+        default=FIM_PADRAO,
+        help="data final do livro (AAAA-MM-DD)",
+    )
+    args = parser.parse_args()
+
+    os.environ["DB_PATH"] = args.db_path
+    from app import create_app
+
+    create_app()
+    gerar(
+        args.db_path,
+        produtos=args.produtos,
+        movimentos=args.movimentos,
+        seed=args.seed,
+        fim=args.fim,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Tamanho e custo de leitura de cada formato de exportação de produtos, sem banco.
+
+Para cada formato de `export_formatos` mede o tamanho, o tempo de gerar e o de
+um consumidor ler tudo com os tipos certos: CSV com `csv.reader` + conversão de
+números por linha, NDJSON com `json.loads` por linha e o colunar com
+`ler_colunar`.
+
+Uso: python -m bench.export_formatos [--linhas 200000] [--repeticoes 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import statistics
+import time
+from collections.abc import Callable
+
+from bench import datagen
+from csv_ui import PRODUTOS_COLUNAS
+from export_formatos import FORMATOS, ler_colunar
+
+
+def ler_csv(data: bytes) -> int:
+    reader = csv.reader(io.StringIO(data.decode("utf-8")))
+    next(reader)
+    n = 0
+    for sku, nome, cat, forn, custo, preco, qtd, minimo in reader:
+        _ = (float(custo), float(preco), int(qtd), int(minimo))
+        n += 1
+    return n
+
+
+def ler_ndjson(data: bytes) -> int:
+    return sum(1 for linha in data.decode("utf-8").splitlines() if json.loads(linha))
+
+
+def ler_colunar_tudo(data: bytes) -> int:
+    return sum(len(colunas[0]) for _, colunas in ler_colunar(io.BytesIO(data)))
+
+
+LEITORES: dict[str, Callable[[bytes], int]] = {
+    "csv": ler_csv,
+    "ndjson": ler_ndjson,
+    "colunar": ler_colunar_tudo,
+}
+
+
+def medir(fn: Callable[[], object], repeticoes: int) -> float:
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        fn()
+        tempos.append(time.perf_counter() - t0)
+    return statistics.median(tempos)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--linhas", type=int, default=200_000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Mesma ordem de colunas da exportação (sku primeiro).
+    linhas = [
+        (sku, nome, cat, forn, custo, preco, i % 200, minimo)
+        for i, (nome, sku, cat, forn, custo, preco, _, minimo) in enumerate(
+            datagen.linhas_produtos(args.linhas, args.seed)
+        )
+    ]
+
+    base = None
+    for nome, formato in FORMATOS.items():
+        data = b"".join(formato.gerar(PRODUTOS_COLUNAS, linhas))
+        gerar = medir(
+            lambda: b"".join(formato.gerar(PRODUTOS_COLUNAS, linhas)),
+            args.repeticoes,
+        )
+        ler = medir(lambda: LEITORES[nome](data), args.repeticoes)
+        taxa = args.linhas / ler
+        base = base or taxa
+        print(
+            f"{nome:<8} {len(data) / 1e6:>8.1f} MB  gerar {args.linhas / gerar:>10,.0f}"
+            f" linhas/s  ler {taxa:>10,.0f} linhas/s ({taxa / base:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Teste de carga: app real (HTTP) contra um banco temporário.
+
+Sobe `create_app()` num servidor WSGI multi-thread local, apontando `DB_PATH`
+para um diretório temporário populado por `bench.datagen`, e dispara um mix
+configurável de leituras e escritas a partir de várias threads ou processos.
+Ao final reporta throughput, p50/p95/p99 por operação, erros, contagem de
+"database is locked" e a espera pelo lock de escrita do SQLite (lidos das
+métricas do próprio servidor).
+
+Uso (a partir de backend/):
+    python -m bench.load --clientes 16 --duracao 20
+    python -m bench.load --modo processos --clientes 8 \\
+        --mix produtos=30,produto=30,movimentacoes=20,nova=15,csv=5
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.parse
+from typing import Any
+
+from werkzeug.serving import make_server
+
+from bench import datagen
+from bench.suite import PRODUTOS_CSV_HEADER, resumo
+
+OPERACOES = ("produtos", "produto", "movimentacoes", "nova", "csv")
+MIX_PADRAO = "produtos=25,produto=35,movimentacoes=20,nova=18,csv=2"
+
+# (operação, latência em s, status HTTP; negativo = inesperado, 0 = sem conexão)
+Amostra = tuple[str, float, int]
+
+
+def parse_mix(texto: str) -> dict[str, int]:
+    mix: dict[str, int] = {}
+    for parte in texto.split(","):
+        nome, _, peso = parte.partition("=")
+        nome = nome.strip()
+        if nome not in OPERACOES:
+            raise ValueError(f"operação desconhecida no mix: {nome!r}")
+        mix[nome] = int(peso or 1)
+    return mix
+
+
+def _requisicao(
+    host: str, port: int, op: str, rng: random.Random, produtos: int
+) -> tuple[int, bool]:
+    """Executa uma operação do mix. Retorna (status, ok)."""
+
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    try:
+        if op == "produtos":
+            conn.request("GET", "/produtos")
+            esperado = 200
+        elif op == "produto":
+            conn.request("GET", f"/produtos/{rng.randint(1, produtos)}")
+            esperado = 200
+        elif op == "movimentacoes":
+            conn.request("GET", "/movimentacoes")
+            esperado = 200
+        elif op == "nova":
+            corpo = urllib.parse.urlencode(
+                {
+                    "produto_id": rng.randint(1, produtos),
+                    "tipo": "entrada",
+                    "quantidade": rng.randint(1, 5),
+                }
+            )
+            conn.request(
+                "POST",
+                "/movimentacoes/nova",
+                body=corpo,
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+            )
+            esperado = 302
+        else:
+            linhas = "".join(datagen.linhas_csv(50, rng.randrange(1_000_000)))
+            limite = "----carga"
+            corpo = (
+                f"--{limite}\r\n"
+                'Content-Disposition: form-data; name="arquivo"; filename="p.csv"\r\n'
+                "Content-Type: text/csv\r\n\r\n"
+                f"{PRODUTOS_CSV_HEADER}{linhas}\r\n--{limite}--\r\n"
+            )
+            conn.request(
+                "POST",
+                "/csv/import/produtos",
+                body=corpo.encode("utf-8"),
+                headers={"Content-Type": f"multipart/form-data; boundary={limite}"},
+            )
+            esperado = 200
+        res = conn.getresponse()
+        res.read()
+        return res.status, res.status == esperado
+    finally:
+        conn.close()
+
+
+def executar_cliente(
+    host: str, port: int, mix: dict[str, int], duracao: float, seed: int, produtos: int
+) -> list[Amostra]:
+    rng = random.Random(seed)
+    nomes = list(mix)
+    pesos = [mix[n] for n in nomes]
+    amostras: list[Amostra] = []
+    fim = time.monotonic() + duracao
+    while time.monotonic() < fim:
+        op = rng.choices(nomes, pesos)[0]
+        t0 = time.perf_counter()
+        try:
+            status, ok = _requisicao(host, port, op, rng, produtos)
+        except OSError:
+            status, ok = 0, False
+        amostras.append((op, time.perf_counter() - t0, status if ok else -status))
+    return amostras
+
+
+def _executar_cliente_args(args: tuple) -> list[Amostra]:
+    return executar_cliente(*args)
+
+
+def relatorio(amostras: list[Amostra], segundos: float) -> dict[str, Any]:
+    import metrics
+
+    por_op: dict[str, dict[str, Any]] = {}
+    for op in sorted({a[0] for a in amostras}):
+        lat = [a[1] for a in amostras if a[0] == op]
+        r = resumo(lat, segundos, len(lat))
+        r["erros"] = sum(1 for a in amostras if a[0] == op and a[2] <= 0)
+        por_op[op] = r
+
+    _, soma_espera, esperas = metrics.DB_LOCK_WAIT.snapshot()
+    geral = resumo([a[1] for a in amostras], segundos, len(amostras))
+    geral["erros"] = sum(1 for a in amostras if a[2] <= 0)
+    geral["database_is_locked"] = int(metrics.DB_LOCKED.value())
+    return {
+        "geral": geral,
+        "operacoes": por_op,
+        "lock_sqlite": {
+            "transacoes": esperas,
+            "espera_media_ms": round(soma_espera / esperas * 1000, 3)
+            if esperas
+            else 0.0,
+            "espera_p95_ms_max": metrics.DB_LOCK_WAIT.quantile(0.95) * 1000,
+            "espera_p99_ms_max": metrics.DB_LOCK_WAIT.quantile(0.99) * 1000,
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--clientes", type=int, default=8)
+    parser.add_argument("--duracao", type=float, default=10.0)
+    parser.add_argument("--modo", choices=("threads", "processos"), default="threads")
+    parser.add_argument("--mix", default=MIX_PADRAO)
+    parser.add_argument("--produtos", type=int, default=5_000)
+    parser.add_argument("--movimentos", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", help="arquivo JSON de resultados")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DB_PATH"] = os.path.join(tmp, "app.db")
+        os.environ["METRICS_ENABLED"] = "1"
+        from app import create_app
+
+        app = create_app()
+        # Tracebacks de 500 e o log de acesso poluiriam o relatório.
+        app.logger.disabled = True
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        datagen.gerar(
+            app.config["DB_PATH"],
+            produtos=args.produtos,
+            movimentos=args.movimentos,
+            seed=args.seed,
+        )
+
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = "127.0.0.1", server.server_port
+        tarefas = [
+            (host, port, mix, args.duracao, args.seed + i, args.produtos)
+            for i in range(args.clientes)
+        ]
+
+        print(
+            f"{args.clientes} clientes ({args.modo}) por {args.duracao:.0f}s "
+            f"em http://{host}:{port} mix={mix}",
+            flush=True,
+        )
+        inicio = time.perf_counter()
+        amostras: list[Amostra] = []
+        if args.modo == "processos":
+            with multiprocessing.Pool(args.clientes) as pool:
+                for parte in pool.map(_executar_cliente_args, tarefas):
+                    amostras.extend(parte)
+        else:
+            lock = threading.Lock()
+
+            def rodar(t: tuple) -> None:
+                parte = executar_cliente(*t)
+                with lock:
+                    amostras.extend(parte)
+
+            ts = [threading.Thread(target=rodar, args=(t,)) for t in tarefas]
+            for t in ts:
+                t.start()
+            for t in ts:
+                t.join()
+        segundos = time.perf_counter() - inicio
+        server.shutdown()
+
+    resultado = relatorio(amostras, segundos)
+    print(json.dumps(resultado, ensure_ascii=False, indent=2))
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Memória por linha das linhas da listagem de produtos (`produtos_list`).
+
+Compara o caminho anterior (`SELECT *`, `sqlite3.Row` convertido em dict e
+mesclado com `low_stock` calculado em Python) com o atual (só as colunas
+mostradas, `low_stock` no SQL, tuplas `ProdutoLinha`). Mede a memória retida
+pela lista pronta para o template e o pico durante a montagem (tracemalloc),
+além do tempo.
+
+Uso: python -m bench.produtos_list_mem [--linhas 100000] [--repeticoes 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+
+import db
+from app import create_app
+from bench import datagen
+from products_ui import LISTA_PRODUTOS_SQL, ProdutoLinha
+
+
+def caminho_dict(db_path: str) -> list:
+    """Reprodução de `produtos_list` antes das tuplas compactas."""
+
+    rows = db.query_all(db_path, "SELECT * FROM produtos ORDER BY nome ASC")
+    return [
+        {**dict(r), "low_stock": r["quantidade_atual"] <= r["estoque_minimo"]}
+        for r in rows
+    ]
+
+
+def caminho_tupla(db_path: str) -> list:
+    _, rows = db.query_rows(db_path, LISTA_PRODUTOS_SQL + " ORDER BY nome ASC")
+    return list(map(ProdutoLinha._make, rows))
+
+
+def memoria(fn: Callable[[str], list], db_path: str) -> tuple[int, int, int]:
+    """(bytes retidos pela lista, pico durante a montagem, linhas)."""
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        produtos = fn(db_path)
+        gc.collect()
+        retido, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return retido, pico, len(produtos)
+
+
+def tempo(fn: Callable[[str], list], db_path: str, repeticoes: int) -> float:
+    tempos = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        fn(db_path)
+        tempos.append(time.perf_counter() - t0)
+    return statistics.median(tempos)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        os.environ["DB_PATH"] = db_path
+        create_app()
+        datagen.gerar(db_path, produtos=args.linhas, movimentos=0, seed=args.seed)
+
+        base = None
+        for nome, fn in (
+            ("dict por linha (anterior)", caminho_dict),
+            ("tupla ProdutoLinha", caminho_tupla),
+        ):
+            retido, pico, linhas = memoria(fn, db_path)
+            seg = tempo(fn, db_path, args.repeticoes)
+            base = base or retido
+            print(
+                f"{nome:<26} {retido / linhas:>7,.0f} B/linha retidos  "
+                f"pico {pico / 1024 / 1024:>7,.1f} MiB  {seg * 1000:>7,.0f} ms  "
+                f"({retido / base:.2f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,488 @@
+"""Suíte de benchmarks em escala (catálogo e livro de movimentações sintéticos).
+
+Cada cenário reporta latência (p50/p95/p99), throughput e pico de memória
+(tracemalloc, numa execução separada para não distorcer os tempos). O resultado
+pode ser salvo em JSON e comparado entre commits.
+
+Uso (a partir de backend/):
+    python -m bench.suite --produtos 20000 --movimentos 200000 --csv 10000,100000
+    python -m bench.suite --saida base.json
+    python -m bench.suite --comparar base.json novo.json
+    python -m bench.suite --somente produtos_list,produto_detalhe
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime, timezone
+from typing import Any
+
+from flask import Flask
+from flask.testing import FlaskClient
+
+from bench import datagen
+
+PRODUTOS_CSV_HEADER = (
+    "sku,nome,categoria,fornecedor,custo,preco,quantidade_atual,estoque_minimo\n"
+)
+
+
+class Contexto:
+    def __init__(self, app: Flask, args: argparse.Namespace) -> None:
+        self.app = app
+        self.args = args
+        self.db_path: str = app.config["DB_PATH"]
+        self.client: FlaskClient = app.test_client()
+        self.rng = random.Random(args.seed)
+
+
+Cenario = Callable[[Contexto], dict[str, Any]]
+CENARIOS: dict[str, Cenario] = {}
+
+
+def cenario(nome: str) -> Callable[[Cenario], Cenario]:
+    def registrar(fn: Cenario) -> Cenario:
+        CENARIOS[nome] = fn
+        return fn
+
+    return registrar
+
+
+def percentil(amostras: list[float], p: float) -> float:
+    """Percentil por nearest-rank (amostras em qualquer ordem)."""
+
+    if not amostras:
+        return 0.0
+    ordenadas = sorted(amostras)
+    k = max(0, min(len(ordenadas) - 1, round(p / 100 * len(ordenadas)) - 1))
+    return ordenadas[k]
+
+
+def resumo(amostras: list[float], segundos: float, operacoes: int) -> dict[str, Any]:
+    ms = [a * 1000 for a in amostras]
+    return {
+        "operacoes": operacoes,
+        "p50_ms": round(percentil(ms, 50), 3),
+        "p95_ms": round(percentil(ms, 95), 3),
+        "p99_ms": round(percentil(ms, 99), 3),
+        "throughput_ops_s": round(operacoes / segundos, 2) if segundos else 0.0,
+    }
+
+
+def latencias(fn: Callable[[], object], repeticoes: int) -> dict[str, Any]:
+    fn()  # aquecimento
+    amostras = []
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        fn()
+        amostras.append(time.perf_counter() - t0)
+    return resumo(amostras, time.perf_counter() - inicio, repeticoes)
+
+
+def pico_memoria_kb(fn: Callable[[], object]) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(pico / 1024, 1)
+
+
+def _get(client: FlaskClient, url: str) -> None:
+    res = client.get(url)
+    if res.status_code != 200:
+        raise RuntimeError(f"GET {url} -> {res.status_code}")
+
+
+def _medir_get(ctx: Contexto, urls: list[str]) -> dict[str, Any]:
+    it = iter(urls * (ctx.args.repeticoes // len(urls) + 2))
+    resultado = latencias(lambda: _get(ctx.client, next(it)), ctx.args.repeticoes)
+    if ctx.args.memoria:
+        resultado["pico_memoria_kb"] = pico_memoria_kb(
+            lambda: _get(ctx.client, urls[0])
+        )
+    return resultado
+
+
+@cenario("produtos_list")
+def bench_produtos_list(ctx: Contexto) -> dict[str, Any]:
+    return _medir_get(ctx, ["/produtos"])
+
+
+@cenario("produtos_list_filtros")
+def bench_produtos_list_filtros(ctx: Contexto) -> dict[str, Any]:
+    urls = [
+        "/produtos?q=Produto%20000",
+        "/produtos?categoria=Categoria%2007",
+        "/produtos?fornecedor=Fornecedor%20042",
+        "/produtos?q=SKU-00001&categoria=Categoria%2001",
+    ]
+    return _medir_get(ctx, urls)
+
+
+@cenario("produto_detalhe")
+def bench_produto_detalhe(ctx: Contexto) -> dict[str, Any]:
+    n = max(1, ctx.args.produtos)
+    urls = [f"/produtos/{ctx.rng.randint(1, n)}" for _ in range(50)]
+    return _medir_get(ctx, urls)
+
+
+@cenario("analytics")
+def bench_analytics(ctx: Contexto) -> dict[str, Any]:
+    """Consumo/cobertura do último mês do livro (totais diários já em dia)."""
+
+    fim = datagen.FIM_PADRAO
+    periodo = f"desde={fim.replace(month=12, year=fim.year - 1)}&ate={fim}"
+    urls = [
+        f"/api/v1/analytics/consumo?{periodo}",
+        f"/api/v1/analytics/consumo?{periodo}&por=fornecedor",
+        f"/api/v1/analytics/serie?{periodo}&intervalo=semana",
+    ]
+    return _medir_get(ctx, urls)
+
+
+@cenario("reposicao")
+def bench_reposicao(ctx: Contexto) -> dict[str, Any]:
+    """Sugestão de reposição sobre o catálogo inteiro (90 dias até o fim do livro)."""
+
+    return _medir_get(ctx, [f"/api/v1/reposicao?ate={datagen.FIM_PADRAO}"])
+
+
+@cenario("movimentacoes_concorrentes")
+def bench_movimentacoes_concorrentes(ctx: Contexto) -> dict[str, Any]:
+    threads = ctx.args.threads
+    por_thread = max(1, ctx.args.repeticoes)
+    n = max(1, ctx.args.produtos)
+    amostras: list[float] = []
+    erros = 0
+    lock = threading.Lock()
+
+    def worker(seed: int) -> None:
+        nonlocal erros
+        client = ctx.app.test_client()
+        rng = random.Random(seed)
+        locais = []
+        falhas = 0
+        for _ in range(por_thread):
+            t0 = time.perf_counter()
+            res = client.post(
+                "/movimentacoes/nova",
+                data={
+                    "produto_id": str(rng.randint(1, n)),
+                    "tipo": "entrada",
+                    "quantidade": "1",
+                },
+            )
+            locais.append(time.perf_counter() - t0)
+            # Sucesso redireciona (302); erro re-renderiza o formulário (200).
+            if res.status_code != 302:
+                falhas += 1
+        with lock:
+            amostras.extend(locais)
+            erros += falhas
+
+    inicio = time.perf_counter()
+    ts = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    resultado = resumo(amostras, time.perf_counter() - inicio, len(amostras))
+    resultado.update({"threads": threads, "erros": erros})
+    return resultado
+
+
+def _csv_bytes(linhas: int, seed: int) -> bytes:
+    buf = io.StringIO()
+    buf.write(PRODUTOS_CSV_HEADER)
+    buf.writelines(datagen.linhas_csv(linhas, seed))
+    return buf.getvalue().encode("utf-8")
+
+
+def _importar(ctx: Contexto, data: bytes) -> None:
+    res = ctx.client.post(
+        "/csv/import/produtos",
+        data={"arquivo": (io.BytesIO(data), "produtos.csv")},
+        content_type="multipart/form-data",
+    )
+    if res.status_code != 200:
+        raise RuntimeError(f"import -> {res.status_code}")
+
+
+@cenario("csv")
+def bench_csv(ctx: Contexto) -> dict[str, Any]:
+    """Importação e exportação para cada tamanho em --csv (uma execução cada)."""
+
+    resultado: dict[str, Any] = {}
+    for linhas in ctx.args.csv:
+        data = _csv_bytes(linhas, ctx.args.seed)
+
+        t0 = time.perf_counter()
+        _importar(ctx, data)
+        seg = time.perf_counter() - t0
+        imp: dict[str, Any] = {
+            "linhas": linhas,
+            "segundos": round(seg, 3),
+            "linhas_s": round(linhas / seg, 1),
+        }
+        if ctx.args.memoria:
+            imp["pico_memoria_kb"] = pico_memoria_kb(lambda: _importar(ctx, data))
+        resultado[f"import_{linhas}"] = imp
+
+        # O catálogo agora tem pelo menos `linhas` produtos.
+        t0 = time.perf_counter()
+        total = ctx.client.get("/csv/export/produtos.csv").data.count(b"\n") - 1
+        seg = time.perf_counter() - t0
+        exp: dict[str, Any] = {
+            "linhas": total,
+            "segundos": round(seg, 3),
+            "linhas_s": round(total / seg, 1),
+        }
+        if ctx.args.memoria:
+            exp["pico_memoria_kb"] = pico_memoria_kb(
+                lambda: ctx.client.get("/csv/export/produtos.csv")
+            )
+        resultado[f"export_{linhas}"] = exp
+    return resultado
+
+
+BACKUP_PRAZO_S = 120.0
+
+
+@cenario("backup_concorrente")
+def bench_backup_concorrente(ctx: Contexto) -> dict[str, Any]:
+    """Latência de registrar movimentação sem e durante um backup online."""
+
+    from backup import fazer_backup
+    from movements_ui import registrar_movimentacao
+
+    n = max(1, ctx.args.produtos)
+
+    def registrar() -> None:
+        registrar_movimentacao(
+            ctx.db_path,
+            produto_id=ctx.rng.randint(1, n),
+            tipo="entrada",
+            quantidade=1,
+            observacao=None,
+        )
+
+    base = latencias(registrar, ctx.args.repeticoes)
+
+    resumo_backup: dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as destino:
+
+        def rodar_backup() -> None:
+            resumo_backup.update(fazer_backup(ctx.db_path, destino, manter=1))
+
+        t = threading.Thread(target=rodar_backup, daemon=True)
+        amostras: list[float] = []
+        inicio = time.perf_counter()
+        # Guarda contra um backup que não termina: as escritas param no prazo
+        # e o cenário reporta `backup_concluido: false` em vez de travar.
+        prazo = inicio + BACKUP_PRAZO_S
+        t.start()
+        while (t.is_alive() or len(amostras) < ctx.args.repeticoes) and (
+            time.perf_counter() < prazo
+        ):
+            t0 = time.perf_counter()
+            registrar()
+            amostras.append(time.perf_counter() - t0)
+        t.join(timeout=max(0.0, prazo - time.perf_counter()))
+        durante = resumo(amostras, time.perf_counter() - inicio, len(amostras))
+        concluido = not t.is_alive()
+
+    return {
+        "sem_backup": base,
+        "durante_backup": durante,
+        "backup_segundos": resumo_backup.get("segundos"),
+        "backup_bytes": resumo_backup.get("bytes"),
+        "backup_reinicios": resumo_backup.get("reinicios"),
+        "backup_concluido": concluido,
+    }
+
+
+_STARTUP_SCRIPT = """
+import time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+app = create_app()
+t2 = time.perf_counter()
+assert app.test_client().get("/").status_code == 200
+t3 = time.perf_counter()
+print(t1 - t0, t2 - t1, t3 - t2)
+"""
+
+
+@cenario("startup")
+def bench_startup(ctx: Contexto) -> dict[str, Any]:
+    """Import + create_app() + primeira requisição, num processo novo a cada vez.
+
+    Roda contra o banco já populado (schema atual), que é o caso de um restart.
+    """
+
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "DB_PATH": ctx.db_path}
+    partes: list[list[float]] = [[], [], []]
+    for _ in range(max(3, ctx.args.repeticoes // 5)):
+        out = subprocess.run(
+            [sys.executable, "-c", _STARTUP_SCRIPT],
+            cwd=backend,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        for lista, valor in zip(partes, out.stdout.split()):
+            lista.append(float(valor) * 1000)
+
+    totais = [sum(t) for t in zip(*partes)]
+    p50_total = percentil(totais, 50)
+    return {
+        "import_p50_ms": round(percentil(partes[0], 50), 3),
+        "create_app_p50_ms": round(percentil(partes[1], 50), 3),
+        "primeira_requisicao_p50_ms": round(percentil(partes[2], 50), 3),
+        "total_p50_ms": round(p50_total, 3),
+        "total_p95_ms": round(percentil(totais, 95), 3),
+        "orcamento_ms": ctx.args.orcamento_startup_ms,
+        "dentro_do_orcamento": p50_total <= ctx.args.orcamento_startup_ms,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def executar(args: argparse.Namespace) -> dict[str, Any]:
+    nomes = args.somente or list(CENARIOS)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DB_PATH"] = os.path.join(tmp, "app.db")
+        from app import create_app
+
+        app = create_app()
+        t0 = time.perf_counter()
+        datagen.gerar(
+            app.config["DB_PATH"],
+            produtos=args.produtos,
+            movimentos=args.movimentos,
+            seed=args.seed,
+        )
+        geracao = time.perf_counter() - t0
+
+        ctx = Contexto(app, args)
+        cenarios: dict[str, Any] = {}
+        for nome in nomes:
+            print(f"-> {nome}", flush=True)
+            cenarios[nome] = CENARIOS[nome](ctx)
+            print(f"   {json.dumps(cenarios[nome], ensure_ascii=False)}", flush=True)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "produtos": args.produtos,
+            "movimentos": args.movimentos,
+            "seed": args.seed,
+            "geracao_s": round(geracao, 3),
+        },
+        "cenarios": cenarios,
+    }
+
+
+def _achatar(d: dict[str, Any], prefixo: str = "") -> dict[str, float]:
+    out: dict[str, float] = {}
+    for k, v in d.items():
+        chave = f"{prefixo}{k}"
+        if isinstance(v, dict):
+            out.update(_achatar(v, chave + "."))
+        elif isinstance(v, (int, float)):
+            out[chave] = float(v)
+    return out
+
+
+def comparar(base_path: str, novo_path: str) -> None:
+    with open(base_path, encoding="utf-8") as f:
+        base = _achatar(json.load(f)["cenarios"])
+    with open(novo_path, encoding="utf-8") as f:
+        novo = _achatar(json.load(f)["cenarios"])
+
+    print(f"{'métrica':60s} {'base':>12s} {'novo':>12s} {'delta':>8s}")
+    for chave in sorted(base.keys() & novo.keys()):
+        b, n = base[chave], novo[chave]
+        delta = f"{(n - b) / b * 100:+.1f}%" if b else "-"
+        print(f"{chave:60s} {b:12.2f} {n:12.2f} {delta:>8s}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--produtos", type=int, default=10_000)
+    parser.add_argument("--movimentos", type=int, default=100_000)
+    parser.add_argument(
+        "--csv",
+        type=lambda s: [int(x) for x in s.split(",") if x],
+        default=[10_000],
+        help="tamanhos de CSV, ex.: 10000,100000,1000000",
+    )
+    parser.add_argument("--repeticoes", type=int, default=30)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--orcamento-startup-ms",
+        type=float,
+        default=1000.0,
+        help="orçamento de import + create_app + 1ª requisição (p50)",
+    )
+    parser.add_argument("--sem-memoria", dest="memoria", action="store_false")
+    parser.add_argument(
+        "--somente",
+        type=lambda s: [x for x in s.split(",") if x],
+        help=f"cenários: {', '.join(CENARIOS)}",
+    )
+    parser.add_argument("--saida", help="arquivo JSON de resultados")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NOVO"))
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+
+    desconhecidos = set(args.somente or ()) - CENARIOS.keys()
+    if desconhecidos:
+        parser.error(f"cenário(s) desconhecido(s): {', '.join(sorted(desconhecidos))}")
+
+    resultado = executar(args)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"resultados salvos em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
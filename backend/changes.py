@@ -0,0 +1,257 @@
+"""Feed de mudanças para sincronização incremental (ERP, réplicas).
+
+Triggers em `produtos` (insert/update/delete) e `movimentacoes` (insert)
+gravam em `mudancas` uma linha por alteração, com `seq` crescente. Quem
+sincroniza guarda o último `seq` que processou e pede só o que veio depois,
+em vez de reexportar o catálogo inteiro:
+
+    GET /api/v1/changes?since=<seq>&limit=N
+
+Cada item traz o estado atual do registro (`dados`), ou `null` quando ele foi
+excluído. Um registro alterado várias vezes aparece uma só vez por página, com
+o `seq` mais recente. Continue com `since=<cursor>` enquanto `mais` for true.
+
+Compactação (`python changes.py --dias 30`) apaga as entradas antigas em
+lotes. Um cursor anterior ao trecho compactado recebe 410: o cliente faz uma
+exportação completa e recomeça do `seq_atual` informado na resposta. A mesma
+compactação apaga os registros de exclusão (`produtos_excluidos`) usados pela
+exportação por `atualizado_desde`, que também recebe 410 para datas anteriores.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+from collections.abc import Callable
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from flask import Flask, request
+
+import db
+from api import MOVIMENTACAO_CAMPOS, json_response, parse_limit
+from products_ui import PRODUTO_CAMPOS
+
+CAMPOS = {"produtos": PRODUTO_CAMPOS, "movimentacoes": MOVIMENTACAO_CAMPOS}
+
+
+def compactado_ate(conn: sqlite3.Connection) -> int:
+    row = conn.execute(
+        "SELECT value FROM app_state WHERE key='mudancas_compactado_ate'"
+    ).fetchone()
+    return int(row[0]) if row else 0
+
+
+def excluidos_compactado_ate(conn: sqlite3.Connection) -> str | None:
+    row = conn.execute(
+        "SELECT value FROM app_state WHERE key='produtos_excluidos_compactado_ate'"
+    ).fetchone()
+    return row[0] if row else None
+
+
+def seq_atual(conn: sqlite3.Connection) -> int:
+    # sqlite_sequence guarda o maior seq já usado, mesmo com a tabela vazia.
+    row = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name='mudancas'"
+    ).fetchone()
+    return int(row[0]) if row else 0
+
+
+def ler(
+    conn: sqlite3.Connection, since: int, limit: int
+) -> tuple[list[dict[str, Any]], int, bool]:
+    """(itens, cursor, mais) das mudanças com seq > since."""
+
+    linhas = conn.execute(
+        """
+        SELECT seq, tabela, registro_id, operacao FROM mudancas
+        WHERE seq > ? ORDER BY seq LIMIT ?
+        """,
+        (since, limit + 1),
+    ).fetchall()
+    mais = len(linhas) > limit
+    linhas = linhas[:limit]
+    cursor = linhas[-1][0] if linhas else since
+
+    # Uma entrada por registro: a última da página vence.
+    ultimas: dict[tuple[str, int], tuple[int, str]] = {}
+    for seq, tabela, registro_id, operacao in linhas:
+        ultimas.pop((tabela, registro_id), None)
+        ultimas[(tabela, registro_id)] = (seq, operacao)
+
+    atuais: dict[tuple[str, int], dict[str, Any]] = {}
+    for tabela, campos in CAMPOS.items():
+        ids = [rid for t, rid in ultimas if t == tabela]
+        if not ids:
+            continue
+        cur = conn.execute(
+            f"""
+            SELECT {", ".join(campos)} FROM {tabela}
+            WHERE id IN (SELECT value FROM json_each(?))
+            """,
+            (json.dumps(ids),),
+        )
+        for row in cur:
+            atuais[(tabela, row[0])] = dict(zip(campos, row))
+
+    itens = [
+        {
+            "seq": seq,
+            "tabela": tabela,
+            "id": registro_id,
+            "operacao": operacao,
+            # Também None se o registro sumiu depois (excluído, arquivado).
+            "dados": atuais.get((tabela, registro_id)),
+        }
+        for (tabela, registro_id), (seq, operacao) in ultimas.items()
+    ]
+    return itens, cursor, mais
+
+
+def compactar(
+    db_path: str,
+    *,
+    antes_de: datetime,
+    lote: int = 5000,
+    pausa: float = 0.0,
+    progresso: Callable[[str], None] | None = None,
+) -> int:
+    """Apaga as mudanças com `criado_em < antes_de`. Retorna quantas apagou."""
+
+    apagadas = 0
+    with closing(db.connect(db_path)) as conn:
+        # seq cresce com o tempo: basta achar o último seq antes do corte.
+        row = conn.execute(
+            "SELECT MAX(seq) FROM mudancas WHERE criado_em < ?",
+            (antes_de.strftime("%Y-%m-%d %H:%M:%S"),),
+        ).fetchone()
+        limite = row[0] or 0
+        while True:
+            db.begin_immediate(conn)
+            inicio = compactado_ate(conn)
+            fim = min(inicio + lote, limite)
+            if fim <= inicio:
+                conn.commit()
+                break
+            cur = conn.execute(
+                "DELETE FROM mudancas WHERE seq > ? AND seq <= ?", (inicio, fim)
+            )
+            conn.execute(
+                "UPDATE app_state SET value=? WHERE key='mudancas_compactado_ate'",
+                (str(fim),),
+            )
+            conn.commit()
+
+            apagadas += cur.rowcount
+            if progresso is not None:
+                progresso(f"  {apagadas} mudanças compactadas (até seq {fim})")
+            if pausa:
+                time.sleep(pausa)
+    return apagadas
+
+
+def compactar_excluidos(
+    db_path: str,
+    *,
+    antes_de: datetime,
+    lote: int = 5000,
+    pausa: float = 0.0,
+    progresso: Callable[[str], None] | None = None,
+) -> int:
+    """Apaga os registros de exclusão com `excluido_em < antes_de`."""
+
+    corte = antes_de.strftime("%Y-%m-%d %H:%M:%S")
+    apagados = 0
+    with closing(db.connect(db_path)) as conn:
+        while True:
+            db.begin_immediate(conn)
+            cur = conn.execute(
+                """
+                DELETE FROM produtos_excluidos WHERE rowid IN (
+                    SELECT rowid FROM produtos_excluidos
+                    WHERE excluido_em < ? LIMIT ?
+                )
+                """,
+                (corte, lote),
+            )
+            # Antes do corte a exportação por data não sabe mais das exclusões.
+            conn.execute(
+                """
+                INSERT INTO app_state(key, value)
+                VALUES('produtos_excluidos_compactado_ate', ?)
+                ON CONFLICT(key) DO UPDATE SET value = max(value, excluded.value)
+                """,
+                (corte,),
+            )
+            conn.commit()
+
+            apagados += cur.rowcount
+            if cur.rowcount < lote:
+                break
+            if progresso is not None:
+                progresso(f"  {apagados} exclusões compactadas")
+            if pausa:
+                time.sleep(pausa)
+    return apagados
+
+
+def register_changes_routes(app: Flask, *, db_path: str) -> None:
+    @app.get("/api/v1/changes")
+    def api_changes():
+        raw = request.args.get("since") or "0"
+        if not raw.isdigit():
+            return json_response({"erro": "since deve ser um inteiro >= 0."}, 400)
+        since = int(raw)
+        limit = parse_limit(request.args.get("limit"))
+
+        with closing(db.connect(db_path)) as conn:
+            compactado = compactado_ate(conn)
+            if since < compactado:
+                return json_response(
+                    {
+                        "erro": "Cursor anterior à compactação do feed. Faça uma "
+                        "exportação completa e recomece de seq_atual.",
+                        "compactado_ate": compactado,
+                        "seq_atual": seq_atual(conn),
+                    },
+                    status=410,
+                )
+            itens, cursor, mais = ler(conn, since, limit)
+        return json_response({"itens": itens, "cursor": cursor, "mais": mais})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db", default=os.getenv("DB_PATH", "/data/app.db"))
+    parser.add_argument("--dias", type=int, help="manter os últimos N dias do feed")
+    parser.add_argument("--lote", type=int, default=5000)
+    parser.add_argument("--pausa", type=float, default=0.05, help="s entre lotes")
+    args = parser.parse_args()
+
+    if args.dias is None:
+        with closing(db.connect(args.db)) as conn:
+            print(f"seq atual: {seq_atual(conn)}")
+            print(f"compactado até: {compactado_ate(conn)}")
+            print(f"exclusões compactadas até: {excluidos_compactado_ate(conn) or '-'}")
+        return
+
+    # criado_em é CURRENT_TIMESTAMP (UTC).
+    antes_de = datetime.now(timezone.utc) - timedelta(days=args.dias)
+    apagadas = compactar(
+        args.db, antes_de=antes_de, lote=args.lote, pausa=args.pausa, progresso=print
+    )
+    print(f"mudanças compactadas: {apagadas}")
+    apagados = compactar_excluidos(
+        args.db, antes_de=antes_de, lote=args.lote, pausa=args.pausa, progresso=print
+    )
+    print(f"exclusões compactadas: {apagados}")
+
+
+if __name__ == "__main__":
+    main()
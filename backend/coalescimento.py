@@ -0,0 +1,59 @@
+"""Consultas idênticas concorrentes executadas uma vez só, por rota.
+
+Quando um painel é atualizado, dezenas de clientes pedem a mesma página ao
+mesmo tempo e cada um rodaria o mesmo SQL. Nas rotas configuradas, os helpers
+de leitura de `db` (`query_all`/`query_one`/`query_rows`) compartilham a
+execução: quem chega com a mesma consulta (SQL + parâmetros) enquanto ela roda
+espera e recebe o mesmo resultado. Com `ttl` > 0, o resultado ainda é
+reaproveitado por `ttl` segundos (pode ter até esse atraso em relação a
+escritas de outros processos; o commit de escritas deste processo, em
+conexões de `db.connect`, descarta os resultados guardados).
+
+Configuração: `COALESCER_ROTAS="produtos_list,api_produtos_list=0.5"` (nome da
+rota no Flask e, opcional, o ttl em segundos); vazio desliga. Com
+`METRICS_ENABLED=1`, `estoque_sql_coalesced_total{route,origem}` conta as
+execuções economizadas.
+"""
+
+from __future__ import annotations
+
+from contextvars import Token
+
+from flask import Flask, g, request
+
+import db
+
+# Listagens e relatórios que painéis atualizam juntos; só em andamento (ttl 0).
+ROTAS_PADRAO = (
+    "produtos_list,movimentacoes_list,api_produtos_list,api_movimentacoes_list,"
+    "analytics_consumo,analytics_serie,api_reposicao"
+)
+
+
+def parse_rotas(raw: str) -> dict[str, float]:
+    """`rota[=ttl],...` -> {rota: ttl}. Levanta ValueError se o ttl for inválido."""
+
+    rotas: dict[str, float] = {}
+    for item in raw.split(","):
+        nome, _, ttl = item.strip().partition("=")
+        if nome:
+            rotas[nome] = float(ttl) if ttl.strip() else 0.0
+    return rotas
+
+
+def register_coalescimento(app: Flask, *, rotas: dict[str, float]) -> None:
+    if not rotas:
+        return
+
+    @app.before_request
+    def _coalescimento_inicio():
+        if request.method == "GET" and request.endpoint in rotas:
+            g.coalescimento_token = db.coalescimento_atual.set(
+                (request.endpoint, rotas[request.endpoint])
+            )
+
+    @app.teardown_request
+    def _coalescimento_fim(exc):
+        token: Token | None = g.pop("coalescimento_token", None)
+        if token is not None:
+            db.coalescimento_atual.reset(token)
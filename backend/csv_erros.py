@@ -0,0 +1,88 @@
+"""Relatório de erros da importação CSV, gravado em disco à medida que ocorrem.
+
+Um arquivo ruim pode ter milhões de linhas com erro: em vez de acumular tudo
+numa lista e renderizar um `<li>` por erro, cada erro vai para um CSV
+temporário (`linha,erro`) e a memória guarda só a contagem por mensagem e as
+primeiras linhas de cada uma, que é o que a página mostra. A lista completa é
+baixada (servida direto do arquivo) em `GET /csv/import/erros/<token>.csv`.
+
+Os arquivos ficam em `diretorio` e são apagados depois de `RETENCAO_S`, na
+próxima importação com erros.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+import re
+import secrets
+import time
+from typing import Any, TextIO
+
+# Linhas de exemplo guardadas por mensagem e mensagens mostradas na página.
+EXEMPLOS_POR_GRUPO = 10
+GRUPOS_NA_PAGINA = 20
+RETENCAO_S = 24 * 3600
+
+TOKEN_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class RelatorioErros:
+    def __init__(self, diretorio: str) -> None:
+        self.diretorio = diretorio
+        self.total = 0
+        self.token: str | None = None
+        # mensagem -> [quantidade, primeiras linhas]
+        self._grupos: dict[str, list] = {}
+        self._arquivo: TextIO | None = None
+        self._writer: Any = None
+
+    def registrar(self, linha: int, msg: str) -> None:
+        self.total += 1
+        grupo = self._grupos.get(msg)
+        if grupo is None:
+            grupo = self._grupos[msg] = [0, []]
+        grupo[0] += 1
+        if len(grupo[1]) < EXEMPLOS_POR_GRUPO:
+            grupo[1].append(linha)
+        if self._writer is None:
+            self._abrir()
+        self._writer.writerow((linha, msg))
+
+    def _abrir(self) -> None:
+        os.makedirs(self.diretorio, exist_ok=True)
+        limpar_antigos(self.diretorio)
+        self.token = secrets.token_hex(16)
+        self._arquivo = open(
+            caminho(self.diretorio, self.token), "w", encoding="utf-8", newline=""
+        )
+        self._writer = csv.writer(self._arquivo)
+        self._writer.writerow(("linha", "erro"))
+
+    def fechar(self) -> None:
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+    def grupos(self) -> list[dict[str, object]]:
+        """Mensagens mais frequentes, com a quantidade e as primeiras linhas."""
+
+        ordenados = sorted(self._grupos.items(), key=lambda g: -g[1][0])
+        return [
+            {"msg": msg, "quantidade": quantidade, "linhas": sorted(linhas)}
+            for msg, (quantidade, linhas) in ordenados[:GRUPOS_NA_PAGINA]
+        ]
+
+
+def caminho(diretorio: str, token: str) -> str:
+    return os.path.join(diretorio, f"erros-{token}.csv")
+
+
+def limpar_antigos(diretorio: str) -> None:
+    limite = time.time() - RETENCAO_S
+    for entrada in os.scandir(diretorio):
+        if entrada.name.startswith("erros-") and entrada.stat().st_mtime < limite:
+            try:
+                os.remove(entrada.path)
+            except FileNotFoundError:
+                pass
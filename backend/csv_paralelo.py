@@ -0,0 +1,140 @@
+"""Validação em paralelo da importação de produtos (opcional, arquivos grandes).
+
+O texto (lido em streaming) é dividido em blocos que terminam em fim de registro: um `\\n` só
+encerra o registro se o número de aspas antes dele é par (aspas escapadas
+`""` não mudam a paridade), então quebras de linha dentro de campos entre
+aspas não partem um registro. Cada bloco é convertido por `EsquemaImportacao`
+num processo separado; os resultados voltam na ordem do arquivo, numerados
+como na importação sequencial, para um único escritor (a rota).
+
+Os processos usam `spawn`: o app roda com threads, e `fork` copiaria locks
+tomados por outras threads. Por isso este módulo só importa a biblioteca
+padrão e `csv_schema`.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import multiprocessing
+import os
+from collections import deque
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import IO
+
+from csv_schema import EsquemaImportacao, Produto
+
+# Tamanho alvo de cada bloco (caracteres). Abaixo de dois blocos não compensa
+# subir os processos.
+TAMANHO_BLOCO = 4 * 1024 * 1024
+
+
+def fim_do_registro(text: str, contado: int, pos: int, aspas: int) -> tuple[int, int]:
+    """Primeiro fim de registro a partir de `pos` (índice logo após o `\\n`).
+
+    `aspas` é o número de aspas em text[:contado]; devolve (fim, aspas em
+    text[:fim]). Sem outro `\\n`, o registro vai até o fim do texto.
+    """
+
+    while True:
+        nl = text.find("\n", pos)
+        if nl < 0:
+            return len(text), aspas + text.count('"', contado)
+        aspas += text.count('"', contado, nl)
+        contado = nl
+        if aspas % 2 == 0:
+            return nl + 1, aspas
+        pos = nl + 1
+
+
+def _ultimo_fim(texto: str) -> int:
+    """Índice logo após o último fim de registro de `texto`, ou 0 se não há.
+
+    `texto` começa num início de registro (paridade de aspas zero).
+    """
+
+    aspas = texto.count('"')
+    fim = len(texto)
+    nl = texto.rfind("\n")
+    while nl >= 0:
+        aspas -= texto.count('"', nl, fim)
+        if aspas % 2 == 0:
+            return nl + 1
+        fim, nl = nl, texto.rfind("\n", 0, nl)
+    return 0
+
+
+def dividir(arquivo: IO[str], tamanho: int | None = None) -> tuple[str, Iterator[str]]:
+    """(header, blocos de registros completos), lendo `arquivo` aos poucos.
+
+    Os blocos são gerados sob demanda, então um upload descompactado em
+    streaming não fica inteiro em memória.
+    """
+
+    tamanho = tamanho or TAMANHO_BLOCO
+    texto = ""
+    while True:
+        lido = arquivo.read(tamanho)
+        texto += lido
+        fim_header, _ = fim_do_registro(texto, 0, 0, 0)
+        if fim_header < len(texto) or not lido:
+            break
+
+    def blocos() -> Iterator[str]:
+        pendente = texto[fim_header:]
+        while True:
+            lido = arquivo.read(tamanho)
+            if not lido:
+                if pendente:
+                    yield pendente
+                return
+            pendente += lido
+            corte = _ultimo_fim(pendente)
+            if corte:
+                yield pendente[:corte]
+                pendente = pendente[corte:]
+
+    return texto[:fim_header], blocos()
+
+
+def converter_bloco(
+    header: Sequence[str], bloco: str
+) -> list[tuple[int, Produto | str]]:
+    """Executado nos processos: (índice no bloco, tupla ou erro) por registro."""
+
+    esquema = EsquemaImportacao(header)
+    return list(esquema.linhas(csv.reader(io.StringIO(bloco)), inicio=0))
+
+
+def converter_em_paralelo(
+    header: Sequence[str],
+    blocos: Iterable[str],
+    *,
+    processos: int | None = None,
+    inicio: int = 2,
+) -> Iterator[tuple[int, Produto | str]]:
+    """Como `EsquemaImportacao.linhas`, mas com os blocos convertidos em paralelo.
+
+    No máximo dois blocos por processo ficam em voo, para a memória não crescer
+    se o escritor for mais lento que a validação.
+    """
+
+    processos = processos or os.cpu_count() or 1
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processos, mp_context=contexto) as pool:
+        pendentes: deque[Future[list[tuple[int, Produto | str]]]] = deque()
+        restantes = iter(blocos)
+        for bloco in restantes:
+            pendentes.append(pool.submit(converter_bloco, header, bloco))
+            if len(pendentes) >= 2 * processos:
+                break
+        deslocamento = inicio
+        while pendentes:
+            resultado = pendentes.popleft().result()
+            proximo = next(restantes, None)
+            if proximo is not None:
+                pendentes.append(pool.submit(converter_bloco, header, proximo))
+            for idx, valores in resultado:
+                yield deslocamento + idx, valores
+            deslocamento += len(resultado)
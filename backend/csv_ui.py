@@ -10,89 +10,186 @@ Escopo:
 Rotas:
 - GET  /csv (tela)
 - GET  /csv/template/produtos.csv
-- GET  /csv/export/produtos.csv
-- POST /csv/import/produtos
-- GET  /csv/export/movimentacoes.csv
+- GET  /csv/export/produtos.csv         (arquivo pré-gerado por versão dos dados, com
+                                       Range/ETag; ?atualizado_desde= só o que mudou)
+                                       (as exportações aceitam ?format=csv|ndjson|colunar;
+                                       também sem a extensão: /csv/export/produtos)
+- POST /csv/import/produtos          (.csv, .csv.gz ou .zip; paralelo=1: validação
+                                       num pool de processos; simular=1: só o diff)
+- GET  /csv/import/erros/<token>.csv   (todos os erros de uma importação)
+- GET  /csv/export/movimentacoes.csv   (?desde=&ate= inclui o histórico arquivado)
 """
 
 from __future__ import annotations
 
 import csv
+import hashlib
 import io
+import json
+import os
 import sqlite3
+import time
+import weakref
+import zlib
+from collections.abc import Callable, Iterable, Iterator, Sequence
 from contextlib import closing
+from datetime import datetime, timezone
+from itertools import chain
+
+from flask import (
+    Flask,
+    Response,
+    redirect,
+    render_template_string,
+    request,
+    send_file,
+    url_for,
+)
+
+import csv_erros
+import csv_paralelo
+import db
+import metrics
+from archive import fonte_movimentacoes, intervalo_datas
+from changes import excluidos_compactado_ate
+from csv_schema import (
+    ORDEM_VALORES,
+    PRODUTOS_HEADERS,
+    EsquemaImportacao,
+    Produto,
+    diferencas,
+)
+from csv_erros import RelatorioErros
+from csv_upload import abrir_texto
+from events import barramento
+from export_arquivos import ExportacaoMaterializada
+from export_formatos import FORMATOS, Coluna, Formato
+from products_ui import INSERT_PRODUTO_SQL
+
+
+# Colunas exportadas, com o tipo usado no formato colunar.
+PRODUTOS_COLUNAS: list[Coluna] = [
+    ("sku", "texto"),
+    ("nome", "texto"),
+    ("categoria", "texto"),
+    ("fornecedor", "texto"),
+    ("custo", "decimal"),
+    ("preco", "decimal"),
+    ("quantidade_atual", "inteiro"),
+    ("estoque_minimo", "inteiro"),
+]
+# Exportação incremental: as colunas de produtos + quando mudou + tombstone.
+PRODUTOS_DELTA_COLUNAS: list[Coluna] = [
+    *PRODUTOS_COLUNAS,
+    ("atualizado_em", "texto"),
+    ("excluido", "inteiro"),
+]
+MOVIMENTACOES_COLUNAS: list[Coluna] = [
+    ("id", "inteiro"),
+    ("criado_em", "texto"),
+    ("produto_sku", "texto"),
+    ("produto_nome", "texto"),
+    ("tipo", "texto"),
+    ("quantidade", "inteiro"),
+    ("observacao", "texto"),
+]
 
-from flask import Flask, Response, redirect, render_template_string, request, url_for
+# Linhas por transação na importação.
+LOTE_IMPORTACAO = 500
 
+# Mudanças (novos/alterados com os campos) listadas no resultado da importação.
+LIMITE_MUDANCAS = 200
 
-PRODUTOS_HEADERS = [
-    "sku",
-    "nome",
-    "categoria",
-    "fornecedor",
-    "custo",
-    "preco",
-    "quantidade_atual",
-    "estoque_minimo",
-]
+# Recuo do `X-Exportado-Em` da exportação por `atualizado_desde`: maior que a
+# transação de escrita mais longa (um lote de importação leva milissegundos).
+MARGEM_DELTA_S = 60
 
+# Colunas de produtos na ordem da tupla de importação (ORDEM_VALORES).
+COLUNAS_VALORES = ", ".join(ORDEM_VALORES)
 
-def register_csv_routes(app: Flask, *, db_path: str, base_style: str) -> None:
-    def query_all(sql: str, params: tuple = ()) -> list[sqlite3.Row]:
-        with closing(sqlite3.connect(db_path)) as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.execute(sql, params)
-            return list(cur.fetchall())
-
-    def execute(sql: str, params: tuple = ()) -> None:
-        with closing(sqlite3.connect(db_path)) as conn:
-            conn.execute(sql, params)
-            conn.commit()
-
-    def upsert_produto(row: dict[str, str]) -> tuple[bool, str]:
-        """Cria/atualiza produto pelo SKU. Retorna (ok, msg)."""
-
-        sku = (row.get("sku") or "").strip()
-        nome = (row.get("nome") or "").strip()
-        if not sku:
-            return False, "SKU é obrigatório"
-        if not nome:
-            return False, "Nome é obrigatório"
-
-        categoria = (row.get("categoria") or "").strip() or None
-        fornecedor = (row.get("fornecedor") or "").strip() or None
-
-        def parse_int(value: str | None) -> int:
-            v = (value or "").strip()
-            if v == "":
-                return 0
-            if not v.lstrip("-").isdigit():
-                raise ValueError("inteiro inválido")
-            return int(v)
-
-        def parse_float(value: str | None) -> float:
-            v = (value or "").strip().replace(",", ".")
-            if v == "":
-                return 0.0
-            return float(v)
 
-        try:
-            custo = parse_float(row.get("custo"))
-            preco = parse_float(row.get("preco"))
-            quantidade_atual = parse_int(row.get("quantidade_atual"))
-            estoque_minimo = parse_int(row.get("estoque_minimo"))
-        except ValueError:
-            return False, "Campos numéricos inválidos (custo/preco/quantidades)"
+def parse_atualizado_desde(raw: str) -> str | None:
+    """Normaliza `AAAA-MM-DD[THH:MM:SS[+TZ]]` para o formato do CURRENT_TIMESTAMP.
 
-        try:
-            with closing(sqlite3.connect(db_path)) as conn:
-                conn.execute("BEGIN")
-                existing = conn.execute(
-                    "SELECT id FROM produtos WHERE sku=?", (sku,)
-                ).fetchone()
-
-                if existing:
-                    conn.execute(
+    `atualizado_em` é gravado em UTC; horário com fuso é convertido, sem fuso
+    é tratado como UTC. Retorna None se inválido.
+    """
+
+    try:
+        momento = datetime.fromisoformat(raw.strip())
+    except ValueError:
+        return None
+    if momento.tzinfo is not None:
+        momento = momento.astimezone(timezone.utc)
+    return momento.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def resumo_valores(valores: Sequence) -> bytes:
+    """blake2b dos valores em JSON: iguais só se os valores forem iguais.
+
+    `hash()` colide fácil (`hash(-1) == hash(-2)`) e uma colisão faria uma
+    alteração real passar por "inalterada".
+    """
+
+    texto = json.dumps(list(valores), ensure_ascii=False)
+    return hashlib.blake2b(texto.encode(), digest_size=16).digest()
+
+
+def register_csv_routes(
+    app: Flask,
+    *,
+    db_path: str,
+    base_style: str,
+    processos: int | None = None,
+    erros_dir: str | None = None,
+    export_dir: str | None = None,
+) -> None:
+    erros_dir = erros_dir or os.path.join(os.path.dirname(db_path), "import-erros")
+    produtos_materializados = ExportacaoMaterializada(
+        db_path=db_path,
+        diretorio=export_dir or os.path.join(os.path.dirname(db_path), "exports"),
+        nome="produtos",
+        colunas=PRODUTOS_COLUNAS,
+        sql="""
+            SELECT sku, nome, categoria, fornecedor, custo, preco, quantidade_atual, estoque_minimo
+            FROM produtos
+            ORDER BY nome ASC
+        """,
+    )
+    app.extensions["exportacao_produtos"] = produtos_materializados
+    # A thread de regeneração vive enquanto o app existir.
+    weakref.finalize(app, produtos_materializados.parar, 0)
+
+    def carregar_atuais(conn: sqlite3.Connection) -> dict[str, bytes]:
+        """SKU → resumo da linha atual, numa única consulta lida em streaming.
+
+        Guardar só o resumo (e não a linha) mantém o mapa pequeno em catálogos
+        grandes; a linha completa só é lida para mostrar as diferenças.
+        """
+
+        return {
+            row[1]: resumo_valores(row)
+            for row in conn.execute(f"SELECT {COLUNAS_VALORES} FROM produtos")
+        }
+
+    def gravar_lote(
+        conn: sqlite3.Connection,
+        lote: list[tuple[int, Produto, bool]],
+        erros: RelatorioErros,
+    ) -> tuple[int, int]:
+        """Grava (linha, valores, novo) numa transação. Retorna (criados, atualizados).
+
+        Uma violação de constraint no SQLite desfaz só o comando que falhou, não
+        a transação: a linha vai para `erros` e o resto do lote é gravado.
+        """
+
+        criados = atualizados = 0
+        db.begin_immediate(conn)
+        for idx, valores, novo in lote:
+            nome, sku, categoria, fornecedor, custo, preco, atual, minimo = valores
+            try:
+                if not novo:
+                    cur = conn.execute(
                         """
                         UPDATE produtos
                         SET nome=?, categoria=?, fornecedor=?, custo=?, preco=?,
@@ -100,42 +197,18 @@ def register_csv_routes(app: Flask, *, db_path: str, base_style: str) -> None:
                             atualizado_em=CURRENT_TIMESTAMP
                         WHERE sku=?
                         """,
-                        (
-                            nome,
-                            categoria,
-                            fornecedor,
-                            float(custo),
-                            float(preco),
-                            int(quantidade_atual),
-                            int(estoque_minimo),
-                            sku,
-                        ),
+                        (nome, categoria, fornecedor, custo, preco, atual, minimo, sku),
                     )
-                    conn.commit()
-                    return True, "atualizado"
-
-                conn.execute(
-                    """
-                    INSERT INTO produtos(
-                      nome, sku, categoria, fornecedor, custo, preco,
-                      quantidade_atual, estoque_minimo
-                    ) VALUES(?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        nome,
-                        sku,
-                        categoria,
-                        fornecedor,
-                        float(custo),
-                        float(preco),
-                        int(quantidade_atual),
-                        int(estoque_minimo),
-                    ),
-                )
-                conn.commit()
-                return True, "criado"
-        except sqlite3.IntegrityError as e:
-            return False, f"Erro de integridade no banco: {e}"
+                    if cur.rowcount:
+                        atualizados += 1
+                        continue
+                # Novo pelo mapa carregado no início (ou excluído depois dele).
+                conn.execute(INSERT_PRODUTO_SQL, valores)
+                criados += 1
+            except sqlite3.IntegrityError as e:
+                erros.registrar(idx, f"Erro de integridade no banco: {e}")
+        conn.commit()
+        return criados, atualizados
 
     page_template = """
 <!doctype html>
@@ -162,12 +235,20 @@ def register_csv_routes(app: Flask, *, db_path: str, base_style: str) -> None:
         <a class="btn" href="{{ url_for('csv_template_produtos') }}">Baixar template (CSV)</a>
       </div>
 
+      <div class="spacer"></div>
+      <form method="get" action="{{ url_for('csv_export_produtos') }}" class="row">
+        <label>Alterados desde <input type="date" name="atualizado_desde" required /></label>
+        <button class="btn" type="submit">Exportar alterações (CSV)</button>
+      </form>
+
       <div class="spacer"></div>
 
       <form method="post" action="{{ url_for('csv_import_produtos') }}" enctype="multipart/form-data">
         <label>Importar produtos via CSV (cria/atualiza por SKU)<br />
-          <input type="file" name="arquivo" accept=".csv,text/csv" required />
+          <input type="file" name="arquivo" accept=".csv,.gz,.zip,text/csv" required />
         </label>
+        <label><input type="checkbox" name="paralelo" value="1" /> Validar em paralelo (arquivos grandes)</label>
+        <label><input type="checkbox" name="simular" value="1" /> Só simular (mostra o que mudaria, sem gravar)</label>
         <div class="spacer"></div>
         <button class="btn" type="submit">Importar</button>
       </form>
@@ -175,31 +256,66 @@ def register_csv_routes(app: Flask, *, db_path: str, base_style: str) -> None:
       <div class="spacer"></div>
 
       {% if resultado %}
-        <h3>Resultado</h3>
+        <h3>{{ "Simulação (nada foi gravado)" if resultado.simulacao else "Resultado" }}</h3>
         <div class="ok">
           Linhas processadas: <strong>{{ resultado.total }}</strong><br />
-          Criados: <strong>{{ resultado.criados }}</strong> | Atualizados: <strong>{{ resultado.atualizados }}</strong> | Erros: <strong>{{ resultado.erros|length }}</strong>
+          {% if resultado.simulacao %}
+          Novos: <strong>{{ resultado.criados }}</strong> | Alterados: <strong>{{ resultado.atualizados }}</strong>
+          {% else %}
+          Criados: <strong>{{ resultado.criados }}</strong> | Atualizados: <strong>{{ resultado.atualizados }}</strong>
+          {% endif %}
+          | Inalterados: <strong>{{ resultado.inalterados }}</strong> | Erros: <strong>{{ resultado.erros }}</strong>
         </div>
 
+        {% if resultado.mudancas %}
+          <div class="spacer"></div>
+          <strong>Mudanças{% if resultado.mudancas|length < resultado.criados + resultado.atualizados %} (primeiras {{ resultado.mudancas|length }}){% endif %}:</strong>
+          <ul>
+            {% for m in resultado.mudancas %}
+              <li>Linha {{ m.linha }}: <code>{{ m.sku }}</code>
+                {% if m.novo %}novo{% else %}
+                  {% for campo, antes, depois in m.campos %}{{ campo }}: {{ antes }} → {{ depois }}{% if not loop.last %}; {% endif %}{% endfor %}
+                {% endif %}
+              </li>
+            {% endfor %}
+          </ul>
+        {% endif %}
+
         {% if resultado.erros %}
           <div class="spacer"></div>
           <div class="error">
-            <strong>Erros (por linha):</strong>
+            <strong>Erros por tipo:</strong>
             <ul>
-              {% for e in resultado.erros %}
-                <li>Linha {{ e.linha }}: {{ e.msg }}</li>
+              {% for g in resultado.grupos %}
+                <li>{{ g.msg }}: {{ g.quantidade }} — linhas {{ g.linhas|join(", ") }}{% if g.quantidade > g.linhas|length %}, …{% endif %}</li>
               {% endfor %}
             </ul>
+            {% if resultado.erros_token %}
+              <a class="btn" href="{{ url_for('csv_import_erros', token=resultado.erros_token) }}">Baixar todos os erros (CSV)</a>
+            {% endif %}
           </div>
         {% endif %}
       {% endif %}
 
+      <div class="spacer"></div>
+      <h2>Reposição</h2>
+      <div class="row">
+        <a class="btn" href="{{ url_for('csv_export_reposicao') }}">Sugestão de reposição por fornecedor (CSV)</a>
+      </div>
+
       <div class="spacer"></div>
       <h2>Movimentações (export opcional)</h2>
       <div class="row">
         <a class="btn" href="{{ url_for('csv_export_movimentacoes') }}">Exportar movimentações (CSV)</a>
       </div>
 
+      <div class="spacer"></div>
+      <form method="get" action="{{ url_for('csv_export_movimentacoes') }}" class="row">
+        <label>De <input type="date" name="desde" /></label>
+        <label>Até <input type="date" name="ate" /></label>
+        <button class="btn" type="submit">Exportar período (inclui arquivo)</button>
+      </form>
+
       <div class="spacer"></div>
       <p class="muted">Obs.: Importação de movimentações está fora de escopo.</p>
     </div>
@@ -241,123 +357,324 @@ def register_csv_routes(app: Flask, *, db_path: str, base_style: str) -> None:
             },
         )
 
-    @app.get("/csv/export/produtos.csv")
-    def csv_export_produtos():
-        rows = query_all(
-            """
-            SELECT sku, nome, categoria, fornecedor, custo, preco, quantidade_atual, estoque_minimo
-            FROM produtos
-            ORDER BY nome ASC
-            """
+    def exportar(
+        formato: Formato,
+        arquivo: str,
+        entidade: str,
+        colunas: Sequence[Coluna],
+        linhas: Callable[[sqlite3.Connection], Iterable[Sequence]],
+        headers: dict[str, str] | None = None,
+    ) -> Response:
+        """Resposta em streaming com `linhas(conn)` serializadas em `formato`."""
+
+        inicio = time.perf_counter()
+
+        def gerar() -> Iterable[bytes]:
+            total = 0
+
+            def contar(rows: Iterable[Sequence]) -> Iterable[Sequence]:
+                nonlocal total
+                for row in rows:
+                    total += 1
+                    yield row
+
+            # Conexão aberta no gerador: vive enquanto o cliente consome o stream
+            # (somente leitura, fora do pool para não prender uma vaga).
+            with closing(db.conectar_leitura(db_path)) as conn:
+                yield from formato.gerar(colunas, contar(linhas(conn)))
+            metrics.observar_csv("export", entidade, total, inicio)
+
+        return Response(
+            gerar(),
+            mimetype=formato.mimetype,
+            headers={
+                "Content-Disposition": (
+                    f'attachment; filename="{arquivo}.{formato.extensao}"'
+                ),
+                **(headers or {}),
+            },
         )
-        buf = io.StringIO()
-        writer = csv.DictWriter(buf, fieldnames=PRODUTOS_HEADERS)
-        writer.writeheader()
-        for r in rows:
-            writer.writerow(
-                {k: ("" if r[k] is None else r[k]) for k in PRODUTOS_HEADERS}
-            )
-        data = buf.getvalue().encode("utf-8")
+
+    def formato_pedido() -> Formato | None:
+        return FORMATOS.get(request.args.get("format") or "csv")
+
+    def formato_invalido() -> Response:
         return Response(
-            data,
-            mimetype="text/csv; charset=utf-8",
-            headers={"Content-Disposition": 'attachment; filename="produtos.csv"'},
+            "format inválido (use " + ", ".join(FORMATOS) + ").", status=400
+        )
+
+    def exportar_delta(desde: str, formato: Formato) -> Response:
+        """Produtos alterados e excluídos desde `desde`, em streaming.
+
+        Exclusões vêm primeiro: um SKU excluído e recriado depois termina com a
+        linha do produto atual. O header `X-Exportado-Em` é o `atualizado_desde`
+        da próxima sincronização: o horário da consulta menos `MARGEM_DELTA_S`,
+        porque uma escrita carimba `atualizado_em` antes do commit e pode ficar
+        visível só depois desta exportação. Linhas alteradas dentro da margem
+        se repetem na sincronização seguinte (aplique por SKU).
+        """
+
+        with db.leitura(db_path) as conn:
+            compactado = excluidos_compactado_ate(conn)
+        if compactado is not None and desde < compactado:
+            return Response(
+                "atualizado_desde anterior à compactação das exclusões "
+                f"({compactado}). Faça uma exportação completa.",
+                status=410,
+            )
+        agora = db.query_one(
+            db_path,
+            "SELECT datetime('now', ?) AS agora",
+            (f"-{MARGEM_DELTA_S} seconds",),
+        )
+        exportado_em = agora["agora"] if agora else ""
+
+        def linhas(conn: sqlite3.Connection) -> Iterable[Sequence]:
+            vazios = [None] * (len(PRODUTOS_COLUNAS) - 1)
+            for sku, excluido_em in conn.execute(
+                """
+                SELECT sku, excluido_em FROM produtos_excluidos
+                WHERE excluido_em >= ? ORDER BY excluido_em
+                """,
+                (desde,),
+            ):
+                yield [sku, *vazios, excluido_em, 1]
+            yield from conn.execute(
+                """
+                SELECT sku, nome, categoria, fornecedor, custo, preco,
+                       quantidade_atual, estoque_minimo, atualizado_em, 0
+                FROM produtos
+                WHERE atualizado_em >= ?
+                ORDER BY atualizado_em
+                """,
+                (desde,),
+            )
+
+        return exportar(
+            formato,
+            "produtos-delta",
+            "produtos",
+            PRODUTOS_DELTA_COLUNAS,
+            linhas,
+            headers={"X-Exportado-Em": exportado_em},
         )
 
+    @app.get("/csv/export/produtos")
+    @app.get("/csv/export/produtos.csv")
+    def csv_export_produtos():
+        formato = formato_pedido()
+        if formato is None:
+            return formato_invalido()
+        raw_desde = request.args.get("atualizado_desde")
+        if raw_desde:
+            desde = parse_atualizado_desde(raw_desde)
+            if desde is None:
+                return Response(
+                    "atualizado_desde inválido (use AAAA-MM-DD ou AAAA-MM-DDTHH:MM:SS).",
+                    status=400,
+                )
+            return exportar_delta(desde, formato)
+
+        nome_formato = request.args.get("format") or "csv"
+        path, versao = produtos_materializados.arquivo(nome_formato)
+        res = send_file(
+            path,
+            mimetype=formato.mimetype,
+            as_attachment=True,
+            download_name=f"produtos.{formato.extensao}",
+            conditional=True,
+            etag=f"produtos-v{versao}-{nome_formato}",
+            max_age=0,
+        )
+        res.headers["X-Versao-Dados"] = str(versao)
+        return res
+
+    def descrever(
+        conn: sqlite3.Connection, idx: int, valores: Produto, novo: bool
+    ) -> dict[str, object]:
+        campos: list[tuple[str, object, object]] = []
+        if not novo:
+            atual = conn.execute(
+                f"SELECT {COLUNAS_VALORES} FROM produtos WHERE sku=?", (valores[1],)
+            ).fetchone()
+            campos = diferencas(atual, valores) if atual else []
+        return {"linha": idx, "sku": valores[1], "novo": novo, "campos": campos}
+
     @app.post("/csv/import/produtos")
     def csv_import_produtos():
         f = request.files.get("arquivo")
         if f is None:
             return redirect(url_for("csv_home"))
 
-        raw = f.read()
-        try:
-            text = raw.decode("utf-8-sig")
-        except UnicodeDecodeError:
-            # fallback para latin-1
-            text = raw.decode("latin-1")
-
-        reader = csv.DictReader(io.StringIO(text))
-        headers = reader.fieldnames or []
+        inicio = time.perf_counter()
 
-        missing = [h for h in PRODUTOS_HEADERS if h not in headers]
-        if missing:
+        def invalido(msg: str) -> str:
             resultado = {
                 "total": 0,
                 "criados": 0,
                 "atualizados": 0,
-                "erros": [
-                    {
-                        "linha": 1,
-                        "msg": f"CSV inválido: colunas obrigatórias ausentes: {', '.join(missing)}",
-                    }
-                ],
+                "inalterados": 0,
+                "erros": 1,
+                "grupos": [{"msg": msg, "quantidade": 1, "linhas": [1]}],
             }
             return render_template_string(
                 page_template, base_style=base_style, resultado=resultado
             )
 
+        # CSV puro, .csv.gz ou .zip, descompactado à medida que é lido.
+        paralelo = request.form.get("paralelo") == "1"
+        simular = request.form.get("simular") == "1"
+        try:
+            texto = abrir_texto(f.stream)
+            if paralelo:
+                header_texto, blocos = csv_paralelo.dividir(texto)
+                reader = csv.reader(io.StringIO(header_texto))
+            else:
+                reader = csv.reader(texto)
+            header = next(reader, [])
+        except (ValueError, OSError, EOFError, zlib.error) as e:
+            return invalido(f"Arquivo inválido: {e}")
+        esquema = EsquemaImportacao(header)
+
+        missing = esquema.faltando
+        if missing:
+            return invalido(
+                f"CSV inválido: colunas obrigatórias ausentes: {', '.join(missing)}"
+            )
+
+        linhas: Iterator[tuple[int, Produto | str]]
+        if paralelo:
+            primeiro = next(blocos, "")
+            segundo = next(blocos, None)
+            if segundo is None:
+                # Arquivo pequeno: subir os processos custaria mais que validar.
+                linhas = esquema.linhas(csv.reader(io.StringIO(primeiro)))
+            else:
+                linhas = csv_paralelo.converter_em_paralelo(
+                    header, chain([primeiro, segundo], blocos), processos=processos
+                )
+        else:
+            linhas = esquema.linhas(reader)
+
         total = 0
         criados = 0
         atualizados = 0
-        erros: list[dict[str, object]] = []
-
-        for idx, row in enumerate(reader, start=2):
-            total += 1
-            ok, msg = upsert_produto(row)
-            if not ok:
-                erros.append({"linha": idx, "msg": msg})
-                continue
-            if msg == "criado":
-                criados += 1
-            elif msg == "atualizado":
-                atualizados += 1
-
+        inalterados = 0
+        erros = RelatorioErros(erros_dir)
+        mudancas: list[dict[str, object]] = []
+
+        # Um único escritor: valida (aqui ou nos processos), compara com o mapa
+        # de SKUs carregado uma vez e grava em lotes só o que muda.
+        with closing(db.connect(db_path)) as conn:
+            atuais = carregar_atuais(conn)
+            lote: list[tuple[int, Produto, bool]] = []
+            try:
+                for idx, valores in linhas:
+                    total += 1
+                    if isinstance(valores, str):
+                        erros.registrar(idx, valores)
+                        continue
+                    sku = valores[1]
+                    chave = resumo_valores(valores)
+                    anterior = atuais.get(sku)
+                    if anterior == chave:
+                        inalterados += 1
+                        continue
+                    novo = anterior is None
+                    if len(mudancas) < LIMITE_MUDANCAS:
+                        mudancas.append(descrever(conn, idx, valores, novo))
+                    # Um SKU repetido no arquivo compara com a versão anterior.
+                    atuais[sku] = chave
+                    if simular:
+                        criados += novo
+                        atualizados += not novo
+                        continue
+                    lote.append((idx, valores, novo))
+                    if len(lote) >= LOTE_IMPORTACAO:
+                        c, a = gravar_lote(conn, lote, erros)
+                        criados, atualizados, lote = criados + c, atualizados + a, []
+            except (OSError, EOFError, zlib.error) as e:
+                # Compactado truncado/corrompido: o que veio antes é gravado.
+                erros.registrar(total + 2, f"Arquivo interrompido: {e}")
+            if lote:
+                c, a = gravar_lote(conn, lote, erros)
+                criados, atualizados = criados + c, atualizados + a
+        erros.fechar()
+
+        metrics.observar_csv("import", "produtos", total, inicio)
+        if not simular and (criados or atualizados):
+            barramento.publicar(
+                "importacao",
+                criados=criados,
+                atualizados=atualizados,
+                erros=erros.total,
+            )
         resultado = {
+            "simulacao": simular,
             "total": total,
             "criados": criados,
             "atualizados": atualizados,
-            "erros": erros,
+            "inalterados": inalterados,
+            "erros": erros.total,
+            "grupos": erros.grupos(),
+            "erros_token": erros.token,
+            "mudancas": mudancas,
         }
 
         return render_template_string(
             page_template, base_style=base_style, resultado=resultado
         )
 
-    @app.get("/csv/export/movimentacoes.csv")
-    def csv_export_movimentacoes():
-        rows = query_all(
-            """
-            SELECT m.id, m.criado_em, p.sku AS produto_sku, p.nome AS produto_nome,
-                   m.tipo, m.quantidade, m.observacao
-            FROM movimentacoes m
-            JOIN produtos p ON p.id = m.produto_id
-            ORDER BY m.criado_em DESC, m.id DESC
-            LIMIT 2000
-            """
+    @app.get("/csv/import/erros/<token>.csv")
+    def csv_import_erros(token: str):
+        if not csv_erros.TOKEN_RE.match(token):
+            return Response("Relatório não encontrado.", status=404)
+        path = csv_erros.caminho(erros_dir, token)
+        if not os.path.exists(path):
+            return Response("Relatório não encontrado (expirado?).", status=404)
+        return send_file(
+            path,
+            mimetype="text/csv; charset=utf-8",
+            as_attachment=True,
+            download_name="erros.csv",
         )
 
-        headers = [
-            "id",
-            "criado_em",
-            "produto_sku",
-            "produto_nome",
-            "tipo",
-            "quantidade",
-            "observacao",
-        ]
-        buf = io.StringIO()
-        writer = csv.DictWriter(buf, fieldnames=headers)
-        writer.writeheader()
-        for r in rows:
-            writer.writerow({k: ("" if r[k] is None else r[k]) for k in headers})
+    @app.get("/csv/export/movimentacoes")
+    @app.get("/csv/export/movimentacoes.csv")
+    def csv_export_movimentacoes():
+        formato = formato_pedido()
+        if formato is None:
+            return formato_invalido()
+        intervalo = intervalo_datas(request.args.get("desde"), request.args.get("ate"))
+        if intervalo is None:
+            return Response("Datas inválidas (use AAAA-MM-DD).", status=400)
+        desde, ate = intervalo
+
+        where = []
+        params: list[str | int] = []
+        if desde:
+            where.append("m.criado_em >= ?")
+            params.append(desde)
+        if ate:
+            where.append("m.criado_em < ?")
+            params.append(ate)
+
+        def linhas(conn: sqlite3.Connection) -> Iterable[Sequence]:
+            # Com `desde`/`ate` que alcançam o arquivamento, une os arquivos.
+            fonte = fonte_movimentacoes(conn, desde=desde, ate=ate)
+            return conn.execute(
+                f"""
+                SELECT m.id, m.criado_em, p.sku AS produto_sku, p.nome AS produto_nome,
+                       m.tipo, m.quantidade, m.observacao
+                FROM {fonte} m
+                JOIN produtos p ON p.id = m.produto_id
+                {"WHERE " + " AND ".join(where) if where else ""}
+                ORDER BY m.criado_em DESC, m.id DESC
+                LIMIT 2000
+                """,
+                tuple(params),
+            )
 
-        data = buf.getvalue().encode("utf-8")
-        return Response(
-            data,
-            mimetype="text/csv; charset=utf-8",
-            headers={"Content-Disposition": 'attachment; filename="movimentacoes.csv"'},
+        return exportar(
+            formato, "movimentacoes", "movimentacoes", MOVIMENTACOES_COLUNAS, linhas
         )
-
-    # Evitar "imported but unused" em lint quando helper não é usado.
-    _ = execute
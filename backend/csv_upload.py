@@ -0,0 +1,65 @@
+"""Leitura em streaming dos arquivos enviados para importação.
+
+Aceita CSV puro, `.csv.gz` e `.zip` (o primeiro `.csv` do arquivo, ou o único
+membro), reconhecidos pelos bytes iniciais e não pela extensão. A
+descompressão e a decodificação acontecem à medida que o parser CSV lê: o
+arquivo descompactado nunca fica inteiro em memória (o upload em si o Werkzeug
+já guarda em arquivo temporário).
+
+Texto: UTF-8 (com ou sem BOM). Bytes que não formam UTF-8 válido são lidos como
+latin-1, o que cobre as planilhas exportadas em latin-1 sem precisar ler o
+arquivo duas vezes.
+"""
+
+from __future__ import annotations
+
+import codecs
+import gzip
+import io
+import zipfile
+from typing import IO
+
+GZIP = b"\x1f\x8b"
+ZIP = b"PK\x03\x04"
+
+
+def _latin1(erro: UnicodeError) -> tuple[str, int]:
+    if not isinstance(erro, UnicodeDecodeError):
+        raise erro
+    return bytes(erro.object[erro.start : erro.end]).decode("latin-1"), erro.end
+
+
+codecs.register_error("estoque_latin1", _latin1)
+
+
+def _membro_csv(zf: zipfile.ZipFile) -> zipfile.ZipInfo:
+    membros = [m for m in zf.infolist() if not m.is_dir()]
+    if not membros:
+        raise ValueError("arquivo .zip vazio")
+    csvs = [m for m in membros if m.filename.lower().endswith(".csv")]
+    return (csvs or membros)[0]
+
+
+def abrir_texto(stream: IO[bytes]) -> IO[str]:
+    """Texto do upload (descompactado se for gzip/zip), para o `csv.reader`.
+
+    `stream` precisa aceitar `seek` (o zip lê o índice no fim do arquivo).
+    Levanta ValueError se o zip estiver vazio ou corrompido.
+    """
+
+    inicio = stream.read(4)
+    stream.seek(0)
+    binario: IO[bytes] | gzip.GzipFile
+    if inicio.startswith(GZIP):
+        binario = gzip.GzipFile(fileobj=stream, mode="rb")
+    elif inicio.startswith(ZIP):
+        try:
+            zf = zipfile.ZipFile(stream)
+        except zipfile.BadZipFile as e:
+            raise ValueError(f"arquivo .zip inválido: {e}") from e
+        binario = zf.open(_membro_csv(zf))
+    else:
+        binario = stream
+    return io.TextIOWrapper(
+        binario, encoding="utf-8-sig", errors="estoque_latin1", newline=""
+    )
@@ -0,0 +1,313 @@
+"""Acesso ao SQLite compartilhado pelos módulos de rotas.
+
+Cada módulo continua com seus helpers `query_all`/`query_one`/`execute` locais
+(ligados ao `db_path` do app), que delegam para as funções daqui. Centralizar
+permite instrumentar todo acesso ao banco num único ponto.
+
+Leituras e escritas usam caminhos separados. O banco roda em WAL (ligado por
+`migrations.migrar`), onde leitores não esperam pelo lock de escrita. Os helpers de
+leitura (`query_all`/`query_one`/`query_rows` e `leitura`) usam um pool de
+conexões somente leitura (URI `mode=ro` + `PRAGMA query_only`), de tamanho
+próprio (`configurar_leitura`). Uma leitura que tente escrever falha em vez de
+pegar o lock. Escritas (`execute`, `connect` + `begin_immediate`) seguem em
+conexões novas de leitura e escrita.
+"""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import closing, contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+import metrics
+from singleflight import EXECUTADA, SingleFlight
+
+log = logging.getLogger("estoque.sql")
+
+# Limite (ms) do log de consultas lentas; None desliga (SLOW_QUERY_MS).
+slow_query_ms: float | None = None
+
+
+class PerfilSQL:
+    """Acumulador de tempo de banco de uma requisição perfilada."""
+
+    __slots__ = ("consultas", "segundos")
+
+    def __init__(self) -> None:
+        self.consultas = 0
+        self.segundos = 0.0
+
+
+perfil_atual: ContextVar[PerfilSQL | None] = ContextVar("perfil_sql", default=None)
+
+# (rota, ttl em s) quando a requisição atual compartilha consultas idênticas
+# concorrentes (ver coalescimento.py).
+coalescimento_atual: ContextVar[tuple[str, float] | None] = ContextVar(
+    "coalescimento_sql", default=None
+)
+voo = SingleFlight()
+
+
+@lru_cache(maxsize=512)
+def rotulo_sql(sql: str) -> str:
+    """Texto do comando com espaços colapsados (rótulo de métricas/logs)."""
+
+    return " ".join(sql.split())[:160]
+
+
+def _instrumentado() -> bool:
+    return (
+        metrics.enabled or slow_query_ms is not None or perfil_atual.get() is not None
+    )
+
+
+def _plano(conn: sqlite3.Connection, sql: str, params: tuple) -> str:
+    try:
+        rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    except sqlite3.Error as e:
+        return f"(indisponível: {e})"
+    return "; ".join(str(r[3]) for r in rows)
+
+
+def _observar(
+    conn: sqlite3.Connection, sql: str, params: tuple, inicio: float, linhas: int
+) -> None:
+    duracao = time.perf_counter() - inicio
+    if metrics.enabled:
+        rotulo = rotulo_sql(sql)
+        metrics.SQL_DURATION.observe(duracao, rotulo)
+        metrics.SQL_ROWS.inc(rotulo, valor=linhas)
+
+    perfil = perfil_atual.get()
+    if perfil is not None:
+        perfil.consultas += 1
+        perfil.segundos += duracao
+
+    if slow_query_ms is not None and duracao * 1000 >= slow_query_ms:
+        # Só o formato dos parâmetros (tipos), nunca os valores.
+        formato = "(" + ", ".join(type(p).__name__ for p in params) + ")"
+        log.warning(
+            "consulta lenta: %.1f ms, %d linhas, params=%s | %s | plano: %s",
+            duracao * 1000,
+            linhas,
+            formato,
+            rotulo_sql(sql),
+            _plano(conn, sql, params),
+        )
+
+
+class ConexaoEscrita(sqlite3.Connection):
+    """Conexão de leitura e escrita que descarta os resultados compartilhados
+    (`voo`) depois de cada commit.
+
+    Depois, e não no BEGIN: uma leitura entre o BEGIN e o commit ainda vê o
+    estado anterior e poderia guardá-lo por todo o ttl.
+    """
+
+    def commit(self) -> None:
+        super().commit()
+        voo.limpar()
+
+    def __exit__(self, tipo: Any, valor: Any, tb: Any) -> Any:
+        # `with conn:` faz o commit em C, sem passar por `commit()`.
+        resultado = super().__exit__(tipo, valor, tb)
+        if tipo is None:
+            voo.limpar()
+        return resultado
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    if metrics.enabled:
+        metrics.DB_CONNECTIONS.inc()
+    return sqlite3.connect(db_path, factory=ConexaoEscrita)
+
+
+def conectar_leitura(db_path: str) -> sqlite3.Connection:
+    """Conexão nova somente leitura (para leituras longas, fora do pool)."""
+
+    if metrics.enabled:
+        metrics.DB_CONNECTIONS.inc()
+    uri = Path(db_path).absolute().as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+class PoolLeitura:
+    """Até `tamanho` conexões somente leitura, abertas sob demanda e reaproveitadas.
+
+    Com todas em uso, quem pede espera até `espera` s (depois, OperationalError).
+    """
+
+    def __init__(self, db_path: str, tamanho: int, espera: float = 30.0) -> None:
+        self.db_path = db_path
+        self.espera = espera
+        self._vagas = threading.BoundedSemaphore(tamanho)
+        self._livres: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._fechado = False
+
+    @contextmanager
+    def conexao(self) -> Iterator[sqlite3.Connection]:
+        if not self._vagas.acquire(timeout=self.espera):
+            raise sqlite3.OperationalError("pool de leitura esgotado")
+        try:
+            with self._lock:
+                conn = self._livres.pop() if self._livres else None
+            if conn is None:
+                conn = conectar_leitura(self.db_path)
+            try:
+                yield conn
+            except BaseException:
+                conn.close()
+                raise
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                if self._fechado:
+                    conn.close()
+                else:
+                    self._livres.append(conn)
+        finally:
+            self._vagas.release()
+
+    def fechar(self) -> None:
+        with self._lock:
+            self._fechado = True
+            livres, self._livres = self._livres, []
+        for conn in livres:
+            conn.close()
+
+
+_pools: dict[str, PoolLeitura] = {}
+
+
+def configurar_leitura(db_path: str, tamanho: int) -> None:
+    """Pool de leitura de `db_path` com `tamanho` conexões (0: sem pool)."""
+
+    antigo = _pools.pop(db_path, None)
+    if antigo is not None:
+        antigo.fechar()
+    if tamanho > 0:
+        _pools[db_path] = PoolLeitura(db_path, tamanho)
+
+
+@contextmanager
+def leitura(db_path: str) -> Iterator[sqlite3.Connection]:
+    """Conexão para leitura: do pool, ou uma nova se não houver pool."""
+
+    pool = _pools.get(db_path)
+    if pool is None:
+        with closing(connect(db_path)) as conn:
+            yield conn
+        return
+    with pool.conexao() as conn:
+        yield conn
+
+
+def begin_immediate(conn: sqlite3.Connection) -> None:
+    """Abre transação de escrita já reservando o lock.
+
+    Com BEGIN (deferred) duas escritas concorrentes que leram antes de escrever
+    podem falhar com "database is locked" ao promover o lock; IMMEDIATE espera
+    pelo lock (até o timeout da conexão) logo no início. O tempo dessa espera é
+    registrado em `estoque_db_lock_wait_seconds`.
+    """
+
+    if not metrics.enabled:
+        conn.execute("BEGIN IMMEDIATE")
+        return
+    inicio = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    metrics.DB_LOCK_WAIT.observe(time.perf_counter() - inicio)
+
+
+def _coalescido(
+    tipo: str, db_path: str, sql: str, params: tuple, fn: Callable[[], Any]
+) -> Any:
+    """Executa `fn`, ou compartilha o resultado de uma consulta idêntica.
+
+    Só nas rotas configuradas (`coalescimento_atual`); fora delas, executa.
+    """
+
+    conf = coalescimento_atual.get()
+    if conf is None:
+        return fn()
+    rota, ttl = conf
+    try:
+        chave = (tipo, db_path, sql, params)
+        hash(chave)
+    except TypeError:
+        return fn()
+    resultado, origem = voo.fazer(chave, fn, ttl=ttl)
+    if origem != EXECUTADA and metrics.enabled:
+        metrics.SQL_COALESCED.inc(rota, origem)
+    return resultado
+
+
+def query_all(db_path: str, sql: str, params: tuple = ()) -> list[sqlite3.Row]:
+    def executar() -> list[sqlite3.Row]:
+        with leitura(db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            if not _instrumentado():
+                return list(conn.execute(sql, params).fetchall())
+            inicio = time.perf_counter()
+            rows = list(conn.execute(sql, params).fetchall())
+            _observar(conn, sql, params, inicio, len(rows))
+            return rows
+
+    # Cópia da lista: o resultado pode ser compartilhado entre requisições.
+    return list(_coalescido("all", db_path, sql, params, executar))
+
+
+def query_one(db_path: str, sql: str, params: tuple = ()) -> sqlite3.Row | None:
+    def executar() -> sqlite3.Row | None:
+        with leitura(db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            if not _instrumentado():
+                return conn.execute(sql, params).fetchone()
+            inicio = time.perf_counter()
+            row = conn.execute(sql, params).fetchone()
+            _observar(conn, sql, params, inicio, 0 if row is None else 1)
+            return row
+
+    return _coalescido("one", db_path, sql, params, executar)
+
+
+def query_rows(
+    db_path: str, sql: str, params: tuple = ()
+) -> tuple[list[str], list[tuple[Any, ...]]]:
+    """Como query_all, mas devolve (colunas, tuplas), sem sqlite3.Row."""
+
+    def executar() -> tuple[list[str], list[tuple[Any, ...]]]:
+        with leitura(db_path) as conn:
+            conn.row_factory = None
+            inicio = time.perf_counter()
+            cur = conn.execute(sql, params)
+            cols = [d[0] for d in cur.description]
+            rows = cur.fetchall()
+            if _instrumentado():
+                _observar(conn, sql, params, inicio, len(rows))
+            return cols, rows
+
+    cols, rows = _coalescido("rows", db_path, sql, params, executar)
+    return list(cols), list(rows)
+
+
+def execute(db_path: str, sql: str, params: tuple = ()) -> int | None:
+    """Executa e faz commit. Retorna o lastrowid do comando."""
+
+    with closing(connect(db_path)) as conn:
+        inicio = time.perf_counter()
+        cur = conn.execute(sql, params)
+        conn.commit()
+        if _instrumentado():
+            _observar(conn, sql, params, inicio, cur.rowcount)
+        return cur.lastrowid
@@ -0,0 +1,183 @@
+"""Eventos de estoque em tempo real (Server-Sent Events).
+
+Painéis assinam `GET /eventos` em vez de consultar `/produtos` e
+`/movimentacoes` periodicamente. Os eventos são publicados depois do commit por
+`registrar_movimentacao`, pelo CRUD de produtos (UI e API) e pela importação
+CSV, que publica um único resumo (`importacao`) em vez de um evento por linha.
+
+O barramento é em memória, no processo (como as métricas): serve ao app
+rodando como um único processo (`python app.py`). Cada cliente tem um buffer
+limitado; se ele não acompanhar, os eventos mais antigos são descartados e o
+cliente recebe um evento `perdidos` (sinal para recarregar o estado completo).
+
+Os últimos `BUFFER_PADRAO` eventos ficam num histórico: ao reconectar, o
+`EventSource` manda `Last-Event-ID` e recebe o que foi publicado depois dele.
+Se parte já saiu do histórico (ou o processo reiniciou e os ids recomeçaram),
+recebe `perdidos`.
+
+Rota:
+- GET /eventos   (?produto_id=1,2&categoria=Papelaria; sem filtro recebe tudo)
+
+Formato: `id: <n>`, `event: movimentacao|produto|importacao|perdidos` e
+`data: <json>`. Sem eventos, um comentário `: ping` a cada 15 s mantém a
+conexão aberta através de proxies.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import threading
+from collections import deque
+from collections.abc import Iterator
+from typing import Any
+
+from flask import Flask, Response, request
+
+BUFFER_PADRAO = 256
+PING_S = 15.0
+
+
+class Assinatura:
+    """Fila limitada de um cliente, com filtros por produto e categoria."""
+
+    def __init__(
+        self,
+        *,
+        produtos: set[int] | None = None,
+        categorias: set[str] | None = None,
+        tamanho: int = BUFFER_PADRAO,
+    ) -> None:
+        self.produtos = produtos
+        self.categorias = categorias
+        self.fila: deque[tuple[int, str, dict[str, Any]]] = deque(maxlen=tamanho)
+        self.perdidos = 0
+        self.cond = threading.Condition()
+
+    def aceita(self, dados: dict[str, Any]) -> bool:
+        if self.produtos is None and self.categorias is None:
+            return True
+        # Eventos sem produto (resumo de importação) vão para todos.
+        if "produto_id" not in dados:
+            return True
+        if self.produtos is not None and dados["produto_id"] in self.produtos:
+            return True
+        return self.categorias is not None and dados.get("categoria") in self.categorias
+
+    def entregar(self, evento: tuple[int, str, dict[str, Any]]) -> None:
+        with self.cond:
+            if len(self.fila) == self.fila.maxlen:
+                self.perdidos += 1
+            self.fila.append(evento)
+            self.cond.notify()
+
+    def proximos(self, timeout: float) -> tuple[list[tuple[int, str, dict]], int]:
+        """Espera até `timeout` s e devolve (eventos pendentes, perdidos)."""
+
+        with self.cond:
+            if not self.fila:
+                self.cond.wait(timeout)
+            eventos = list(self.fila)
+            self.fila.clear()
+            perdidos, self.perdidos = self.perdidos, 0
+        return eventos, perdidos
+
+
+class Barramento:
+    def __init__(self, historico: int = BUFFER_PADRAO) -> None:
+        self.assinaturas: set[Assinatura] = set()
+        self.historico: deque[tuple[int, str, dict[str, Any]]] = deque(maxlen=historico)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._ultimo = 0
+
+    def assinar(
+        self, assinatura: Assinatura, *, desde: int | None = None
+    ) -> Assinatura:
+        """Registra a assinatura; com `desde` (Last-Event-ID), reentrega o resto.
+
+        Eventos posteriores a `desde` ainda no histórico vão para a fila; os que
+        já saíram dele contam como perdidos.
+        """
+
+        with self._lock:
+            if desde is not None:
+                primeiro = self.historico[0][0] if self.historico else self._ultimo + 1
+                if desde > self._ultimo:
+                    # Id de antes de um reinício: não dá para saber o que faltou.
+                    assinatura.perdidos += 1
+                elif desde + 1 < primeiro:
+                    assinatura.perdidos += primeiro - desde - 1
+                for evento in self.historico:
+                    if evento[0] > desde and assinatura.aceita(evento[2]):
+                        assinatura.entregar(evento)
+            self.assinaturas.add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura: Assinatura) -> None:
+        with self._lock:
+            self.assinaturas.discard(assinatura)
+
+    def publicar(self, nome: str, /, **dados: Any) -> None:
+        # Vai para o histórico mesmo sem assinantes: um painel reconectando
+        # ainda não assinou de novo.
+        with self._lock:
+            evento = (next(self._ids), nome, dados)
+            self._ultimo = evento[0]
+            self.historico.append(evento)
+            destinos = [a for a in self.assinaturas if a.aceita(dados)]
+        for a in destinos:
+            a.entregar(evento)
+
+
+barramento = Barramento()
+
+
+def formatar(evento_id: int | None, nome: str, dados: dict[str, Any]) -> str:
+    linhas = [] if evento_id is None else [f"id: {evento_id}"]
+    linhas.append(f"event: {nome}")
+    linhas.append("data: " + json.dumps(dados, ensure_ascii=False))
+    return "\n".join(linhas) + "\n\n"
+
+
+def _parse_ids(raw: str | None) -> set[int] | None:
+    if not raw:
+        return None
+    return {int(p) for p in raw.split(",") if p.strip().isdigit()}
+
+
+def register_events_routes(app: Flask) -> None:
+    @app.get("/eventos")
+    def eventos():
+        categorias = request.args.getlist("categoria")
+        ultimo_id = request.headers.get("Last-Event-ID", "").strip()
+        # Assina já aqui (e não dentro do gerador) para não perder eventos
+        # publicados entre a resposta e a primeira leitura do cliente.
+        assinatura = barramento.assinar(
+            Assinatura(
+                produtos=_parse_ids(request.args.get("produto_id")),
+                categorias=set(categorias) if categorias else None,
+            ),
+            desde=int(ultimo_id) if ultimo_id.isdigit() else None,
+        )
+
+        def stream() -> Iterator[str]:
+            yield "retry: 3000\n\n"
+            while True:
+                eventos, perdidos = assinatura.proximos(PING_S)
+                if perdidos:
+                    yield formatar(None, "perdidos", {"quantidade": perdidos})
+                for evento in eventos:
+                    yield formatar(*evento)
+                if not eventos and not perdidos:
+                    yield ": ping\n\n"
+
+        res = Response(
+            stream(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        # Roda no close() da resposta, mesmo se o cliente caiu antes do primeiro
+        # bloco (aí o `finally` de um gerador nunca iniciado não rodaria).
+        res.call_on_close(lambda: barramento.cancelar(assinatura))
+        return res
@@ -0,0 +1,173 @@
+"""Exportação completa materializada em arquivo, por versão dos dados.
+
+A versão é o último `seq` do feed de mudanças (`changes.seq_atual`): toda
+inclusão, alteração ou exclusão de produto e toda movimentação o incrementa.
+O arquivo `<nome>-v<versão>.<ext>` é gerado uma vez (numa única transação de
+leitura, então conteúdo e versão batem) e servido dali em diante como arquivo
+estático, com Range e ETag, até os dados mudarem.
+
+- Pedidos concorrentes da mesma versão esperam uma única geração
+  (`SingleFlight`).
+- Depois de mudanças, uma thread regenera em segundo plano os formatos que já
+  foram pedidos, para o próximo download não esperar. Ela confere a versão a
+  cada `INTERVALO_S` (uma leitura em `sqlite_sequence`), o que também pega
+  escritas de outros processos (scripts, importações pela linha de comando).
+  A thread para com `parar()`, chamado quando o app dono é coletado.
+- Ficam as `VERSOES_MANTIDAS` versões mais recentes de cada formato (a anterior
+  continua disponível para quem está no meio de um download).
+"""
+
+from __future__ import annotations
+
+import glob
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections.abc import Iterable, Sequence
+from contextlib import closing
+
+import db
+import metrics
+from changes import seq_atual
+from export_formatos import FORMATOS, Coluna
+from singleflight import SingleFlight
+
+log = logging.getLogger("estoque.export")
+
+VERSOES_MANTIDAS = 2
+# Intervalo entre as conferências de versão da thread de regeneração.
+INTERVALO_S = 5.0
+
+
+class ExportacaoMaterializada:
+    def __init__(
+        self,
+        *,
+        db_path: str,
+        diretorio: str,
+        nome: str,
+        colunas: Sequence[Coluna],
+        sql: str,
+        segundo_plano: bool = True,
+    ) -> None:
+        self.db_path = db_path
+        self.diretorio = diretorio
+        self.nome = nome
+        self.colunas = colunas
+        self.sql = sql
+        self.segundo_plano = segundo_plano
+        self.geracoes = 0
+        self._voo = SingleFlight()
+        self._pedidos: set[str] = set()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+
+    def caminho(self, formato: str, versao: int) -> str:
+        extensao = FORMATOS[formato].extensao
+        return os.path.join(self.diretorio, f"{self.nome}-v{versao}.{extensao}")
+
+    def arquivo(self, formato: str) -> tuple[str, int]:
+        """(caminho, versão) do arquivo da versão atual, gerando se preciso."""
+
+        self._acompanhar(formato)
+        with db.leitura(self.db_path) as conn:
+            versao = seq_atual(conn)
+        path = self.caminho(formato, versao)
+        if os.path.exists(path):
+            return path, versao
+        return self._voo.fazer((formato, versao), lambda: self._gerar(formato))[0]
+
+    def _gerar(self, formato: str) -> tuple[str, int]:
+        inicio = time.perf_counter()
+        os.makedirs(self.diretorio, exist_ok=True)
+        with closing(db.conectar_leitura(self.db_path)) as conn:
+            # Versão e linhas lidas no mesmo snapshot.
+            conn.execute("BEGIN")
+            versao = seq_atual(conn)
+            path = self.caminho(formato, versao)
+            if os.path.exists(path):
+                return path, versao
+            total = 0
+
+            def contar(rows: Iterable[Sequence]) -> Iterable[Sequence]:
+                nonlocal total
+                for row in rows:
+                    total += 1
+                    yield row
+
+            fd, parcial = tempfile.mkstemp(dir=self.diretorio, suffix=".parcial")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    for bloco in FORMATOS[formato].gerar(
+                        self.colunas, contar(conn.execute(self.sql))
+                    ):
+                        f.write(bloco)
+                os.replace(parcial, path)
+            except BaseException:
+                os.remove(parcial)
+                raise
+        with self._lock:
+            self.geracoes += 1
+        self._aplicar_retencao(formato)
+        metrics.observar_csv("export", self.nome, total, inicio)
+        return path, versao
+
+    def _aplicar_retencao(self, formato: str) -> None:
+        padrao = re.compile(
+            rf"{re.escape(self.nome)}-v(\d+)\.{FORMATOS[formato].extensao}$"
+        )
+        versoes = []
+        for path in glob.glob(os.path.join(self.diretorio, f"{self.nome}-v*")):
+            m = padrao.search(path)
+            if m:
+                versoes.append((int(m.group(1)), path))
+        versoes.sort()
+        for _, path in versoes[:-VERSOES_MANTIDAS]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _acompanhar(self, formato: str) -> None:
+        with self._lock:
+            self._pedidos.add(formato)
+            if (
+                self._thread is not None
+                or not self.segundo_plano
+                or self._parar.is_set()
+            ):
+                return
+            self._thread = threading.Thread(
+                target=self._regenerar, name=f"export-{self.nome}", daemon=True
+            )
+            self._thread.start()
+
+    def parar(self, timeout: float | None = None) -> None:
+        """Encerra a thread de regeneração (espera até `timeout` s por ela)."""
+
+        self._parar.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _versao(self) -> int:
+        with db.leitura(self.db_path) as conn:
+            return seq_atual(conn)
+
+    def _regenerar(self) -> None:
+        anterior = None
+        while os.path.exists(self.db_path) and not self._parar.is_set():
+            try:
+                versao = self._versao()
+                if anterior is not None and versao != anterior:
+                    for formato in list(self._pedidos):
+                        self.arquivo(formato)
+                anterior = versao
+            except (OSError, sqlite3.Error):
+                log.exception("falha ao regenerar a exportação %s", self.nome)
+            self._parar.wait(INTERVALO_S)
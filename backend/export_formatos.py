@@ -0,0 +1,186 @@
+"""Formatos das exportações (`?format=csv|ndjson|colunar`), gerados em streaming.
+
+- `csv`: o formato original, com header.
+- `ndjson`: um objeto JSON por linha, com os nomes das colunas como chaves.
+- `colunar`: binário compacto para pipelines de dados. Em vez de reinterpretar
+  texto linha a linha, o leitor recebe cada coluna de um bloco já pronta:
+  números como arrays de 64 bits (`array.frombytes`) e textos como um único
+  UTF-8 por coluna.
+
+Layout do `colunar` (inteiros little-endian):
+
+    b"ECOL1\\n"
+    {"colunas": [["sku", "texto"], ["custo", "decimal"], ...]}\\n   (JSON, uma linha)
+    blocos: <linhas:u32><tamanho:u32> + zlib(payload), até um bloco com linhas=0
+
+O payload tem, por coluna e na ordem do cabeçalho, uma máscara de nulos (um
+byte por linha, 1 = nulo) seguida dos valores: `inteiro` int64 e `decimal`
+float64 (0 nas posições nulas); `texto` um byte de modo, o tamanho em bytes
+(u32) e os textos em UTF-8. Modo 0: textos separados por `\\x00` (um `split`
+na leitura); modo 1, quando algum texto contém `\\x00`: os comprimentos em
+caracteres (int32) entre o modo e o tamanho, e os textos concatenados.
+`ler_colunar` é o leitor de referência.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from itertools import accumulate, islice
+from typing import IO
+
+# Linhas por bloco enviado (CSV/NDJSON) e por bloco comprimido (colunar).
+LINHAS_POR_BLOCO = 1000
+LINHAS_POR_BLOCO_COLUNAR = 8192
+
+MAGICO = b"ECOL1\n"
+CABECALHO_BLOCO = struct.Struct("<II")
+_TAMANHO = struct.Struct("<I")
+SEPARADOR = "\x00"
+
+# (nome, tipo), com tipo "texto", "inteiro" ou "decimal".
+Coluna = tuple[str, str]
+
+_CODIGOS = {"inteiro": "q", "decimal": "d"}
+_TROCAR_BYTES = sys.byteorder != "little"
+
+
+def _csv(colunas: Sequence[Coluna], linhas: Iterable[Sequence]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([nome for nome, _ in colunas])
+    linhas = iter(linhas)
+    while lote := list(islice(linhas, LINHAS_POR_BLOCO)):
+        writer.writerows(lote)  # None sai como campo vazio
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def _ndjson(colunas: Sequence[Coluna], linhas: Iterable[Sequence]) -> Iterator[bytes]:
+    nomes = [nome for nome, _ in colunas]
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    linhas = iter(linhas)
+    while lote := list(islice(linhas, LINHAS_POR_BLOCO)):
+        yield "".join(dumps(dict(zip(nomes, r))) + "\n" for r in lote).encode("utf-8")
+
+
+def _bloco_colunar(colunas: Sequence[Coluna], lote: list[Sequence]) -> bytes:
+    partes: list[bytes] = []
+    for i, (_, tipo) in enumerate(colunas):
+        valores = [r[i] for r in lote]
+        partes.append(bytes(v is None for v in valores))
+        if tipo == "texto":
+            textos = ["" if v is None else str(v) for v in valores]
+            juntos = SEPARADOR.join(textos)
+            if juntos.count(SEPARADOR) == len(textos) - 1:
+                partes.append(b"\x00")
+            else:
+                # Algum texto contém o separador: comprimentos explícitos.
+                comprimentos = array("i", map(len, textos))
+                if _TROCAR_BYTES:
+                    comprimentos.byteswap()
+                partes.append(b"\x01" + comprimentos.tobytes())
+                juntos = "".join(textos)
+            texto = juntos.encode("utf-8")
+            partes.append(_TAMANHO.pack(len(texto)))
+            partes.append(texto)
+        else:
+            numeros = array(_CODIGOS[tipo], (v or 0 for v in valores))
+            if _TROCAR_BYTES:
+                numeros.byteswap()
+            partes.append(numeros.tobytes())
+    dados = zlib.compress(b"".join(partes), 6)
+    return CABECALHO_BLOCO.pack(len(lote), len(dados)) + dados
+
+
+def _colunar(colunas: Sequence[Coluna], linhas: Iterable[Sequence]) -> Iterator[bytes]:
+    esquema = {"colunas": [list(c) for c in colunas]}
+    yield MAGICO + json.dumps(esquema, separators=(",", ":")).encode() + b"\n"
+    linhas = iter(linhas)
+    while lote := list(islice(linhas, LINHAS_POR_BLOCO_COLUNAR)):
+        yield _bloco_colunar(colunas, lote)
+    yield CABECALHO_BLOCO.pack(0, 0)
+
+
+def ler_colunar(stream: IO[bytes]) -> Iterator[tuple[list[str], list[list]]]:
+    """(nomes das colunas, valores por coluna) de cada bloco de um `colunar`.
+
+    Levanta ValueError se o arquivo não for do formato ou estiver truncado.
+    """
+
+    if stream.read(len(MAGICO)) != MAGICO:
+        raise ValueError("não é um arquivo colunar (ECOL1)")
+    colunas = json.loads(stream.readline())["colunas"]
+    nomes = [nome for nome, _ in colunas]
+    while True:
+        cabecalho = stream.read(CABECALHO_BLOCO.size)
+        if len(cabecalho) < CABECALHO_BLOCO.size:
+            raise ValueError("arquivo colunar truncado")
+        n, tamanho = CABECALHO_BLOCO.unpack(cabecalho)
+        if n == 0:
+            return
+        comprimido = stream.read(tamanho)
+        if len(comprimido) < tamanho:
+            raise ValueError("arquivo colunar truncado")
+        dados = zlib.decompress(comprimido)
+        pos = 0
+        valores: list[list] = []
+        for _, tipo in colunas:
+            nulos = dados[pos : pos + n]
+            pos += n
+            if tipo == "texto":
+                comprimentos = None
+                if dados[pos] == 1:
+                    comprimentos = array("i")
+                    comprimentos.frombytes(dados[pos + 1 : pos + 1 + 4 * n])
+                    pos += 4 * n
+                    if _TROCAR_BYTES:
+                        comprimentos.byteswap()
+                pos += 1
+                (tamanho_texto,) = _TAMANHO.unpack_from(dados, pos)
+                pos += _TAMANHO.size
+                texto = dados[pos : pos + tamanho_texto].decode("utf-8")
+                pos += tamanho_texto
+                coluna: list
+                if comprimentos is None:
+                    coluna = texto.split(SEPARADOR)
+                else:
+                    coluna = [
+                        texto[fim - c : fim]
+                        for fim, c in zip(accumulate(comprimentos), comprimentos)
+                    ]
+            else:
+                numeros = array(_CODIGOS[tipo])
+                numeros.frombytes(dados[pos : pos + 8 * n])
+                pos += 8 * n
+                if _TROCAR_BYTES:
+                    numeros.byteswap()
+                coluna = numeros.tolist()
+            if any(nulos):
+                coluna = [None if nulo else v for v, nulo in zip(coluna, nulos)]
+            valores.append(coluna)
+        yield nomes, valores
+
+
+@dataclass(frozen=True)
+class Formato:
+    extensao: str
+    mimetype: str
+    gerar: Callable[[Sequence[Coluna], Iterable[Sequence]], Iterator[bytes]]
+
+
+FORMATOS = {
+    "csv": Formato("csv", "text/csv; charset=utf-8", _csv),
+    "ndjson": Formato("ndjson", "application/x-ndjson; charset=utf-8", _ndjson),
+    "colunar": Formato("ecol", "application/octet-stream", _colunar),
+}
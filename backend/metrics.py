@@ -0,0 +1,265 @@
+"""Métricas no formato texto do Prometheus.
+
+Registro em memória (por processo), sem dependências externas. Desligado por
+padrão: com `METRICS_ENABLED=1` o app expõe `GET /metrics` e os pontos
+instrumentados passam a registrar valores. Desligado, cada ponto instrumentado
+custa apenas a checagem de `metrics.enabled`.
+"""
+
+from __future__ import annotations
+
+import math
+import sqlite3
+import threading
+import time
+
+from flask import Flask, Response, g, got_request_exception, request
+
+enabled = False
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pares = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pares + "}"
+
+
+def _fmt_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.doc = doc
+        self.labels = labels
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, valor: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + valor
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, v in items:
+            out.append(f"{self.name}{_fmt_labels(self.labels, labels)} {_fmt_value(v)}")
+        return out
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.doc = doc
+        self.labels = labels
+        self.buckets = buckets
+        # labels -> [contagens por bucket (não cumulativas)..., soma, total]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, valor: float, *labels: str) -> None:
+        i = 0
+        for limite in self.buckets:
+            if valor <= limite:
+                break
+            i += 1
+        with self._lock:
+            dados = self._values.get(labels)
+            if dados is None:
+                dados = self._values[labels] = [0.0] * (len(self.buckets) + 3)
+            dados[i] += 1
+            dados[-2] += valor
+            dados[-1] += 1
+
+    def count(self, *labels: str) -> int:
+        dados = self._values.get(labels)
+        return int(dados[-1]) if dados else 0
+
+    def snapshot(self, *labels: str) -> tuple[list[float], float, int]:
+        """(contagens por bucket, soma, total) de uma série."""
+
+        with self._lock:
+            dados = list(self._values.get(labels) or [0.0] * (len(self.buckets) + 3))
+        return dados[: len(self.buckets) + 1], dados[-2], int(dados[-1])
+
+    def quantile(self, q: float, *labels: str) -> float:
+        """Estimativa do quantil pelo limite superior do bucket (como no PromQL)."""
+
+        contagens, _, total = self.snapshot(*labels)
+        if not total:
+            return 0.0
+        alvo = q * total
+        acumulado = 0.0
+        for limite, n in zip((*self.buckets, math.inf), contagens):
+            acumulado += n
+            if acumulado >= alvo:
+                return limite
+        return math.inf
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        names = (*self.labels, "le")
+        for labels, dados in items:
+            acumulado = 0.0
+            for limite, n in zip((*self.buckets, math.inf), dados):
+                acumulado += n
+                lbl = _fmt_labels(names, (*labels, _fmt_value(limite)))
+                out.append(f"{self.name}_bucket{lbl} {_fmt_value(acumulado)}")
+            lbl = _fmt_labels(self.labels, labels)
+            out.append(f"{self.name}_sum{lbl} {_fmt_value(dados[-2])}")
+            out.append(f"{self.name}_count{lbl} {_fmt_value(dados[-1])}")
+        return out
+
+
+HTTP_REQUESTS = Counter(
+    "estoque_http_requests_total",
+    "Requisições HTTP por rota, método e status.",
+    ("method", "route", "status"),
+)
+HTTP_DURATION = Histogram(
+    "estoque_http_request_duration_seconds",
+    "Latência das requisições HTTP por rota.",
+    ("method", "route"),
+)
+SQL_DURATION = Histogram(
+    "estoque_sql_query_duration_seconds",
+    "Tempo de execução por comando SQL (texto normalizado).",
+    ("query",),
+)
+SQL_ROWS = Counter(
+    "estoque_sql_rows_total",
+    "Linhas retornadas (SELECT) ou afetadas (escrita) por comando SQL.",
+    ("query",),
+)
+DB_CONNECTIONS = Counter(
+    "estoque_db_connections_opened_total",
+    "Conexões SQLite abertas.",
+)
+CSV_ROWS = Counter(
+    "estoque_csv_rows_total",
+    "Linhas de CSV processadas.",
+    ("operation", "entity"),
+)
+CSV_SECONDS = Counter(
+    "estoque_csv_duration_seconds_total",
+    "Tempo gasto em importação/exportação CSV (linhas/s = rows / seconds).",
+    ("operation", "entity"),
+)
+DB_LOCK_WAIT = Histogram(
+    "estoque_db_lock_wait_seconds",
+    "Espera pelo lock de escrita do SQLite (BEGIN IMMEDIATE).",
+)
+DB_LOCKED = Counter(
+    "estoque_db_locked_total",
+    'Requisições que falharam com "database is locked".',
+)
+SQL_COALESCED = Counter(
+    "estoque_sql_coalesced_total",
+    "Consultas não executadas: resultado compartilhado de uma idêntica em "
+    "andamento (em_voo) ou recente (cache).",
+    ("route", "origem"),
+)
+MOVEMENT_COMMIT = Histogram(
+    "estoque_movement_commit_duration_seconds",
+    "Duração da transação de registro de movimentação (BEGIN até COMMIT).",
+)
+
+REGISTRY: tuple[Counter | Histogram, ...] = (
+    HTTP_REQUESTS,
+    HTTP_DURATION,
+    SQL_DURATION,
+    SQL_ROWS,
+    SQL_COALESCED,
+    DB_CONNECTIONS,
+    DB_LOCK_WAIT,
+    DB_LOCKED,
+    CSV_ROWS,
+    CSV_SECONDS,
+    MOVEMENT_COMMIT,
+)
+
+
+def render() -> str:
+    linhas: list[str] = []
+    for metric in REGISTRY:
+        linhas.extend(metric.render())
+    return "\n".join(linhas) + "\n"
+
+
+def observar_csv(operation: str, entity: str, linhas: int, inicio: float) -> None:
+    """Registra throughput de uma importação/exportação iniciada em `inicio`."""
+
+    if not enabled:
+        return
+    CSV_ROWS.inc(operation, entity, valor=linhas)
+    CSV_SECONDS.inc(operation, entity, valor=time.perf_counter() - inicio)
+
+
+def _contar_lock(sender, exception: BaseException, **extra) -> None:
+    if isinstance(exception, sqlite3.OperationalError) and "locked" in str(exception):
+        DB_LOCKED.inc()
+
+
+def register_metrics_routes(app: Flask, *, habilitado: bool) -> None:
+    global enabled
+    enabled = habilitado
+    if not habilitado:
+        return
+
+    @app.before_request
+    def _metrics_inicio():
+        g.metrics_inicio = time.perf_counter()
+
+    @app.after_request
+    def _metrics_fim(response):
+        inicio = g.pop("metrics_inicio", None)
+        if inicio is not None:
+            # Rótulo pela regra (/produtos/<int:produto_id>), não pela URL, para
+            # manter a cardinalidade limitada.
+            rota = request.url_rule.rule if request.url_rule else "<sem rota>"
+            HTTP_DURATION.observe(time.perf_counter() - inicio, request.method, rota)
+            HTTP_REQUESTS.inc(request.method, rota, str(response.status_code))
+        return response
+
+    got_request_exception.connect(_contar_lock, app)
+
+    @app.get("/metrics")
+    def metrics_endpoint():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
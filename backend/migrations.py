@@ -0,0 +1,425 @@
+"""Migrações de schema versionadas.
+
+Cada `Migracao` tem uma versão e uma lista de passos, aplicados em ordem:
+
+- `str`: SQL (DDL/DML) executado numa transação própria. `CREATE INDEX` entra
+  aqui: o SQLite não constrói índice em partes, então cada índice vai num passo
+  separado para segurar o lock de escrita só durante a sua construção.
+- `Backfill`: UPDATE em lotes pequenos por faixa de rowid, cada lote na sua
+  transação e com pausa opcional entre lotes, para não bloquear as escritas de
+  movimentações por muito tempo.
+
+O progresso é gravado em `schema_migrations_progresso` na mesma transação de
+cada passo/lote, então uma migração interrompida (crash, deploy) continua de
+onde parou. Migrações concluídas ficam em `schema_migrations`, e a versão mais
+alta também em `PRAGMA user_version`, checada antes de qualquer outra coisa.
+
+Uso: python migrations.py [--db /data/app.db] [--status] [--pausa 0.05]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import time
+from collections.abc import Callable, Sequence
+from contextlib import closing
+from dataclasses import dataclass
+
+import db
+
+
+@dataclass(frozen=True)
+class Backfill:
+    """Preenche colunas em lotes: UPDATE tabela SET <set_sql> WHERE <where>."""
+
+    tabela: str
+    set_sql: str
+    where: str = "1"
+    lote: int = 5000
+
+
+@dataclass(frozen=True)
+class Migracao:
+    versao: int
+    nome: str
+    passos: Sequence[str | Backfill]
+
+
+MIGRACOES: list[Migracao] = [
+    Migracao(
+        1,
+        "schema inicial",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS app_state (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+            """,
+            "INSERT OR IGNORE INTO app_state(key, value) VALUES ('visitas', '0')",
+            """
+            CREATE TABLE IF NOT EXISTS produtos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome TEXT NOT NULL,
+                sku TEXT NOT NULL UNIQUE,
+                categoria TEXT,
+                fornecedor TEXT,
+                custo REAL NOT NULL DEFAULT 0,
+                preco REAL NOT NULL DEFAULT 0,
+                quantidade_atual INTEGER NOT NULL DEFAULT 0,
+                estoque_minimo INTEGER NOT NULL DEFAULT 0,
+                criado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+                atualizado_em DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS movimentacoes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                produto_id INTEGER NOT NULL,
+                tipo TEXT NOT NULL CHECK(tipo IN ('entrada', 'saida')),
+                quantidade INTEGER NOT NULL CHECK(quantidade > 0),
+                observacao TEXT,
+                criado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(produto_id) REFERENCES produtos(id)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_mov_produto_em "
+            "ON movimentacoes(produto_id, criado_em DESC)",
+        ],
+    ),
+    Migracao(
+        2,
+        "arquivamento de movimentações",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS arquivo_periodos (
+                tabela TEXT PRIMARY KEY,
+                inicio DATETIME NOT NULL,
+                fim DATETIME NOT NULL,
+                linhas INTEGER NOT NULL DEFAULT 0
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS movimentacoes_saldo_inicial (
+                produto_id INTEGER PRIMARY KEY,
+                saldo INTEGER NOT NULL
+            )
+            """,
+            # Seleção por corte de data (arquivamento) e histórico geral.
+            "CREATE INDEX IF NOT EXISTS idx_mov_criado_em ON movimentacoes(criado_em)",
+        ],
+    ),
+    Migracao(
+        3,
+        "totais diários de movimentações",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS movimentacoes_diarias (
+                produto_id INTEGER NOT NULL,
+                dia TEXT NOT NULL,
+                total_entrada INTEGER NOT NULL DEFAULT 0,
+                total_saida INTEGER NOT NULL DEFAULT 0,
+                movimentos INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (produto_id, dia)
+            ) WITHOUT ROWID
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_diarias_dia ON movimentacoes_diarias(dia)",
+            # Marca d'água em 0: o histórico existente é dobrado em lotes por
+            # analytics.atualizar_diarias, fora da transação da migração.
+            "INSERT OR IGNORE INTO app_state(key, value) VALUES ('diarias_ate_id', '0')",
+        ],
+    ),
+    Migracao(
+        4,
+        "feed de mudanças",
+        [
+            # AUTOINCREMENT: seq nunca é reutilizado, nem depois da compactação.
+            """
+            CREATE TABLE IF NOT EXISTS mudancas (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                tabela TEXT NOT NULL,
+                registro_id INTEGER NOT NULL,
+                operacao TEXT NOT NULL
+                    CHECK(operacao IN ('insert', 'update', 'delete')),
+                criado_em DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_produtos_mudanca_ins
+            AFTER INSERT ON produtos BEGIN
+                INSERT INTO mudancas(tabela, registro_id, operacao)
+                VALUES ('produtos', NEW.id, 'insert');
+            END
+            """,
+            # UPDATE que só toca atualizado_em (reimportação de CSV igual) não
+            # entra no feed.
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_produtos_mudanca_upd
+            AFTER UPDATE ON produtos
+            WHEN (OLD.nome, OLD.sku, OLD.categoria, OLD.fornecedor, OLD.custo,
+                  OLD.preco, OLD.quantidade_atual, OLD.estoque_minimo)
+                 IS NOT (NEW.nome, NEW.sku, NEW.categoria, NEW.fornecedor, NEW.custo,
+                         NEW.preco, NEW.quantidade_atual, NEW.estoque_minimo)
+            BEGIN
+                INSERT INTO mudancas(tabela, registro_id, operacao)
+                VALUES ('produtos', NEW.id, 'update');
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_produtos_mudanca_del
+            AFTER DELETE ON produtos BEGIN
+                INSERT INTO mudancas(tabela, registro_id, operacao)
+                VALUES ('produtos', OLD.id, 'delete');
+            END
+            """,
+            # Movimentações só recebem INSERT; o DELETE do arquivamento move
+            # linhas para o arquivo e não é uma mudança para quem sincroniza.
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_movimentacoes_mudanca_ins
+            AFTER INSERT ON movimentacoes BEGIN
+                INSERT INTO mudancas(tabela, registro_id, operacao)
+                VALUES ('movimentacoes', NEW.id, 'insert');
+            END
+            """,
+            "INSERT OR IGNORE INTO app_state(key, value) "
+            "VALUES ('mudancas_compactado_ate', '0')",
+        ],
+    ),
+    Migracao(
+        5,
+        "exportação incremental de produtos",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_produtos_atualizado_em "
+            "ON produtos(atualizado_em)",
+            # Tombstones: o SKU de quem foi excluído, para a exportação por
+            # `atualizado_desde` avisar o integrador.
+            """
+            CREATE TABLE IF NOT EXISTS produtos_excluidos (
+                produto_id INTEGER NOT NULL,
+                sku TEXT NOT NULL,
+                excluido_em DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_produtos_excluidos_em "
+            "ON produtos_excluidos(excluido_em)",
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_produtos_excluidos
+            AFTER DELETE ON produtos BEGIN
+                INSERT INTO produtos_excluidos(produto_id, sku) VALUES (OLD.id, OLD.sku);
+            END
+            """,
+        ],
+    ),
+    # Sem passos: o `PRAGMA journal_mode=WAL` não roda dentro de transação, então
+    # `migrar` o aplica ao fim de toda rodada com migrações pendentes. Esta
+    # versão só garante essa rodada nos bancos que já estavam na v5.
+    Migracao(6, "journal WAL (leituras sem esperar o escritor)", []),
+]
+
+Progresso = Callable[[str], None]
+
+
+def _criar_controle(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            versao INTEGER PRIMARY KEY,
+            nome TEXT NOT NULL,
+            aplicado_em DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations_progresso (
+            versao INTEGER NOT NULL,
+            passo INTEGER NOT NULL,
+            ultimo_id INTEGER NOT NULL DEFAULT 0,
+            concluido INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (versao, passo)
+        )
+        """
+    )
+    conn.commit()
+
+
+def versoes_aplicadas(conn: sqlite3.Connection) -> set[int]:
+    return {r[0] for r in conn.execute("SELECT versao FROM schema_migrations")}
+
+
+def _estado_passo(
+    conn: sqlite3.Connection, versao: int, passo: int
+) -> tuple[int, bool]:
+    row = conn.execute(
+        """
+        SELECT ultimo_id, concluido FROM schema_migrations_progresso
+        WHERE versao=? AND passo=?
+        """,
+        (versao, passo),
+    ).fetchone()
+    return (int(row[0]), bool(row[1])) if row else (0, False)
+
+
+def _gravar_passo(
+    conn: sqlite3.Connection, versao: int, passo: int, ultimo_id: int, concluido: bool
+) -> None:
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO schema_migrations_progresso(
+            versao, passo, ultimo_id, concluido
+        ) VALUES(?, ?, ?, ?)
+        """,
+        (versao, passo, ultimo_id, int(concluido)),
+    )
+
+
+def _backfill(
+    conn: sqlite3.Connection,
+    m: Migracao,
+    passo: int,
+    b: Backfill,
+    progresso: Progresso,
+    pausa: float,
+) -> bool:
+    """Roda o backfill em lotes. Retorna False se outro migrador já aplicou `m`."""
+
+    while True:
+        db.begin_immediate(conn)
+        if m.versao in versoes_aplicadas(conn):
+            conn.rollback()
+            return False
+        # Estado e máximo relidos dentro da transação: outro migrador pode ter
+        # avançado (ou concluído) este backfill, e linhas inseridas durante o
+        # backfill também entram (o código do app já preenche as escritas novas).
+        ultimo, concluido = _estado_passo(conn, m.versao, passo)
+        maximo = conn.execute(f"SELECT MAX(rowid) FROM {b.tabela}").fetchone()[0] or 0
+        if concluido or ultimo >= maximo:
+            break
+        fim = min(ultimo + b.lote, maximo)
+        cur = conn.execute(
+            f"UPDATE {b.tabela} SET {b.set_sql} "
+            f"WHERE rowid > ? AND rowid <= ? AND ({b.where})",
+            (ultimo, fim),
+        )
+        _gravar_passo(conn, m.versao, passo, fim, False)
+        conn.commit()
+        progresso(
+            f"  v{m.versao} passo {passo}: {b.tabela} até rowid {fim}/{maximo} "
+            f"({fim * 100 // maximo}%), {cur.rowcount} linhas no lote"
+        )
+        if pausa:
+            time.sleep(pausa)
+
+    if not concluido:
+        _gravar_passo(conn, m.versao, passo, ultimo, True)
+    conn.commit()
+    return True
+
+
+def aplicar(
+    conn: sqlite3.Connection,
+    m: Migracao,
+    *,
+    progresso: Progresso,
+    pausa: float = 0.0,
+) -> bool:
+    """Aplica os passos pendentes de `m`. Retorna se foi este processo que a aplicou.
+
+    Outro migrador (o app subindo, ou `python migrations.py` com o app no ar)
+    pode estar rodando ao mesmo tempo, então o estado de cada passo e da versão
+    é relido depois do BEGIN IMMEDIATE: o que o outro já fez é pulado, em vez
+    de repetir um ALTER TABLE ou o INSERT em schema_migrations.
+    """
+
+    progresso(f"aplicando migração v{m.versao}: {m.nome}")
+    for passo, acao in enumerate(m.passos):
+        if isinstance(acao, Backfill):
+            if not _backfill(conn, m, passo, acao, progresso, pausa):
+                return False
+            continue
+        db.begin_immediate(conn)
+        if m.versao in versoes_aplicadas(conn):
+            conn.rollback()
+            return False
+        if not _estado_passo(conn, m.versao, passo)[1]:
+            conn.execute(acao)
+            _gravar_passo(conn, m.versao, passo, 0, True)
+        conn.commit()
+
+    db.begin_immediate(conn)
+    if m.versao in versoes_aplicadas(conn):
+        conn.rollback()
+        return False
+    conn.execute(
+        "INSERT INTO schema_migrations(versao, nome) VALUES(?, ?)",
+        (m.versao, m.nome),
+    )
+    conn.execute("DELETE FROM schema_migrations_progresso WHERE versao=?", (m.versao,))
+    conn.commit()
+    return True
+
+
+def migrar(
+    db_path: str,
+    migracoes: Sequence[Migracao] = MIGRACOES,
+    *,
+    progresso: Progresso | None = None,
+    pausa: float = 0.0,
+) -> list[int]:
+    """Aplica as migrações pendentes, em ordem. Retorna as versões aplicadas."""
+
+    relatar = progresso or (lambda msg: None)
+    ultima = max((m.versao for m in migracoes), default=0)
+    aplicadas: list[int] = []
+    with closing(db.connect(db_path)) as conn:
+        # Caminho rápido da subida: PRAGMA user_version fica no cabeçalho do
+        # arquivo, então um banco já atualizado não executa nenhum DDL.
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= ultima:
+            return aplicadas
+
+        _criar_controle(conn)
+        feitas = versoes_aplicadas(conn)
+        for m in sorted(migracoes, key=lambda m: m.versao):
+            if m.versao in feitas:
+                continue
+            if aplicar(conn, m, progresso=relatar, pausa=pausa):
+                aplicadas.append(m.versao)
+        # Persistente no arquivo. Em WAL, leitores (o pool somente leitura de
+        # `db`) não esperam pelo lock de escrita.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA user_version = {int(ultima)}")
+    return aplicadas
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db", default=os.getenv("DB_PATH", "/data/app.db"))
+    parser.add_argument("--status", action="store_true", help="só listar pendências")
+    parser.add_argument(
+        "--pausa", type=float, default=0.05, help="segundos entre lotes de backfill"
+    )
+    args = parser.parse_args()
+
+    if args.status:
+        # Só leitura: não cria as tabelas de controle num banco ainda não migrado.
+        with closing(db.connect(args.db)) as conn:
+            existe = conn.execute(
+                "SELECT 1 FROM sqlite_master "
+                "WHERE type='table' AND name='schema_migrations'"
+            ).fetchone()
+            feitas = versoes_aplicadas(conn) if existe else set()
+        for m in MIGRACOES:
+            marca = "x" if m.versao in feitas else " "
+            print(f"[{marca}] v{m.versao} {m.nome}")
+        return
+
+    aplicadas = migrar(args.db, progresso=print, pausa=args.pausa)
+    print(f"migrações aplicadas: {aplicadas or 'nenhuma'}")
+
+
+if __name__ == "__main__":
+    main()
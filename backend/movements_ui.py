@@ -4,80 +4,102 @@ Rotas:
 - GET  /movimentacoes (histórico geral)
 - GET  /movimentacoes/nova (formulário)
 - POST /movimentacoes/nova (criar movimentação)
-- GET  /produtos/<id>/movimentacoes (histórico por produto)
+- GET  /produtos/<id>/movimentacoes (histórico por produto; ?desde=/?ate= incluem arquivo)
 """
 
 from __future__ import annotations
 
 import sqlite3
+import time
 from contextlib import closing
 
 from flask import Flask, redirect, render_template_string, request, url_for
 
+import db
+import metrics
+import rollup
+from archive import fonte_movimentacoes, intervalo_datas
+from events import barramento
+
+
+def registrar_movimentacao(
+    db_path: str,
+    *,
+    produto_id: int,
+    tipo: str,
+    quantidade: int,
+    observacao: str | None,
+) -> tuple[bool, str]:
+    """Registra movimentação e atualiza estoque do produto.
+
+    Retorna (ok, mensagem).
+    """
+
+    if tipo not in {"entrada", "saida"}:
+        return False, "Tipo inválido."
+    if quantidade <= 0:
+        return False, "Quantidade deve ser maior que zero."
+
+    with closing(db.connect(db_path)) as conn:
+        conn.row_factory = sqlite3.Row
+        inicio = time.perf_counter()
+        db.begin_immediate(conn)
+
+        row = conn.execute(
+            "SELECT id, categoria, quantidade_atual FROM produtos WHERE id=?",
+            (produto_id,),
+        ).fetchone()
+        if row is None:
+            conn.execute("ROLLBACK")
+            return False, "Produto não encontrado."
+
+        atual = int(row["quantidade_atual"])
+        novo = atual + quantidade if tipo == "entrada" else atual - quantidade
+
+        if novo < 0:
+            conn.execute("ROLLBACK")
+            return False, "Saída não permitida: estoque ficaria negativo."
+
+        cur = conn.execute(
+            """
+            INSERT INTO movimentacoes(produto_id, tipo, quantidade, observacao)
+            VALUES(?, ?, ?, ?)
+            """,
+            (produto_id, tipo, quantidade, observacao),
+        )
+        rollup.somar_movimentacao(
+            conn, int(cur.lastrowid or 0), produto_id, tipo, quantidade
+        )
+        conn.execute(
+            """
+            UPDATE produtos
+            SET quantidade_atual=?, atualizado_em=CURRENT_TIMESTAMP
+            WHERE id=?
+            """,
+            (novo, produto_id),
+        )
+        conn.commit()
+        if metrics.enabled:
+            metrics.MOVEMENT_COMMIT.observe(time.perf_counter() - inicio)
+
+    barramento.publicar(
+        "movimentacao",
+        produto_id=produto_id,
+        categoria=row["categoria"],
+        tipo=tipo,
+        quantidade=quantidade,
+        quantidade_atual=novo,
+    )
+
+    return True, "Movimentação registrada."
+
 
 def register_movements_routes(app: Flask, *, db_path: str, base_style: str) -> None:
     def query_all(sql: str, params: tuple = ()) -> list[sqlite3.Row]:
-        with closing(sqlite3.connect(db_path)) as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.execute(sql, params)
-            return list(cur.fetchall())
+        return db.query_all(db_path, sql, params)
 
     def query_one(sql: str, params: tuple = ()) -> sqlite3.Row | None:
-        with closing(sqlite3.connect(db_path)) as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.execute(sql, params)
-            return cur.fetchone()
-
-    def registrar_movimentacao(
-        *, produto_id: int, tipo: str, quantidade: int, observacao: str | None
-    ) -> tuple[bool, str]:
-        """Registra movimentação e atualiza estoque do produto.
-
-        Retorna (ok, mensagem).
-        """
-
-        if tipo not in {"entrada", "saida"}:
-            return False, "Tipo inválido."
-        if quantidade <= 0:
-            return False, "Quantidade deve ser maior que zero."
-
-        with closing(sqlite3.connect(db_path)) as conn:
-            conn.row_factory = sqlite3.Row
-            conn.execute("BEGIN")
-
-            row = conn.execute(
-                "SELECT id, quantidade_atual FROM produtos WHERE id=?",
-                (produto_id,),
-            ).fetchone()
-            if row is None:
-                conn.execute("ROLLBACK")
-                return False, "Produto não encontrado."
-
-            atual = int(row["quantidade_atual"])
-            novo = atual + quantidade if tipo == "entrada" else atual - quantidade
-
-            if novo < 0:
-                conn.execute("ROLLBACK")
-                return False, "Saída não permitida: estoque ficaria negativo."
-
-            conn.execute(
-                """
-                INSERT INTO movimentacoes(produto_id, tipo, quantidade, observacao)
-                VALUES(?, ?, ?, ?)
-                """,
-                (produto_id, tipo, quantidade, observacao),
-            )
-            conn.execute(
-                """
-                UPDATE produtos
-                SET quantidade_atual=?, atualizado_em=CURRENT_TIMESTAMP
-                WHERE id=?
-                """,
-                (novo, produto_id),
-            )
-            conn.commit()
-
-        return True, "Movimentação registrada."
+        return db.query_one(db_path, sql, params)
 
     list_template = """
 <!doctype html>
@@ -212,6 +234,13 @@ def register_movements_routes(app: Flask, *, db_path: str, base_style: str) -> N
       <h1>Movimentações — {{ produto.nome }}</h1>
       <p><strong>SKU:</strong> <code>{{ produto.sku }}</code></p>
 
+      <form method="get" class="row">
+        <label>Desde <input type="date" name="desde" value="{{ desde or '' }}" /></label>
+        <label>Até <input type="date" name="ate" value="{{ ate or '' }}" /></label>
+        <button class="btn" type="submit">Filtrar</button>
+      </form>
+      <div class="spacer"></div>
+
       <table>
         <thead>
           <tr>
@@ -308,6 +337,7 @@ def register_movements_routes(app: Flask, *, db_path: str, base_style: str) -> N
         quantidade = int(quantidade_str) if quantidade_str.isdigit() else 0
 
         ok, msg = registrar_movimentacao(
+            db_path,
             produto_id=produto_id,
             tipo=tipo,
             quantidade=quantidade,
@@ -334,15 +364,20 @@ def register_movements_routes(app: Flask, *, db_path: str, base_style: str) -> N
         if produto is None:
             return redirect(url_for("produtos_list", err="Produto não encontrado."))
 
+        # `?desde=`/`?ate=` (AAAA-MM-DD) também buscam no histórico arquivado.
+        intervalo = intervalo_datas(request.args.get("desde"), request.args.get("ate"))
+        desde, ate = intervalo or (None, None)
+        with db.leitura(db_path) as conn:
+            fonte = fonte_movimentacoes(conn, desde=desde, ate=ate)
         movimentos = query_all(
-            """
+            f"""
             SELECT *
-            FROM movimentacoes
-            WHERE produto_id=?
+            FROM {fonte}
+            WHERE produto_id=? AND criado_em >= ? AND (? IS NULL OR criado_em < ?)
             ORDER BY criado_em DESC, id DESC
             LIMIT 200
             """,
-            (produto_id,),
+            (produto_id, desde or "", ate, ate),
         )
 
         return render_template_string(
@@ -350,4 +385,6 @@ def register_movements_routes(app: Flask, *, db_path: str, base_style: str) -> N
             base_style=base_style,
             produto=dict(produto),
             movimentos=movimentos,
+            desde=desde,
+            ate=request.args.get("ate") if ate else None,
         )
@@ -15,45 +15,146 @@ Rotas (UI):
 from __future__ import annotations
 
 import sqlite3
-from contextlib import closing
+from collections.abc import Mapping
+from typing import Any, NamedTuple
 
 from flask import Flask, redirect, render_template_string, request, url_for
 
+import db
+from events import barramento
+
+
+# Colunas expostas de produtos (também usadas como whitelist pela API JSON).
+PRODUTO_CAMPOS = (
+    "id",
+    "nome",
+    "sku",
+    "categoria",
+    "fornecedor",
+    "custo",
+    "preco",
+    "quantidade_atual",
+    "estoque_minimo",
+    "criado_em",
+    "atualizado_em",
+)
+
+INSERT_PRODUTO_SQL = """
+    INSERT INTO produtos(
+        nome, sku, categoria, fornecedor, custo, preco,
+        quantidade_atual, estoque_minimo
+    ) VALUES(?, ?, ?, ?, ?, ?, ?, ?)
+"""
 
-def register_products_routes(app: Flask, *, db_path: str, base_style: str) -> None:
-    def parse_int(value: str | None, default: int = 0) -> int:
-        if value is None or value == "":
-            return default
-        try:
-            return int(value)
-        except ValueError:
-            return default
+UPDATE_PRODUTO_SQL = """
+    UPDATE produtos
+    SET nome=?, sku=?, categoria=?, fornecedor=?, custo=?, preco=?,
+        quantidade_atual=?, estoque_minimo=?, atualizado_em=CURRENT_TIMESTAMP
+    WHERE id=?
+"""
+
+
+class ProdutoLinha(NamedTuple):
+    """Linha da listagem: só as colunas mostradas, numa tupla (sem dict por linha)."""
+
+    id: int
+    nome: str
+    sku: str
+    categoria: str | None
+    fornecedor: str | None
+    quantidade_atual: int
+    estoque_minimo: int
+    low_stock: int
+
+
+# Na ordem de ProdutoLinha; o estoque baixo é calculado no SQL.
+LISTA_PRODUTOS_SQL = """
+    SELECT id, nome, sku, categoria, fornecedor, quantidade_atual, estoque_minimo,
+           quantidade_atual <= estoque_minimo AS low_stock
+    FROM produtos
+"""
 
-    def parse_float(value: str | None, default: float = 0.0) -> float:
-        if value is None or value == "":
-            return default
-        try:
-            # aceitar vírgula como separador
-            return float(value.replace(",", "."))
-        except ValueError:
-            return default
 
-    def query_all(sql: str, params: tuple = ()) -> list[sqlite3.Row]:
-        with closing(sqlite3.connect(db_path)) as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.execute(sql, params)
-            return list(cur.fetchall())
+def parse_int(value: str | None, default: int = 0) -> int:
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+def parse_float(value: str | None, default: float = 0.0) -> float:
+    if value is None or value == "":
+        return default
+    try:
+        # aceitar vírgula como separador
+        return float(value.replace(",", "."))
+    except ValueError:
+        return default
+
+
+def validar_produto(
+    dados: Mapping[str, str | None],
+) -> tuple[tuple[str, str, str | None, str | None, float, float, int, int], str | None]:
+    """Normaliza os campos de um produto (formulário ou JSON).
+
+    Retorna (valores, erro): valores na ordem de INSERT_PRODUTO_SQL; erro é None
+    quando o produto é válido.
+    """
+
+    nome = (dados.get("nome") or "").strip()
+    sku = (dados.get("sku") or "").strip()
+    categoria = (dados.get("categoria") or "").strip() or None
+    fornecedor = (dados.get("fornecedor") or "").strip() or None
+    valores = (
+        nome,
+        sku,
+        categoria,
+        fornecedor,
+        parse_float(dados.get("custo"), 0.0),
+        parse_float(dados.get("preco"), 0.0),
+        parse_int(dados.get("quantidade_atual"), 0),
+        parse_int(dados.get("estoque_minimo"), 0),
+    )
+    if not nome or not sku:
+        return valores, "Nome e SKU são obrigatórios."
+    return valores, None
+
+
+def filtros_produtos(q: str, categoria: str, fornecedor: str) -> tuple[str, list[str]]:
+    """Monta a cláusula WHERE (ou "") e os parâmetros dos filtros da listagem."""
+
+    where = []
+    params: list[str] = []
+
+    if q:
+        where.append("(nome LIKE ? OR sku LIKE ?)")
+        like = f"%{q}%"
+        params.extend([like, like])
+    if categoria:
+        where.append("categoria = ?")
+        params.append(categoria)
+    if fornecedor:
+        where.append("fornecedor = ?")
+        params.append(fornecedor)
+
+    if not where:
+        return "", params
+    return " WHERE " + " AND ".join(where), params
 
+
+def register_products_routes(app: Flask, *, db_path: str, base_style: str) -> None:
     def query_one(sql: str, params: tuple = ()) -> sqlite3.Row | None:
-        with closing(sqlite3.connect(db_path)) as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.execute(sql, params)
-            return cur.fetchone()
+        return db.query_one(db_path, sql, params)
+
+    def query_rows(
+        sql: str, params: tuple = ()
+    ) -> tuple[list[str], list[tuple[Any, ...]]]:
+        return db.query_rows(db_path, sql, params)
 
-    def execute(sql: str, params: tuple = ()) -> None:
-        with closing(sqlite3.connect(db_path)) as conn:
-            conn.execute(sql, params)
-            conn.commit()
+    def execute(sql: str, params: tuple = ()) -> int | None:
+        return db.execute(db_path, sql, params)
 
     list_template = """
 <!doctype html>
@@ -259,34 +360,11 @@ def register_products_routes(app: Flask, *, db_path: str, base_style: str) -> No
         categoria = (request.args.get("categoria") or "").strip()
         fornecedor = (request.args.get("fornecedor") or "").strip()
 
-        where = []
-        params: list[str] = []
-
-        if q:
-            where.append("(nome LIKE ? OR sku LIKE ?)")
-            like = f"%{q}%"
-            params.extend([like, like])
-        if categoria:
-            where.append("categoria = ?")
-            params.append(categoria)
-        if fornecedor:
-            where.append("fornecedor = ?")
-            params.append(fornecedor)
-
-        sql = "SELECT * FROM produtos"
-        if where:
-            sql += " WHERE " + " AND ".join(where)
-        sql += " ORDER BY nome ASC"
-
-        rows = query_all(sql, tuple(params))
-        produtos = []
-        for r in rows:
-            produtos.append(
-                {
-                    **dict(r),
-                    "low_stock": int(r["quantidade_atual"]) <= int(r["estoque_minimo"]),
-                }
-            )
+        where, params = filtros_produtos(q, categoria, fornecedor)
+        sql = LISTA_PRODUTOS_SQL + where + " ORDER BY nome ASC"
+
+        _, rows = query_rows(sql, tuple(params))
+        produtos = list(map(ProdutoLinha._make, rows))
 
         return render_template_string(
             list_template,
@@ -321,14 +399,8 @@ def register_products_routes(app: Flask, *, db_path: str, base_style: str) -> No
 
     @app.post("/produtos/novo")
     def produtos_create():
-        nome = (request.form.get("nome") or "").strip()
-        sku = (request.form.get("sku") or "").strip()
-        categoria = (request.form.get("categoria") or "").strip() or None
-        fornecedor = (request.form.get("fornecedor") or "").strip() or None
-        custo = parse_float(request.form.get("custo"), 0.0)
-        preco = parse_float(request.form.get("preco"), 0.0)
-        quantidade_atual = parse_int(request.form.get("quantidade_atual"), 0)
-        estoque_minimo = parse_int(request.form.get("estoque_minimo"), 0)
+        valores, erro = validar_produto(request.form)
+        nome, sku, categoria, fornecedor = valores[:4]
 
         produto = {
             "nome": nome,
@@ -341,34 +413,17 @@ def register_products_routes(app: Flask, *, db_path: str, base_style: str) -> No
             "estoque_minimo": request.form.get("estoque_minimo") or "0",
         }
 
-        if not nome or not sku:
+        if erro:
             return render_template_string(
                 form_template,
                 base_style=base_style,
                 titulo="Novo produto",
                 produto=produto,
-                msg_err="Nome e SKU são obrigatórios.",
+                msg_err=erro,
             )
 
         try:
-            execute(
-                """
-                INSERT INTO produtos(
-                    nome, sku, categoria, fornecedor, custo, preco,
-                    quantidade_atual, estoque_minimo
-                ) VALUES(?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    nome,
-                    sku,
-                    categoria,
-                    fornecedor,
-                    float(custo),
-                    float(preco),
-                    int(quantidade_atual),
-                    int(estoque_minimo),
-                ),
-            )
+            produto_id = execute(INSERT_PRODUTO_SQL, valores)
         except sqlite3.IntegrityError:
             return render_template_string(
                 form_template,
@@ -377,6 +432,9 @@ def register_products_routes(app: Flask, *, db_path: str, base_style: str) -> No
                 produto=produto,
                 msg_err="SKU já existe. Use um SKU diferente.",
             )
+        barramento.publicar(
+            "produto", acao="criado", produto_id=produto_id, categoria=categoria
+        )
 
         return redirect(url_for("produtos_list", ok="Produto criado."))
 
@@ -439,45 +497,21 @@ def register_products_routes(app: Flask, *, db_path: str, base_style: str) -> No
 
     @app.post("/produtos/<int:produto_id>/editar")
     def produtos_update(produto_id: int):
-        nome = (request.form.get("nome") or "").strip()
-        sku = (request.form.get("sku") or "").strip()
-        categoria = (request.form.get("categoria") or "").strip() or None
-        fornecedor = (request.form.get("fornecedor") or "").strip() or None
-        custo = parse_float(request.form.get("custo"), 0.0)
-        preco = parse_float(request.form.get("preco"), 0.0)
-        quantidade_atual = parse_int(request.form.get("quantidade_atual"), 0)
-        estoque_minimo = parse_int(request.form.get("estoque_minimo"), 0)
-
-        if not nome or not sku:
+        valores, erro = validar_produto(request.form)
+        nome, sku = valores[:2]
+
+        if erro:
             produto = query_one("SELECT * FROM produtos WHERE id=?", (produto_id,))
             return render_template_string(
                 form_template,
                 base_style=base_style,
                 titulo="Editar produto",
                 produto=dict(produto) if produto else {"nome": nome, "sku": sku},
-                msg_err="Nome e SKU são obrigatórios.",
+                msg_err=erro,
             )
 
         try:
-            execute(
-                """
-                UPDATE produtos
-                SET nome=?, sku=?, categoria=?, fornecedor=?, custo=?, preco=?,
-                    quantidade_atual=?, estoque_minimo=?, atualizado_em=CURRENT_TIMESTAMP
-                WHERE id=?
-                """,
-                (
-                    nome,
-                    sku,
-                    categoria,
-                    fornecedor,
-                    float(custo),
-                    float(preco),
-                    int(quantidade_atual),
-                    int(estoque_minimo),
-                    int(produto_id),
-                ),
-            )
+            execute(UPDATE_PRODUTO_SQL, (*valores, int(produto_id)))
         except sqlite3.IntegrityError:
             produto = query_one("SELECT * FROM produtos WHERE id=?", (produto_id,))
             return render_template_string(
@@ -487,10 +521,21 @@ def register_products_routes(app: Flask, *, db_path: str, base_style: str) -> No
                 produto=dict(produto) if produto else {"nome": nome, "sku": sku},
                 msg_err="SKU já existe. Use um SKU diferente.",
             )
+        barramento.publicar(
+            "produto", acao="atualizado", produto_id=produto_id, categoria=valores[2]
+        )
 
         return redirect(url_for("produtos_detail", produto_id=produto_id))
 
     @app.post("/produtos/<int:produto_id>/excluir")
     def produtos_delete(produto_id: int):
+        produto = query_one("SELECT categoria FROM produtos WHERE id=?", (produto_id,))
         execute("DELETE FROM produtos WHERE id=?", (produto_id,))
+        if produto is not None:
+            barramento.publicar(
+                "produto",
+                acao="excluido",
+                produto_id=produto_id,
+                categoria=produto["categoria"],
+            )
         return redirect(url_for("produtos_list", ok="Produto excluído."))
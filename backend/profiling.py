@@ -0,0 +1,91 @@
+"""Log de consultas lentas e perfil por requisição.
+
+- `SLOW_QUERY_MS=<ms>`: registra no logger `estoque.sql` cada comando que
+  passar do limite, com texto, formato dos parâmetros, duração, linhas e o
+  `EXPLAIN QUERY PLAN`.
+- Perfil por requisição (só com `app.debug` ou `PROFILING_ENABLED=1`): envie o
+  header `X-Profile: 1` ou `?_profile=1` e a resposta traz `Server-Timing` com
+  o tempo de banco, de renderização de template e o restante (Python). O modo
+  debug é conferido a cada requisição, então vale também o ligado depois do
+  `create_app` (`app.run(debug=True)`, `flask run --debug`).
+"""
+
+from __future__ import annotations
+
+import time
+from contextvars import Token
+
+from flask import (
+    Flask,
+    before_render_template,
+    current_app,
+    g,
+    request,
+    template_rendered,
+)
+
+import db
+
+
+class PerfilRequisicao(db.PerfilSQL):
+    __slots__ = ("inicio", "render_segundos", "_render_inicio")
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.inicio = time.perf_counter()
+        self.render_segundos = 0.0
+        self._render_inicio = 0.0
+
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.inicio
+        python = max(0.0, total - self.segundos - self.render_segundos)
+        return ", ".join(
+            [
+                f'db;dur={self.segundos * 1000:.2f};desc="{self.consultas} consultas"',
+                f"render;dur={self.render_segundos * 1000:.2f}",
+                f"python;dur={python * 1000:.2f}",
+                f"total;dur={total * 1000:.2f}",
+            ]
+        )
+
+
+def _inicio_render(sender, **extra) -> None:
+    perfil = db.perfil_atual.get()
+    if isinstance(perfil, PerfilRequisicao):
+        perfil._render_inicio = time.perf_counter()
+
+
+def _fim_render(sender, **extra) -> None:
+    perfil = db.perfil_atual.get()
+    if isinstance(perfil, PerfilRequisicao) and perfil._render_inicio:
+        perfil.render_segundos += time.perf_counter() - perfil._render_inicio
+        perfil._render_inicio = 0.0
+
+
+def register_profiling(
+    app: Flask, *, slow_query_ms: float | None, habilitado: bool
+) -> None:
+    db.slow_query_ms = slow_query_ms
+
+    before_render_template.connect(_inicio_render, app)
+    template_rendered.connect(_fim_render, app)
+
+    @app.before_request
+    def _perfil_inicio():
+        if not (habilitado or current_app.debug):
+            return
+        if request.headers.get("X-Profile") == "1" or request.args.get("_profile"):
+            g.perfil_token = db.perfil_atual.set(PerfilRequisicao())
+
+    @app.after_request
+    def _perfil_fim(response):
+        perfil = db.perfil_atual.get()
+        if "perfil_token" in g and isinstance(perfil, PerfilRequisicao):
+            response.headers["Server-Timing"] = perfil.server_timing()
+        return response
+
+    @app.teardown_request
+    def _perfil_reset(exc):
+        token: Token | None = g.pop("perfil_token", None)
+        if token is not None:
+            db.perfil_atual.reset(token)
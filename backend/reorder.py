@@ -0,0 +1,215 @@
+"""Sugestão de reposição para o catálogo inteiro.
+
+O consumo de cada produto sai dos totais diários (`movimentacoes_diarias`) numa
+única consulta agregada: soma e soma dos quadrados das saídas do período, o que
+basta para média e desvio padrão do consumo diário (dias sem saída contam como
+zero). O cálculo é feito por colunas (`array`), sem objeto por produto:
+
+    estoque de segurança = z(nivel) · desvio · √prazo
+    ponto de pedido      = consumo médio · prazo + estoque de segurança
+    sugerido             = consumo médio · (prazo + revisao) + segurança − atual
+                           (só quando o estoque atual está no ponto de pedido)
+
+Rotas:
+- GET /api/v1/reposicao          (?dias=90&prazo=7&revisao=14&nivel=0.95
+                                  &fornecedor=&ate=AAAA-MM-DD)
+- GET /csv/export/reposicao.csv  (mesmos parâmetros, agrupado por fornecedor)
+
+Como em `analytics.py`, as rotas só leem; com os totais diários atrasados
+respondem com `X-Diarias-Pendentes` e a atualização roda em segundo plano.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import math
+from array import array
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import date, timedelta
+from statistics import NormalDist
+from typing import Any
+
+from flask import Flask, Response, request
+
+import db
+from api import json_response
+from rollup import atualizador_do_app, avisar_pendentes
+
+REPOSICAO_HEADERS = [
+    "fornecedor",
+    "sku",
+    "nome",
+    "quantidade_atual",
+    "estoque_minimo",
+    "consumo_medio_diario",
+    "desvio_diario",
+    "estoque_seguranca",
+    "ponto_pedido",
+    "sugerido",
+]
+
+
+@dataclass(frozen=True)
+class Parametros:
+    dias: int = 90
+    prazo: int = 7
+    revisao: int = 14
+    nivel: float = 0.95
+    ate: date | None = None
+    fornecedor: str | None = None
+
+
+def parse_parametros(args: Mapping[str, str]) -> Parametros | str:
+    """Lê os parâmetros da query string. Retorna a mensagem de erro se inválidos."""
+
+    try:
+        p = Parametros(
+            dias=int(args.get("dias") or 90),
+            prazo=int(args.get("prazo") or 7),
+            revisao=int(args.get("revisao") or 14),
+            nivel=float(args.get("nivel") or 0.95),
+            ate=date.fromisoformat(args["ate"]) if args.get("ate") else None,
+            fornecedor=args.get("fornecedor") or None,
+        )
+    except ValueError:
+        return "Parâmetros inválidos."
+    if p.dias <= 0 or p.prazo < 0 or p.revisao < 0 or not 0.5 <= p.nivel < 1:
+        return "Use dias > 0, prazo/revisao >= 0 e 0.5 <= nivel < 1."
+    return p
+
+
+def calcular(
+    saidas: array, quadrados: array, atual: array, p: Parametros
+) -> tuple[array, array, array, array, array]:
+    """(consumo médio, desvio, segurança, ponto de pedido, sugerido) por produto."""
+
+    n = p.dias
+    z = NormalDist().inv_cdf(p.nivel)
+    raiz_prazo = math.sqrt(p.prazo)
+    media = array("d", [s / n for s in saidas])
+    desvio = array(
+        "d", [math.sqrt(max(0.0, q / n - m * m)) for q, m in zip(quadrados, media)]
+    )
+    seguranca = array("d", [z * d * raiz_prazo for d in desvio])
+    ponto = array("d", [m * p.prazo + s for m, s in zip(media, seguranca)])
+    horizonte = p.prazo + p.revisao
+    sugerido = array(
+        "q",
+        [
+            max(0, math.ceil(m * horizonte + s - a)) if a <= r else 0
+            for m, s, a, r in zip(media, seguranca, atual, ponto)
+        ],
+    )
+    return media, desvio, seguranca, ponto, sugerido
+
+
+def sugestoes(db_path: str, p: Parametros) -> list[dict[str, Any]]:
+    """Produtos com reposição sugerida, ordenados por fornecedor e SKU.
+
+    Produto sem saída no período nunca tem sugestão (consumo zero), então o
+    cálculo só percorre os que tiveram saída, e nome/SKU/fornecedor só são lidos
+    para os sugeridos.
+    """
+
+    fim = (p.ate or date.today()) + timedelta(days=1)
+    inicio = fim - timedelta(days=p.dias)
+    filtro = "WHERE p.fornecedor = ?" if p.fornecedor else ""
+    params: tuple = (inicio.isoformat(), fim.isoformat())
+    if p.fornecedor:
+        params += (p.fornecedor,)
+    _, rows = db.query_rows(
+        db_path,
+        f"""
+        SELECT p.id, p.quantidade_atual, d.saidas, d.quadrados
+        FROM (
+            SELECT produto_id,
+                   SUM(total_saida) AS saidas,
+                   SUM(total_saida * total_saida) AS quadrados
+            FROM movimentacoes_diarias
+            WHERE dia >= ? AND dia < ?
+            GROUP BY produto_id
+            HAVING SUM(total_saida) > 0
+        ) d
+        JOIN produtos p ON p.id = d.produto_id
+        {filtro}
+        """,
+        params,
+    )
+    if not rows:
+        return []
+
+    ids, atual, saidas, quadrados = zip(*rows)
+    media, desvio, seguranca, ponto, sugerido = calcular(
+        array("d", saidas), array("d", quadrados), array("d", atual), p
+    )
+    indice = {ids[i]: i for i in range(len(ids)) if sugerido[i]}
+    if not indice:
+        return []
+
+    _, detalhes = db.query_rows(
+        db_path,
+        """
+        SELECT id, fornecedor, sku, nome, estoque_minimo FROM produtos
+        WHERE id IN (SELECT value FROM json_each(?))
+        ORDER BY fornecedor, sku
+        """,
+        (json.dumps(list(indice)),),
+    )
+    itens = []
+    for produto_id, fornecedor, sku, nome, minimo in detalhes:
+        i = indice[produto_id]
+        itens.append(
+            {
+                "fornecedor": fornecedor,
+                "sku": sku,
+                "nome": nome,
+                "quantidade_atual": atual[i],
+                "estoque_minimo": minimo,
+                "consumo_medio_diario": round(media[i], 3),
+                "desvio_diario": round(desvio[i], 3),
+                "estoque_seguranca": math.ceil(seguranca[i]),
+                "ponto_pedido": math.ceil(ponto[i]),
+                "sugerido": sugerido[i],
+            }
+        )
+    return itens
+
+
+def register_reorder_routes(app: Flask, *, db_path: str) -> None:
+    atualizador = atualizador_do_app(app, db_path)
+
+    @app.get("/api/v1/reposicao")
+    def api_reposicao():
+        p = parse_parametros(request.args)
+        if isinstance(p, str):
+            return json_response({"erro": p}, status=400)
+        faltam = atualizador.verificar()
+        itens = sugestoes(db_path, p)
+        return avisar_pendentes(
+            json_response({"itens": itens, "total": len(itens)}), faltam
+        )
+
+    @app.get("/csv/export/reposicao.csv")
+    def csv_export_reposicao():
+        p = parse_parametros(request.args)
+        if isinstance(p, str):
+            return Response(p, status=400)
+        faltam = atualizador.verificar()
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(REPOSICAO_HEADERS)
+        for item in sugestoes(db_path, p):
+            writer.writerow(
+                "" if item[k] is None else item[k] for k in REPOSICAO_HEADERS
+            )
+        return avisar_pendentes(
+            Response(
+                buf.getvalue().encode("utf-8"),
+                mimetype="text/csv; charset=utf-8",
+                headers={"Content-Disposition": 'attachment; filename="reposicao.csv"'},
+            ),
+            faltam,
+        )
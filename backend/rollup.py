@@ -0,0 +1,252 @@
+"""Tabela de totais diários por produto (`movimentacoes_diarias`).
+
+Uma linha por (produto, dia) com entradas, saídas e número de movimentações,
+para que perguntas por período virem leituras por índice cujo custo não cresce
+com o tamanho do histórico.
+
+A marca d'água `app_state.diarias_ate_id` é o maior id de movimentação já
+contado. `registrar_movimentacao` soma na mesma transação do INSERT
+(`somar_movimentacao`); o que entrar por fora (inserções em lote) é dobrado
+por `atualizar_diarias`, em lotes. As consultas não escrevem: leem pelo pool
+somente leitura e, se houver pendências, acordam o `AtualizadorDiarias` do
+app, que dobra em segundo plano (a resposta sai sem elas e avisa quantas são).
+
+Uso:
+    python rollup.py [--db /data/app.db]   (põe a tabela em dia)
+    python rollup.py --reconstruir         (refaz do zero, incluindo arquivos)
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import weakref
+from contextlib import closing
+
+from flask import Flask, Response
+
+import db
+
+log = logging.getLogger("estoque.rollup")
+
+LOTE_DIARIAS = 50_000
+
+
+def _marca(conn: sqlite3.Connection) -> int:
+    row = conn.execute(
+        "SELECT value FROM app_state WHERE key='diarias_ate_id'"
+    ).fetchone()
+    return int(row[0]) if row else 0
+
+
+# Agrega um intervalo de movimentações (de `tabela`) e soma nos totais diários.
+_DOBRAR_SQL = """
+    INSERT INTO movimentacoes_diarias(
+        produto_id, dia, total_entrada, total_saida, movimentos
+    )
+    SELECT produto_id, date(criado_em),
+           SUM(CASE WHEN tipo='entrada' THEN quantidade ELSE 0 END),
+           SUM(CASE WHEN tipo='saida' THEN quantidade ELSE 0 END),
+           COUNT(*)
+    FROM {tabela}
+    WHERE id > ? AND id <= ?
+    GROUP BY produto_id, date(criado_em)
+    ON CONFLICT(produto_id, dia) DO UPDATE SET
+        total_entrada = total_entrada + excluded.total_entrada,
+        total_saida = total_saida + excluded.total_saida,
+        movimentos = movimentos + excluded.movimentos
+"""
+
+
+def somar_movimentacao(
+    conn: sqlite3.Connection,
+    mov_id: int,
+    produto_id: int,
+    tipo: str,
+    quantidade: int,
+) -> bool:
+    """Soma uma movimentação recém-inserida, na transação de escrita do chamador.
+
+    Só soma (e avança a marca para `mov_id`) se a tabela estiver em dia com todas
+    as movimentações anteriores; senão deixa para `atualizar_diarias`, que
+    dobra o intervalo inteiro sem contar nada duas vezes. Retorna se somou.
+    """
+
+    cur = conn.execute(
+        """
+        UPDATE app_state SET value=:id
+        WHERE key='diarias_ate_id'
+          AND CAST(value AS INTEGER) = (
+              SELECT COALESCE(MAX(id), 0) FROM movimentacoes WHERE id < :id
+          )
+        """,
+        {"id": mov_id},
+    )
+    if not cur.rowcount:
+        return False
+    entrada = quantidade if tipo == "entrada" else 0
+    conn.execute(
+        """
+        INSERT INTO movimentacoes_diarias(
+            produto_id, dia, total_entrada, total_saida, movimentos
+        )
+        SELECT produto_id, date(criado_em), ?, ?, 1
+        FROM movimentacoes WHERE id = ?
+        ON CONFLICT(produto_id, dia) DO UPDATE SET
+            total_entrada = total_entrada + excluded.total_entrada,
+            total_saida = total_saida + excluded.total_saida,
+            movimentos = movimentos + 1
+        """,
+        (entrada, quantidade - entrada, mov_id),
+    )
+    return True
+
+
+def atualizar_diarias(conn: sqlite3.Connection, *, lote: int = LOTE_DIARIAS) -> int:
+    """Dobra em `movimentacoes_diarias` as movimentações ainda não contadas.
+
+    Cobre o que não passou por `somar_movimentacao` (inserções em lote direto
+    no banco, ou depois de `reconstruir`). Retorna quantas linhas diárias foram
+    gravadas. Sem pendências custa só duas leituras (marca d'água e MAX(id)),
+    sem lock de escrita.
+    """
+
+    processadas = 0
+    while True:
+        maximo = conn.execute("SELECT MAX(id) FROM movimentacoes").fetchone()[0] or 0
+        if _marca(conn) >= maximo:
+            return processadas
+        db.begin_immediate(conn)
+        # Relida sob o lock: outro processo pode ter avançado a marca.
+        inicio = _marca(conn)
+        fim = min(inicio + lote, maximo)
+        cur = conn.execute(_DOBRAR_SQL.format(tabela="movimentacoes"), (inicio, fim))
+        conn.execute(
+            "UPDATE app_state SET value=? WHERE key='diarias_ate_id'", (str(fim),)
+        )
+        conn.commit()
+        processadas += max(cur.rowcount, 0)
+
+
+def pendentes(conn: sqlite3.Connection) -> int:
+    """Ids de movimentação acima da marca d'água (0 se a tabela está em dia)."""
+
+    maximo = conn.execute("SELECT MAX(id) FROM movimentacoes").fetchone()[0] or 0
+    return max(0, maximo - _marca(conn))
+
+
+class AtualizadorDiarias:
+    """Dobra as pendências numa thread própria, fora das requisições de leitura."""
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def verificar(self) -> int:
+        """Pendências vistas pelo pool de leitura; se houver, acorda a thread."""
+
+        with db.leitura(self.db_path) as conn:
+            faltam = pendentes(conn)
+        if faltam:
+            self.acordar()
+        return faltam
+
+    def acordar(self) -> None:
+        with self._lock:
+            if self._parar.is_set():
+                return
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._rodar, name="rollup-diarias", daemon=True
+                )
+                self._thread.start()
+        self._acordar.set()
+
+    def parar(self, timeout: float | None = None) -> None:
+        self._parar.set()
+        self._acordar.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _rodar(self) -> None:
+        while True:
+            self._acordar.wait()
+            if self._parar.is_set():
+                return
+            self._acordar.clear()
+            try:
+                with closing(db.connect(self.db_path)) as conn:
+                    atualizar_diarias(conn)
+            except sqlite3.Error:
+                log.exception("falha ao atualizar os totais diários")
+
+
+def atualizador_do_app(app: Flask, db_path: str) -> AtualizadorDiarias:
+    """O atualizador do app (um por app, parado quando o app é coletado)."""
+
+    atualizador = app.extensions.get("atualizador_diarias")
+    if atualizador is None:
+        atualizador = app.extensions["atualizador_diarias"] = AtualizadorDiarias(
+            db_path
+        )
+        weakref.finalize(app, atualizador.parar, 0)
+    return atualizador
+
+
+def avisar_pendentes(res: Response, faltam: int) -> Response:
+    """Marca a resposta calculada sem `faltam` movimentações ainda não somadas."""
+
+    if faltam:
+        res.headers["X-Diarias-Pendentes"] = str(faltam)
+    return res
+
+
+def reconstruir(conn: sqlite3.Connection, *, lote: int = LOTE_DIARIAS) -> int:
+    """Refaz a tabela do zero: arquivos (ver archive.py) e depois o livro ativo.
+
+    Escritas concorrentes não se perdem: com a marca em 0 elas deixam de ser
+    somadas na hora e entram pelo `atualizar_diarias` do final.
+    """
+
+    db.begin_immediate(conn)
+    conn.execute("DELETE FROM movimentacoes_diarias")
+    conn.execute("UPDATE app_state SET value='0' WHERE key='diarias_ate_id'")
+    conn.commit()
+
+    processadas = 0
+    arquivos = [r[0] for r in conn.execute("SELECT tabela FROM arquivo_periodos")]
+    for tabela in arquivos:
+        # Tabelas de arquivo não mudam: uma transação por tabela basta.
+        db.begin_immediate(conn)
+        cur = conn.execute(_DOBRAR_SQL.format(tabela=tabela), (0, 2**63 - 1))
+        conn.commit()
+        processadas += max(cur.rowcount, 0)
+    return processadas + atualizar_diarias(conn, lote=lote)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db", default=os.getenv("DB_PATH", "/data/app.db"))
+    parser.add_argument(
+        "--reconstruir", action="store_true", help="refazer a tabela do zero"
+    )
+    args = parser.parse_args()
+    with closing(db.connect(args.db)) as conn:
+        if args.reconstruir:
+            gravadas = reconstruir(conn)
+        else:
+            gravadas = atualizar_diarias(conn)
+    print(f"linhas diárias gravadas: {gravadas}")
+
+
+if __name__ == "__main__":
+    main()
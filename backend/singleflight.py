@@ -0,0 +1,81 @@
+"""Execução única de trabalhos idênticos concorrentes (single-flight).
+
+Enquanto `fazer(chave, fn)` está executando, outras chamadas com a mesma chave
+não executam `fn` de novo: esperam e recebem o mesmo resultado (ou a mesma
+exceção). Com `ttl`, o resultado ainda é reaproveitado por `ttl` segundos
+depois de pronto; sem, a próxima chamada depois do fim executa de novo.
+`limpar()` descarta os resultados guardados e faz as próximas chamadas
+executarem de novo, mesmo com uma execução da chave em andamento.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future
+from typing import Any
+
+# Origem do resultado devolvido por `fazer`.
+EXECUTADA = "executada"
+EM_VOO = "em_voo"
+CACHE = "cache"
+
+# Resultados guardados (com ttl) no máximo; cheio, não guarda novos até expirarem.
+MAX_CACHE = 1024
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._em_voo: dict[Hashable, Future[Any]] = {}
+        # chave -> (expira em, resultado)
+        self._cache: dict[Hashable, tuple[float, Any]] = {}
+
+    def fazer(
+        self, chave: Hashable, fn: Callable[[], Any], *, ttl: float = 0.0
+    ) -> tuple[Any, str]:
+        """(resultado, origem): EXECUTADA, EM_VOO (esperou outra) ou CACHE."""
+
+        with self._lock:
+            if ttl > 0:
+                guardado = self._cache.get(chave)
+                if guardado is not None:
+                    if guardado[0] > time.monotonic():
+                        return guardado[1], CACHE
+                    del self._cache[chave]
+            futuro = self._em_voo.get(chave)
+            dono = futuro is None
+            if futuro is None:
+                futuro = self._em_voo[chave] = Future()
+        if not dono:
+            return futuro.result(), EM_VOO
+        try:
+            resultado = fn()
+        except BaseException as e:
+            futuro.set_exception(e)
+            raise
+        else:
+            futuro.set_result(resultado)
+            return resultado, EXECUTADA
+        finally:
+            with self._lock:
+                # Depois de `limpar()` a chave pode já ser de outra execução.
+                if self._em_voo.get(chave) is futuro:
+                    del self._em_voo[chave]
+                    if ttl > 0 and not futuro.exception():
+                        self._guardar(chave, futuro.result(), ttl)
+
+    def _guardar(self, chave: Hashable, resultado: Any, ttl: float) -> None:
+        agora = time.monotonic()
+        if len(self._cache) >= MAX_CACHE:
+            for k in [k for k, (expira, _) in self._cache.items() if expira <= agora]:
+                del self._cache[k]
+            if len(self._cache) >= MAX_CACHE:
+                return
+        self._cache[chave] = (agora + ttl, resultado)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._em_voo.clear()
+            self._cache.clear()
@@ -0,0 +1,153 @@
+import sqlite3
+import time
+from contextlib import closing
+from datetime import date
+
+from app import create_app
+from archive import arquivar
+from movements_ui import registrar_movimentacao
+from rollup import atualizar_diarias, reconstruir
+
+
+def _esperar_diarias(client, url):
+    """GET até a atualização em segundo plano dos totais diários terminar."""
+
+    limite = time.monotonic() + 5
+    while True:
+        res = client.get(url)
+        if "X-Diarias-Pendentes" not in res.headers:
+            return res
+        assert time.monotonic() < limite, "totais diários não foram atualizados"
+        time.sleep(0.02)
+
+
+def test_consumo_e_serie_a_partir_dos_totais_diarios(tmp_path, monkeypatch):
+    db_path = tmp_path / "app.db"
+    monkeypatch.setenv("DB_PATH", str(db_path))
+    client = create_app().test_client()
+    for sku, fornecedor in (("A", "F1"), ("B", "F1"), ("C", "F2")):
+        client.post(
+            "/produtos/novo", data={"nome": sku, "sku": sku, "fornecedor": fornecedor}
+        )
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.executemany(
+            "INSERT INTO movimentacoes(produto_id, tipo, quantidade, criado_em) "
+            "VALUES(?, ?, ?, ?)",
+            [
+                (1, "entrada", 100, "2025-03-01 08:00:00"),
+                (1, "saida", 10, "2025-03-02 09:00:00"),
+                (1, "saida", 20, "2025-03-02 15:00:00"),
+                (2, "entrada", 50, "2025-03-03 10:00:00"),
+                (2, "saida", 5, "2025-03-10 10:00:00"),
+                (3, "saida", 1, "2025-02-01 10:00:00"),  # fora do período
+            ],
+        )
+        conn.execute("UPDATE produtos SET quantidade_atual=70 WHERE id=1")
+        conn.execute("UPDATE produtos SET quantidade_atual=45 WHERE id=2")
+        conn.commit()
+
+    periodo = "desde=2025-03-01&ate=2025-03-10"
+    # Inserções por fora: a consulta não escreve (nem com o lock de escrita
+    # ocupado), avisa a pendência e a atualização roda em segundo plano.
+    escritor = sqlite3.connect(db_path, timeout=0)
+    escritor.execute("BEGIN IMMEDIATE")
+    try:
+        res = client.get(f"/api/v1/analytics/consumo?{periodo}")
+        assert res.status_code == 200
+        assert res.headers["X-Diarias-Pendentes"] == "6"
+    finally:
+        escritor.rollback()
+        escritor.close()
+    res = _esperar_diarias(client, f"/api/v1/analytics/consumo?{periodo}").json
+    assert res["dias"] == 10 and res["truncado"] is False
+    a, b, c = res["itens"]
+    assert (a["sku"], a["entradas"], a["saidas"]) == ("A", 100, 30)
+    assert a["consumo_medio_diario"] == 3.0
+    assert a["dias_cobertura"] == 23.3
+    assert (b["sku"], b["saidas"], b["dias_cobertura"]) == ("B", 5, 90.0)
+    assert (c["sku"], c["saidas"], c["dias_cobertura"]) == ("C", 0, None)
+
+    limitado = client.get(f"/api/v1/analytics/consumo?{periodo}&limit=2").json
+    assert len(limitado["itens"]) == 2 and limitado["truncado"] is True
+
+    # Movimentação nova entra depois da marca d'água.
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.execute(
+            "INSERT INTO movimentacoes(produto_id, tipo, quantidade, criado_em) "
+            "VALUES(2, 'saida', 5, '2025-03-04 10:00:00')"
+        )
+        conn.commit()
+
+    por_fornecedor = _esperar_diarias(
+        client, f"/api/v1/analytics/consumo?{periodo}&por=fornecedor"
+    ).json["itens"]
+    assert [(f["fornecedor"], f["produtos"], f["saidas"]) for f in por_fornecedor] == [
+        ("F1", 2, 40),
+        ("F2", 1, 0),
+    ]
+
+    serie = client.get(
+        f"/api/v1/analytics/serie?{periodo}&intervalo=semana&fornecedor=F1"
+    ).json["itens"]
+    assert serie == [
+        {"periodo": "2025-02-24", "entradas": 100, "saidas": 30, "movimentos": 3},
+        {"periodo": "2025-03-03", "entradas": 50, "saidas": 5, "movimentos": 2},
+        {"periodo": "2025-03-10", "entradas": 0, "saidas": 5, "movimentos": 1},
+    ]
+    assert client.get("/api/v1/analytics/consumo?por=sku").status_code == 400
+    assert client.get("/api/v1/analytics/serie?desde=2025-13-01").status_code == 400
+
+
+def _diarias(db_path):
+    with closing(sqlite3.connect(db_path)) as conn:
+        marca = conn.execute(
+            "SELECT value FROM app_state WHERE key='diarias_ate_id'"
+        ).fetchone()[0]
+        totais = conn.execute(
+            "SELECT produto_id, SUM(total_entrada), SUM(total_saida), SUM(movimentos) "
+            "FROM movimentacoes_diarias GROUP BY produto_id"
+        ).fetchall()
+    return int(marca), totais
+
+
+def test_totais_diarios_mantidos_na_escrita_e_reconstruidos(tmp_path, monkeypatch):
+    db_path = tmp_path / "app.db"
+    monkeypatch.setenv("DB_PATH", str(db_path))
+    client = create_app().test_client()
+    client.post("/produtos/novo", data={"nome": "A", "sku": "A"})
+
+    def registrar(tipo, quantidade):
+        ok, _ = registrar_movimentacao(
+            str(db_path),
+            produto_id=1,
+            tipo=tipo,
+            quantidade=quantidade,
+            observacao=None,
+        )
+        assert ok
+
+    registrar("entrada", 10)
+    registrar("saida", 4)
+    # Somado na própria transação, sem passar pela atualização em lote.
+    assert _diarias(db_path) == (2, [(1, 10, 4, 2)])
+
+    # Inserção por fora: a marca para, e a próxima escrita não soma (senão a
+    # atualização em lote contaria em dobro).
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.execute(
+            "INSERT INTO movimentacoes(produto_id, tipo, quantidade, criado_em) "
+            "VALUES(1, 'entrada', 7, '2020-01-01 10:00:00')"
+        )
+        conn.commit()
+    registrar("saida", 1)
+    assert _diarias(db_path) == (2, [(1, 10, 4, 2)])
+    with closing(sqlite3.connect(db_path)) as conn:
+        atualizar_diarias(conn)
+    assert _diarias(db_path) == (4, [(1, 17, 5, 4)])
+
+    arquivar(str(db_path), antes_de=date(2021, 1, 1))
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.execute("UPDATE movimentacoes_diarias SET total_entrada = 0")
+        conn.commit()
+        reconstruir(conn, lote=1)
+    assert _diarias(db_path) == (4, [(1, 17, 5, 4)])
@@ -0,0 +1,97 @@
+from app import create_app
+
+
+def _client(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "app.db"))
+    return create_app().test_client()
+
+
+def test_api_cria_e_lista_produtos(tmp_path, monkeypatch):
+    client = _client(tmp_path, monkeypatch)
+
+    res = client.post(
+        "/api/v1/produtos",
+        json={
+            "nome": "Caneta",
+            "sku": "CAN-01",
+            "preco": "2,50",
+            "quantidade_atual": 4,
+        },
+    )
+    assert res.status_code == 201
+    assert res.json["sku"] == "CAN-01"
+    assert res.json["preco"] == 2.5
+    assert res.json["quantidade_atual"] == 4
+
+    dup = client.post("/api/v1/produtos", json={"nome": "Outra", "sku": "CAN-01"})
+    assert dup.status_code == 409
+
+    invalido = client.post("/api/v1/produtos", json={"sku": "SEM-NOME"})
+    assert invalido.status_code == 400
+    assert "obrigatórios" in invalido.json["erro"]
+
+    lista = client.get("/api/v1/produtos?fields=nome")
+    assert lista.status_code == 200
+    assert lista.json == {"itens": [{"id": 1, "nome": "Caneta"}], "proximo": None}
+
+
+def test_api_paginacao_por_cursor_e_fields_invalido(tmp_path, monkeypatch):
+    client = _client(tmp_path, monkeypatch)
+    for i in range(5):
+        client.post("/api/v1/produtos", json={"nome": f"P{i}", "sku": f"S{i}"})
+
+    p1 = client.get("/api/v1/produtos?limit=2&fields=sku").json
+    assert [p["sku"] for p in p1["itens"]] == ["S0", "S1"]
+    p2 = client.get(f"/api/v1/produtos?limit=2&fields=sku&cursor={p1['proximo']}").json
+    assert [p["sku"] for p in p2["itens"]] == ["S2", "S3"]
+    p3 = client.get(f"/api/v1/produtos?limit=2&fields=sku&cursor={p2['proximo']}").json
+    assert [p["sku"] for p in p3["itens"]] == ["S4"]
+    assert p3["proximo"] is None
+
+    assert client.get("/api/v1/produtos?fields=senha").status_code == 400
+
+
+def test_api_movimentacoes_reusa_validacao(tmp_path, monkeypatch):
+    client = _client(tmp_path, monkeypatch)
+    client.post("/api/v1/produtos", json={"nome": "Caderno", "sku": "CAD-01"})
+
+    ok = client.post(
+        "/api/v1/movimentacoes",
+        json={"produto_id": 1, "tipo": "entrada", "quantidade": 5},
+    )
+    assert ok.status_code == 201
+
+    negativo = client.post(
+        "/api/v1/movimentacoes",
+        json={"produto_id": 1, "tipo": "saida", "quantidade": 10},
+    )
+    assert negativo.status_code == 400
+    assert "estoque ficaria negativo" in negativo.json["erro"]
+
+    movs = client.get("/api/v1/movimentacoes?produto_id=1").json
+    assert len(movs["itens"]) == 1
+    assert movs["itens"][0]["tipo"] == "entrada"
+    assert client.get("/api/v1/produtos/1").json["quantidade_atual"] == 5
+    assert client.get("/api/v1/produtos/99").status_code == 404
+
+
+def test_api_rejeita_numeros_invalidos(tmp_path, monkeypatch):
+    client = _client(tmp_path, monkeypatch)
+    for campos in (
+        {"quantidade_atual": 4.5},
+        {"quantidade_atual": "4"},
+        {"estoque_minimo": True},
+        {"preco": "abc"},
+    ):
+        res = client.post("/api/v1/produtos", json={"nome": "X", "sku": "X", **campos})
+        assert res.status_code == 400, campos
+    assert client.get("/api/v1/produtos").json["itens"] == []
+
+    client.post("/api/v1/produtos", json={"nome": "X", "sku": "X", "preco": 2})
+    for quantidade in (2.9, True, "3", None):
+        res = client.post(
+            "/api/v1/movimentacoes",
+            json={"produto_id": 1, "tipo": "entrada", "quantidade": quantidade},
+        )
+        assert res.status_code == 400, quantidade
+    assert client.get("/api/v1/produtos/1").json["quantidade_atual"] == 0
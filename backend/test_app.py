@@ -222,3 +222,83 @@ def test_movimentacao_atualiza_quantidade_e_bloqueia_negativo(tmp_path, monkeypa
         ).fetchone()
         assert row3 is not None
         assert int(row3[0]) == 5
+
+
+def test_movimentacoes_concorrentes_nao_falham_por_lock(tmp_path, monkeypatch):
+    import threading
+
+    from movements_ui import registrar_movimentacao
+
+    db_path = tmp_path / "app.db"
+    monkeypatch.setenv("DB_PATH", str(db_path))
+
+    app = create_app()
+    client = app.test_client()
+    client.post(
+        "/produtos/novo",
+        data={"nome": "Caderno", "sku": "CAD-01", "quantidade_atual": "100"},
+    )
+
+    resultados: list[bool] = []
+
+    def worker() -> None:
+        for _ in range(10):
+            ok, _ = registrar_movimentacao(
+                str(db_path),
+                produto_id=1,
+                tipo="saida",
+                quantidade=1,
+                observacao=None,
+            )
+            resultados.append(ok)
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert resultados == [True] * 60
+    with closing(sqlite3.connect(db_path)) as conn:
+        row = conn.execute(
+            "SELECT quantidade_atual FROM produtos WHERE id=1"
+        ).fetchone()
+        assert int(row[0]) == 40
+
+
+def test_import_nao_toca_no_banco_e_subida_pula_ddl(tmp_path):
+    import os
+    import subprocess
+    import sys
+
+    db_path = tmp_path / "app.db"
+    backend = os.path.dirname(os.path.abspath(__file__))
+    env = {**os.environ, "DB_PATH": str(db_path)}
+
+    subprocess.run(
+        [sys.executable, "-c", "import app"], cwd=backend, env=env, check=True
+    )
+    assert not db_path.exists()
+
+    # Primeira subida cria o schema; a segunda só lê PRAGMA user_version.
+    script = (
+        "import sqlite3\n"
+        "orig = sqlite3.connect\n"
+        "def connect(*a, **k):\n"
+        "    c = orig(*a, **k)\n"
+        "    c.set_trace_callback(print)\n"
+        "    return c\n"
+        "sqlite3.connect = connect\n"
+        "from app import create_app\n"
+        "create_app()\n"
+    )
+    subprocess.run([sys.executable, "-c", script], cwd=backend, env=env, check=True)
+    out = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=backend,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    assert out.split("\n")[:-1] == ["PRAGMA user_version"]
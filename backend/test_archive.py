@@ -0,0 +1,75 @@
+import sqlite3
+from contextlib import closing
+from datetime import date
+
+from app import create_app
+from archive import arquivar, saldo_reconstruido
+
+
+def _app_com_historico(tmp_path, monkeypatch):
+    db_path = tmp_path / "app.db"
+    monkeypatch.setenv("DB_PATH", str(db_path))
+    client = create_app().test_client()
+    client.post("/produtos/novo", data={"nome": "Caneta", "sku": "CAN-01"})
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.executemany(
+            "INSERT INTO movimentacoes(produto_id, tipo, quantidade, criado_em) "
+            "VALUES(1, ?, ?, ?)",
+            [
+                ("entrada", 10, "2023-05-01 10:00:00"),
+                ("saida", 3, "2023-11-20 09:00:00"),
+                ("entrada", 5, "2024-02-10 08:00:00"),
+                ("saida", 4, "2025-06-01 12:00:00"),
+            ],
+        )
+        conn.execute("UPDATE produtos SET quantidade_atual=8 WHERE id=1")
+        conn.commit()
+    return client, db_path
+
+
+def test_arquivar_move_por_periodo_e_preserva_saldo(tmp_path, monkeypatch):
+    client, db_path = _app_com_historico(tmp_path, monkeypatch)
+
+    assert arquivar(str(db_path), antes_de=date(2025, 1, 1), lote=2) == 3
+    assert arquivar(str(db_path), antes_de=date(2025, 1, 1)) == 0
+
+    with closing(sqlite3.connect(db_path)) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM movimentacoes").fetchone() == (1,)
+        assert conn.execute(
+            "SELECT tabela, linhas FROM arquivo_periodos ORDER BY tabela"
+        ).fetchall() == [("movimentacoes_arq_2023", 2), ("movimentacoes_arq_2024", 1)]
+        assert conn.execute(
+            "SELECT saldo FROM movimentacoes_saldo_inicial WHERE produto_id=1"
+        ).fetchone() == (12,)
+        assert saldo_reconstruido(conn, 1) == 8
+
+    # Sem `desde`: só o histórico ativo. Com `desde`: une os arquivos do período.
+    recente = client.get("/csv/export/movimentacoes.csv").data.decode()
+    assert "2025-06-01" in recente and "2023-" not in recente
+    antigo = client.get("/csv/export/movimentacoes.csv?desde=2023-11-01&ate=2024-12-31")
+    texto = antigo.data.decode()
+    assert "2023-11-20" in texto and "2024-02-10" in texto
+    assert "2023-05-01" not in texto and "2025-06-01" not in texto
+
+    api = client.get("/api/v1/movimentacoes?desde=2023-01-01").json
+    assert [m["quantidade"] for m in api["itens"]] == [4, 5, 3, 10]
+    assert client.get("/api/v1/movimentacoes?desde=ontem").status_code == 400
+
+    pagina = client.get("/produtos/1/movimentacoes?desde=2024-01-01").data.decode()
+    assert "2024-02-10" in pagina and "2023-" not in pagina
+
+
+def test_consulta_so_com_ate_inclui_arquivos(tmp_path, monkeypatch):
+    client, db_path = _app_com_historico(tmp_path, monkeypatch)
+    arquivar(str(db_path), antes_de=date(2025, 1, 1))
+
+    api = client.get("/api/v1/movimentacoes?ate=2023-12-31").json
+    assert [m["quantidade"] for m in api["itens"]] == [3, 10]
+
+    texto = client.get("/csv/export/movimentacoes.csv?ate=2023-12-31").data.decode()
+    assert "2023-05-01" in texto and "2023-11-20" in texto
+    assert "2024-02-10" not in texto and "2025-06-01" not in texto
+
+    pagina = client.get("/produtos/1/movimentacoes?ate=2024-06-30").data.decode()
+    assert "2023-05-01" in pagina and "2024-02-10" in pagina
+    assert "2025-06-01" not in pagina
@@ -0,0 +1,81 @@
+import gzip
+import sqlite3
+from contextlib import closing
+
+from app import create_app
+from backup import fazer_backup
+
+
+def test_backup_online_integro_comprimido_e_com_retencao(tmp_path, monkeypatch):
+    db_path = tmp_path / "app.db"
+    monkeypatch.setenv("DB_PATH", str(db_path))
+    client = create_app().test_client()
+    for i in range(50):
+        client.post("/produtos/novo", data={"nome": f"P{i}", "sku": f"S{i}"})
+
+    destino = tmp_path / "backups"
+    passos: list[tuple[int, int]] = []
+    resumo = fazer_backup(
+        str(db_path),
+        str(destino),
+        paginas=1,
+        pausa=0,
+        progresso=lambda c, t: passos.append((c, t)),
+    )
+    assert resumo["integridade"] == "ok"
+    assert len(passos) > 1  # copiado em vários passos
+    with closing(sqlite3.connect(resumo["arquivo"])) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM produtos").fetchone() == (50,)
+
+    for _ in range(3):
+        ultimo = fazer_backup(str(db_path), str(destino), comprimir=True, manter=2)
+    restantes = sorted(p.name for p in destino.iterdir())
+    assert len(restantes) == 2
+    assert ultimo["arquivo"].endswith(".db.gz")
+    with gzip.open(ultimo["arquivo"]) as f:
+        assert f.read(16) == b"SQLite format 3\x00"
+
+
+def test_admin_backup_exige_token(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "app.db"))
+    monkeypatch.setenv("ADMIN_TOKEN", "segredo")
+    monkeypatch.setenv("BACKUP_DIR", str(tmp_path / "bk"))
+    client = create_app().test_client()
+
+    assert client.post("/admin/backup").status_code == 401
+    auth = {"Authorization": "Bearer segredo"}
+    assert client.post("/admin/backup?manter=abc", headers=auth).status_code == 400
+    res = client.post("/admin/backup", headers=auth)
+    assert res.status_code == 200
+    assert res.json["integridade"] == "ok"
+    assert (tmp_path / "bk").exists()
+
+    monkeypatch.delenv("ADMIN_TOKEN")
+    assert create_app().test_client().post("/admin/backup").status_code == 404
+
+
+def test_backup_conclui_sob_escrita_continua(tmp_path, monkeypatch):
+    db_path = tmp_path / "app.db"
+    monkeypatch.setenv("DB_PATH", str(db_path))
+    client = create_app().test_client()
+    for i in range(50):
+        client.post("/produtos/novo", data={"nome": f"P{i}", "sku": f"S{i}"})
+
+    escritor = sqlite3.connect(db_path)
+
+    def escreve_a_cada_passo(copiadas: int, total: int) -> None:
+        escritor.execute("UPDATE app_state SET value=value+1 WHERE key='visitas'")
+        escritor.commit()
+
+    try:
+        resumo = fazer_backup(
+            str(db_path),
+            str(tmp_path / "bk"),
+            paginas=1,
+            pausa=0,
+            progresso=escreve_a_cada_passo,
+        )
+    finally:
+        escritor.close()
+    assert resumo["reinicios"] > 0
+    assert resumo["integridade"] == "ok"
@@ -0,0 +1,100 @@
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+
+from app import create_app
+from changes import compactar, compactar_excluidos
+
+
+def test_feed_de_mudancas_por_cursor(tmp_path, monkeypatch):
+    db_path = tmp_path / "app.db"
+    monkeypatch.setenv("DB_PATH", str(db_path))
+    client = create_app().test_client()
+    client.post("/produtos/novo", data={"nome": "A", "sku": "A"})
+    client.post("/produtos/novo", data={"nome": "B", "sku": "B"})
+
+    res = client.get("/api/v1/changes").json
+    assert [(i["tabela"], i["id"], i["operacao"]) for i in res["itens"]] == [
+        ("produtos", 1, "insert"),
+        ("produtos", 2, "insert"),
+    ]
+    assert res["itens"][0]["dados"]["sku"] == "A"
+    cursor = res["cursor"]
+
+    client.post(
+        "/movimentacoes/nova",
+        data={"produto_id": 1, "tipo": "entrada", "quantidade": 3},
+    )
+    client.post("/produtos/2/excluir")
+    # Reimportar o mesmo produto (só atualizado_em muda) não gera mudança.
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.execute("UPDATE produtos SET atualizado_em='2030-01-01' WHERE id=1")
+        conn.commit()
+
+    res = client.get(f"/api/v1/changes?since={cursor}&limit=2").json
+    assert res["mais"] is True
+    # movimentação + update do saldo do produto 1
+    assert [(i["tabela"], i["operacao"]) for i in res["itens"]] == [
+        ("movimentacoes", "insert"),
+        ("produtos", "update"),
+    ]
+    assert res["itens"][1]["dados"]["quantidade_atual"] == 3
+
+    res = client.get(f"/api/v1/changes?since={res['cursor']}").json
+    assert res["mais"] is False
+    assert res["itens"] == [
+        {
+            "seq": res["cursor"],
+            "tabela": "produtos",
+            "id": 2,
+            "operacao": "delete",
+            "dados": None,
+        }
+    ]
+    assert client.get("/api/v1/changes?since=-1").status_code == 400
+
+
+def test_compactacao_invalida_cursores_antigos(tmp_path, monkeypatch):
+    db_path = tmp_path / "app.db"
+    monkeypatch.setenv("DB_PATH", str(db_path))
+    client = create_app().test_client()
+    for sku in ("A", "B", "C"):
+        client.post("/produtos/novo", data={"nome": sku, "sku": sku})
+
+    apagadas = compactar(
+        str(db_path), antes_de=datetime.now(timezone.utc) + timedelta(minutes=1), lote=2
+    )
+    assert apagadas == 3
+
+    res = client.get("/api/v1/changes?since=1")
+    assert res.status_code == 410
+    assert (res.json["compactado_ate"], res.json["seq_atual"]) == (3, 3)
+
+    client.post("/produtos/novo", data={"nome": "D", "sku": "D"})
+    res = client.get("/api/v1/changes?since=3").json
+    assert [i["id"] for i in res["itens"]] == [4]
+
+
+def test_compactacao_das_exclusoes_recusa_exportacao_por_data_antiga(
+    tmp_path, monkeypatch
+):
+    db_path = tmp_path / "app.db"
+    monkeypatch.setenv("DB_PATH", str(db_path))
+    client = create_app().test_client()
+    for sku in ("A", "B", "C"):
+        client.post("/produtos/novo", data={"nome": sku, "sku": sku})
+    for produto_id in (1, 2, 3):
+        client.post(f"/produtos/{produto_id}/excluir")
+
+    corte = datetime.now(timezone.utc) + timedelta(minutes=1)
+    assert compactar_excluidos(str(db_path), antes_de=corte, lote=2) == 3
+    with closing(sqlite3.connect(db_path)) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM produtos_excluidos").fetchone() == (
+            0,
+        )
+
+    res = client.get("/csv/export/produtos.csv?atualizado_desde=2000-01-01")
+    assert res.status_code == 410
+    depois = (corte + timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%S")
+    res = client.get(f"/csv/export/produtos.csv?atualizado_desde={depois}")
+    assert res.status_code == 200
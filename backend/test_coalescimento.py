@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+import db
+import metrics
+from app import create_app
+from coalescimento import parse_rotas
+from singleflight import CACHE, EM_VOO, EXECUTADA, SingleFlight
+
+
+def test_singleflight_executa_uma_vez_para_chamadas_concorrentes():
+    voo = SingleFlight()
+    execucoes = []
+
+    def consulta():
+        execucoes.append(1)
+        time.sleep(0.2)
+        return ["linha"]
+
+    resultados = []
+    threads = [
+        threading.Thread(target=lambda: resultados.append(voo.fazer("k", consulta)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(execucoes) == 1
+    assert sorted(origem for _, origem in resultados) == [EM_VOO] * 7 + [EXECUTADA]
+    assert all(r is resultados[0][0] for r, _ in resultados)
+    # Sem ttl, depois de terminar executa de novo.
+    assert voo.fazer("k", consulta)[1] == EXECUTADA
+
+
+def test_singleflight_ttl_excecao_e_limpar():
+    voo = SingleFlight()
+    assert voo.fazer("k", lambda: 1, ttl=30)[1] == EXECUTADA
+    assert voo.fazer("k", lambda: 2, ttl=30) == (1, CACHE)
+    voo.limpar()
+    assert voo.fazer("k", lambda: 3, ttl=30) == (3, EXECUTADA)
+
+    def falha():
+        raise ValueError("x")
+
+    with pytest.raises(ValueError):
+        voo.fazer("erro", falha, ttl=30)
+    assert voo.fazer("erro", lambda: "ok", ttl=30) == ("ok", EXECUTADA)
+
+
+def test_parse_rotas():
+    assert parse_rotas("produtos_list, api_produtos_list=0.5,") == {
+        "produtos_list": 0.0,
+        "api_produtos_list": 0.5,
+    }
+    assert parse_rotas("") == {}
+    with pytest.raises(ValueError):
+        parse_rotas("produtos_list=rapido")
+
+
+def test_rota_configurada_compartilha_e_escrita_descarta(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "app.db"))
+    monkeypatch.setenv("METRICS_ENABLED", "1")
+    monkeypatch.setenv("COALESCER_ROTAS", "produtos_list=30")
+    monkeypatch.setattr(metrics, "enabled", False)
+    antes = metrics.SQL_COALESCED.value("produtos_list", CACHE)
+
+    client = create_app().test_client()
+    client.post("/produtos/novo", data={"nome": "Caderno", "sku": "CAD-01"})
+    assert b"CAD-01" in client.get("/produtos").data
+    assert b"CAD-01" in client.get("/produtos").data
+    assert metrics.SQL_COALESCED.value("produtos_list", CACHE) == antes + 1
+
+    # Escrita deste processo: a próxima listagem já vê o produto novo.
+    client.post("/produtos/novo", data={"nome": "Lápis", "sku": "LAP-01"})
+    assert b"LAP-01" in client.get("/produtos").data
+    assert metrics.SQL_COALESCED.value("produtos_list", CACHE) == antes + 1
+
+    # Rota fora da configuração não compartilha.
+    client.get("/produtos/1")
+    client.get("/produtos/1")
+    assert 'route="produtos_detail"' not in client.get("/metrics").data.decode()
+
+
+def test_leitura_entre_begin_e_commit_nao_fica_guardada(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "app.db")
+    monkeypatch.setenv("DB_PATH", db_path)
+    create_app()
+    token = db.coalescimento_atual.set(("produtos_list", 30.0))
+    try:
+        conn = db.connect(db_path)
+        db.begin_immediate(conn)
+        conn.execute("INSERT INTO produtos(nome, sku) VALUES ('Caderno', 'CAD')")
+        # Leitura antes do commit: vê (e guarda) o estado anterior.
+        assert db.query_one(db_path, "SELECT COUNT(*) FROM produtos")[0] == 0
+        conn.commit()
+        conn.close()
+        assert db.query_one(db_path, "SELECT COUNT(*) FROM produtos")[0] == 1
+    finally:
+        db.coalescimento_atual.reset(token)
@@ -1,4 +1,10 @@
+import csv
 import io
+import os
+import sqlite3
+from contextlib import closing
+
+import pytest
 
 from app import create_app
 
@@ -79,3 +85,464 @@ def test_csv_import_reporta_erros_sem_quebrar(tmp_path, monkeypatch):
     # deve processar a linha válida mesmo com erro na anterior
     assert b"Criados" in res.data
     assert b"Atualizados" in res.data
+
+
+def test_csv_export_incremental_com_exclusoes(tmp_path, monkeypatch):
+    db_path = tmp_path / "app.db"
+    monkeypatch.setenv("DB_PATH", str(db_path))
+    client = create_app().test_client()
+    for sku in ("A", "B", "C"):
+        client.post("/produtos/novo", data={"nome": sku, "sku": sku})
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.execute("UPDATE produtos SET atualizado_em='2025-01-01 00:00:00'")
+        conn.execute(
+            "UPDATE produtos SET atualizado_em='2025-03-01 12:00:00' WHERE sku='B'"
+        )
+        conn.commit()
+    client.post("/produtos/3/excluir")
+
+    res = client.get("/csv/export/produtos.csv?atualizado_desde=2025-02-01")
+    assert res.status_code == 200
+    assert res.headers["X-Exportado-Em"]
+    linhas = list(csv.DictReader(io.StringIO(res.data.decode("utf-8"))))
+    assert [(r["sku"], r["excluido"]) for r in linhas] == [("C", "1"), ("B", "0")]
+    assert linhas[1]["atualizado_em"] == "2025-03-01 12:00:00"
+
+    # Fuso convertido para UTC: 09:00-03:00 == 12:00Z, inclusivo.
+    res = client.get(
+        "/csv/export/produtos.csv?atualizado_desde=2025-03-01T09:00:00-03:00"
+    )
+    assert "B" in [r["sku"] for r in csv.DictReader(io.StringIO(res.data.decode()))]
+    assert (
+        client.get("/csv/export/produtos.csv?atualizado_desde=ontem").status_code == 400
+    )
+
+
+def test_csv_export_incremental_nao_perde_escrita_carimbada_antes(
+    tmp_path, monkeypatch
+):
+    db_path = tmp_path / "app.db"
+    monkeypatch.setenv("DB_PATH", str(db_path))
+    client = create_app().test_client()
+
+    marca = client.get("/csv/export/produtos.csv?atualizado_desde=2000-01-01").headers[
+        "X-Exportado-Em"
+    ]
+    # Escrita que carimbou `atualizado_em` antes da exportação e só foi
+    # confirmada depois dela.
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.execute(
+            "INSERT INTO produtos(nome, sku, atualizado_em) "
+            "VALUES ('Atrasado', 'ATR', datetime('now', '-5 seconds'))"
+        )
+        conn.commit()
+
+    res = client.get(f"/csv/export/produtos.csv?atualizado_desde={marca}")
+    assert "ATR" in [r["sku"] for r in csv.DictReader(io.StringIO(res.data.decode()))]
+
+
+def test_esquema_importacao_por_posicao():
+    from csv_schema import ERRO_NUMERICO, EsquemaImportacao
+
+    header = "estoque_minimo,sku,nome,preco,custo,categoria,fornecedor,quantidade_atual,extra"
+    esquema = EsquemaImportacao(header.split(","))
+    assert esquema.faltando == []
+    linhas = [
+        ["1", " A ", "Produto", "2,50", "1.5", "", "F", "3", "x"],
+        [],  # linha em branco: pulada sem contar
+        ["", "B", "Curta"],
+        ["", "", "Sem SKU"],
+        ["x", "C", "Ruim"],
+    ]
+    assert list(esquema.linhas(linhas)) == [
+        (2, ("Produto", "A", None, "F", 1.5, 2.5, 3, 1)),
+        (3, ("Curta", "B", None, None, 0.0, 0.0, 0, 0)),
+        (4, "SKU é obrigatório"),
+        (5, ERRO_NUMERICO),
+    ]
+    assert EsquemaImportacao(["sku", "nome"]).faltando[0] == "categoria"
+
+
+def test_csv_import_paralelo_preserva_numeracao(tmp_path, monkeypatch):
+    import csv_paralelo
+
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "app.db"))
+    monkeypatch.setattr(csv_paralelo, "TAMANHO_BLOCO", 40)
+    usado = []
+    original = csv_paralelo.converter_em_paralelo
+    monkeypatch.setattr(
+        csv_paralelo,
+        "converter_em_paralelo",
+        lambda *a, **k: usado.append(1) or original(*a, **k),
+    )
+    client = create_app().test_client()
+
+    linhas = [
+        "sku,nome,categoria,fornecedor,custo,preco,quantidade_atual,estoque_minimo"
+    ]
+    for i in range(30):
+        linhas.append(f"S{i},Produto {i},,,1,2,{i},0")
+    linhas[5] = 'S4,"Nome com\nquebra",,,1,2,x,0'  # registro 6: quantidade inválida
+    linhas[20] = ",Sem SKU,,,1,2,3,0"  # registro 21
+    csv_bytes = ("\n".join(linhas) + "\n").encode("utf-8")
+
+    res = client.post(
+        "/csv/import/produtos",
+        data={"arquivo": (io.BytesIO(csv_bytes), "p.csv"), "paralelo": "1"},
+        content_type="multipart/form-data",
+    )
+    html = res.data.decode("utf-8")
+    assert "Criados: <strong>28</strong>" in html
+    assert "Campos numéricos inválidos (custo/preco/quantidades): 1 — linhas 6<" in html
+    assert "SKU é obrigatório: 1 — linhas 21<" in html
+    assert usado
+
+
+def test_divisao_em_blocos_respeita_aspas():
+    from csv_paralelo import dividir
+
+    texto = 'sku,nome\n"a\nb",x\n1,2\n"q""\n",3\n\n4,5'
+    esperado = list(csv.reader(io.StringIO(texto)))[1:]
+    for tamanho in range(1, len(texto)):
+        header, blocos = dividir(io.StringIO(texto), tamanho)
+        assert header == "sku,nome\n"
+        obtido = [r for b in blocos for r in csv.reader(io.StringIO(b))]
+        assert obtido == esperado
+
+
+def _importar(client, conteudo, nome):
+    res = client.post(
+        "/csv/import/produtos",
+        data={"arquivo": (io.BytesIO(conteudo), nome)},
+        content_type="multipart/form-data",
+    )
+    assert res.status_code == 200
+    return res.data.decode("utf-8")
+
+
+def test_csv_import_compactado_e_latin1(tmp_path, monkeypatch):
+    import gzip
+    import zipfile
+
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "app.db"))
+    client = create_app().test_client()
+    header = (
+        "sku,nome,categoria,fornecedor,custo,preco,quantidade_atual,estoque_minimo\n"
+    )
+
+    html = _importar(
+        client, gzip.compress((header + "G1,Gzip,,,1,2,3,0\n").encode()), "p.csv.gz"
+    )
+    assert "Criados: <strong>1</strong>" in html
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("leia-me.txt", "ignorado")
+        zf.writestr("produtos.csv", header + "Z1,Zip,,,1,2,3,0\n")
+    assert "Criados: <strong>1</strong>" in _importar(client, buf.getvalue(), "p.zip")
+
+    # Latin-1 sem BOM continua aceito, agora sem reler o arquivo.
+    _importar(client, (header + "L1,Açúcar,,,1,2,3,0\n").encode("latin-1"), "p.csv")
+    assert "Açúcar" in client.get("/csv/export/produtos.csv").data.decode("utf-8")
+
+    truncado = gzip.compress((header + "T1,Trunc,,,1,2,3,0\n" * 50).encode())[:-30]
+    assert "end-of-stream" in _importar(client, truncado, "p.csv.gz")
+    assert "Arquivo inválido" in _importar(client, b"PK\x03\x04lixo", "p.zip")
+
+
+def test_csv_import_simulacao_e_linhas_inalteradas(tmp_path, monkeypatch):
+    db_path = tmp_path / "app.db"
+    monkeypatch.setenv("DB_PATH", str(db_path))
+    client = create_app().test_client()
+    header = (
+        "sku,nome,categoria,fornecedor,custo,preco,quantidade_atual,estoque_minimo\n"
+    )
+    _importar(client, (header + "A,Alfa,,,1,2,3,0\nB,Beta,,,1,2,3,0\n").encode(), "p")
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.execute("UPDATE produtos SET atualizado_em='2020-01-01 00:00:00'")
+        conn.commit()
+
+    feed = header + 'A,Alfa,,,1,2,3,0\nB,Beta,,,1,"2,5",3,0\nC,Gama,,,1,2,3,0\n'
+    res = client.post(
+        "/csv/import/produtos",
+        data={"arquivo": (io.BytesIO(feed.encode()), "p.csv"), "simular": "1"},
+        content_type="multipart/form-data",
+    )
+    html = res.data.decode("utf-8")
+    assert "Simulação (nada foi gravado)" in html
+    assert "Novos: <strong>1</strong> | Alterados: <strong>1</strong>" in html
+    assert "Inalterados: <strong>1</strong>" in html
+    assert "preco: 2.0 → 2.5" in html
+    with closing(sqlite3.connect(db_path)) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM produtos").fetchone()[0] == 2
+
+    html = _importar(client, feed.encode(), "p.csv")
+    assert "Criados: <strong>1</strong> | Atualizados: <strong>1</strong>" in html
+    with closing(sqlite3.connect(db_path)) as conn:
+        # A linha igual não foi regravada.
+        assert dict(conn.execute("SELECT sku, atualizado_em FROM produtos"))["A"] == (
+            "2020-01-01 00:00:00"
+        )
+
+
+def test_csv_import_detecta_mudanca_com_hash_igual(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "app.db"))
+    client = create_app().test_client()
+    header = (
+        "sku,nome,categoria,fornecedor,custo,preco,quantidade_atual,estoque_minimo\n"
+    )
+    # hash(-1) == hash(-2): as tuplas das duas versões têm o mesmo hash().
+    _importar(client, (header + "A,Alfa,,,1,2,3,-1\n").encode(), "p.csv")
+    html = _importar(client, (header + "A,Alfa,,,1,2,3,-2\n").encode(), "p.csv")
+    assert "Atualizados: <strong>1</strong>" in html
+    assert "Inalterados: <strong>0</strong>" in html
+
+
+def test_csv_import_erros_agrupados_e_download(tmp_path, monkeypatch):
+    import re
+
+    import csv_erros
+
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "app.db"))
+    monkeypatch.setenv("IMPORT_ERROS_DIR", str(tmp_path / "erros"))
+    client = create_app().test_client()
+    header = (
+        "sku,nome,categoria,fornecedor,custo,preco,quantidade_atual,estoque_minimo\n"
+    )
+    linhas = [f"E{i},Produto,,,1,2,x,0\n" for i in range(500)]
+    linhas += [",Sem SKU,,,1,2,3,0\n", "OK,Válido,,,1,2,3,0\n"]
+    html = _importar(client, (header + "".join(linhas)).encode(), "p.csv")
+
+    assert "Criados: <strong>1</strong>" in html
+    assert "Erros: <strong>501</strong>" in html
+    # A página mostra só as primeiras linhas de cada mensagem.
+    assert "quantidades): 500 — linhas 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, …" in html
+    assert "SKU é obrigatório: 1 — linhas 502<" in html
+    assert html.count("<li>") < 10
+
+    token = re.search(r"/csv/import/erros/([0-9a-f]{32})\.csv", html).group(1)
+    res = client.get(f"/csv/import/erros/{token}.csv")
+    assert res.status_code == 200
+    assert "attachment" in res.headers["Content-Disposition"]
+    corpo = list(csv.reader(io.StringIO(res.data.decode("utf-8"))))
+    res.close()
+    assert corpo[0] == ["linha", "erro"]
+    assert len(corpo) == 502
+    assert corpo[-1] == ["502", "SKU é obrigatório"]
+
+    assert client.get("/csv/import/erros/../app.csv").status_code == 404
+    assert client.get("/csv/import/erros/" + "0" * 32 + ".csv").status_code == 404
+
+    # Relatórios antigos são apagados na próxima importação com erros.
+    antigo = csv_erros.caminho(str(tmp_path / "erros"), token)
+    os.utime(antigo, (0, 0))
+    _importar(client, (header + ",x,,,1,2,3,0\n").encode(), "p.csv")
+    assert not os.path.exists(antigo)
+
+    sem_erros = _importar(client, (header + "N1,Novo,,,1,2,3,0\n").encode(), "p.csv")
+    assert "Baixar todos os erros" not in sem_erros
+
+
+def test_csv_export_ndjson_e_colunar(tmp_path, monkeypatch):
+    import json
+
+    from export_formatos import ler_colunar
+
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "app.db"))
+    client = create_app().test_client()
+    header = (
+        "sku,nome,categoria,fornecedor,custo,preco,quantidade_atual,estoque_minimo\n"
+    )
+    corpo = "".join(
+        f"S{i:04d},Produto {i} ação,,F{i % 3},1.5,{i},{i},2\n" for i in range(9000)
+    )
+    _importar(client, (header + corpo).encode(), "p.csv")
+    client.post(
+        "/movimentacoes/nova",
+        data={"produto_id": "1", "tipo": "entrada", "quantidade": "4"},
+    )
+
+    csv_res = client.get("/csv/export/produtos.csv")
+    esperado = list(csv.reader(io.StringIO(csv_res.data.decode("utf-8"))))
+
+    res = client.get("/csv/export/produtos?format=ndjson")
+    assert res.mimetype == "application/x-ndjson"
+    assert "produtos.ndjson" in res.headers["Content-Disposition"]
+    objetos = [json.loads(linha) for linha in res.data.decode("utf-8").splitlines()]
+    assert len(objetos) == 9000
+    assert objetos[0] == {
+        "sku": "S0000",
+        "nome": "Produto 0 ação",
+        "categoria": None,
+        "fornecedor": "F0",
+        "custo": 1.5,
+        "preco": 0.0,
+        "quantidade_atual": 4,
+        "estoque_minimo": 2,
+    }
+
+    res = client.get("/csv/export/produtos?format=colunar")
+    assert "produtos.ecol" in res.headers["Content-Disposition"]
+    blocos = list(ler_colunar(io.BytesIO(res.data)))
+    assert len(blocos) == 2  # 8192 + 808 linhas
+    nomes = blocos[0][0]
+    assert nomes == esperado[0]
+    linhas = [
+        list(linha) for _, colunas in blocos for linha in zip(*colunas, strict=True)
+    ]
+    assert [dict(zip(nomes, linha)) for linha in linhas] == objetos
+    assert len(res.data) < len(csv_res.data) / 2
+
+    res = client.get("/csv/export/movimentacoes.csv?format=ndjson")
+    (mov,) = [json.loads(linha) for linha in res.data.decode().splitlines()]
+    assert (mov["produto_sku"], mov["tipo"], mov["quantidade"]) == (
+        "S0000",
+        "entrada",
+        4,
+    )
+
+    # Delta: a exclusão vem com as colunas do produto nulas.
+    client.post("/produtos/2/excluir")
+    res = client.get(
+        "/csv/export/produtos.csv?atualizado_desde=2000-01-01&format=colunar"
+    )
+    nomes, colunas = next(ler_colunar(io.BytesIO(res.data)))
+    primeira = dict(zip(nomes, [c[0] for c in colunas]))
+    assert primeira["sku"] == "S0001" and primeira["excluido"] == 1
+    assert primeira["nome"] is None and primeira["custo"] is None
+
+    assert client.get("/csv/export/produtos?format=xml").status_code == 400
+
+
+def test_colunar_ida_e_volta_com_nulos_e_separador():
+    from export_formatos import FORMATOS, ler_colunar
+
+    colunas = [("t", "texto"), ("i", "inteiro"), ("d", "decimal")]
+    linhas = [("a\x00b", 1, 1.5), (None, None, None), ("", -7, 0.0), ("ç", 2**40, 2)]
+    data = b"".join(FORMATOS["colunar"].gerar(colunas, linhas))
+    ((nomes, valores),) = list(ler_colunar(io.BytesIO(data)))
+    assert nomes == ["t", "i", "d"]
+    assert list(zip(*valores)) == linhas
+    sem_separador = [(t or "x", i, d) for t, i, d in linhas[1:]]
+    data = b"".join(FORMATOS["colunar"].gerar(colunas, sem_separador))
+    assert list(zip(*next(ler_colunar(io.BytesIO(data)))[1])) == sem_separador
+    with pytest.raises(ValueError):
+        list(ler_colunar(io.BytesIO(data[:-10])))
+
+
+def test_csv_export_materializado_por_versao(tmp_path, monkeypatch):
+    import time
+
+    import export_arquivos
+
+    monkeypatch.setattr(export_arquivos, "INTERVALO_S", 0.02)
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "app.db"))
+    monkeypatch.setenv("EXPORT_DIR", str(tmp_path / "exports"))
+    client = create_app().test_client()
+    client.post("/produtos/novo", data={"nome": "Alfa", "sku": "A"})
+
+    res = client.get("/csv/export/produtos.csv")
+    assert res.status_code == 200
+    assert res.headers["Accept-Ranges"] == "bytes"
+    versao = res.headers["X-Versao-Dados"]
+    corpo = res.data
+    assert corpo.startswith(b"sku,nome,")
+    assert os.listdir(tmp_path / "exports") == [f"produtos-v{versao}.csv"]
+
+    # Download retomado e revalidação sem regerar.
+    parcial = client.get("/csv/export/produtos.csv", headers={"Range": "bytes=5-"})
+    assert parcial.status_code == 206
+    assert parcial.data == corpo[5:]
+    etag = res.headers["ETag"]
+    assert (
+        client.get(
+            "/csv/export/produtos.csv", headers={"If-None-Match": etag}
+        ).status_code
+        == 304
+    )
+
+    # Mudança nos dados: a thread regenera sem esperar um pedido.
+    client.post("/produtos/novo", data={"nome": "Beta", "sku": "B"})
+    novo = f"produtos-v{int(versao) + 1}.csv"
+    limite = time.monotonic() + 5
+    while novo not in os.listdir(tmp_path / "exports"):
+        assert time.monotonic() < limite, "exportação não foi regenerada"
+        time.sleep(0.02)
+    res = client.get("/csv/export/produtos.csv")
+    assert res.headers["X-Versao-Dados"] == str(int(versao) + 1)
+    assert res.headers["ETag"] != etag
+    assert b"Beta" in res.data
+
+    # Só as duas versões mais recentes ficam no disco.
+    client.post("/produtos/novo", data={"nome": "Gama", "sku": "C"})
+    assert b"Gama" in client.get("/csv/export/produtos.csv").data
+    assert sorted(os.listdir(tmp_path / "exports")) == [
+        f"produtos-v{int(versao) + 1}.csv",
+        f"produtos-v{int(versao) + 2}.csv",
+    ]
+
+
+def test_exportacao_para_a_thread_com_o_app(tmp_path, monkeypatch):
+    import gc
+
+    import export_arquivos
+
+    monkeypatch.setattr(export_arquivos, "INTERVALO_S", 0.02)
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "app.db"))
+    monkeypatch.setenv("EXPORT_DIR", str(tmp_path / "exports"))
+    app = create_app()
+    app.test_client().get("/csv/export/produtos.csv")
+    thread = app.extensions["exportacao_produtos"]._thread
+    assert thread.is_alive()
+
+    del app
+    gc.collect()
+    thread.join(2)
+    assert not thread.is_alive()
+
+
+def test_exportacao_materializada_gera_uma_vez_sob_concorrencia(tmp_path, monkeypatch):
+    import threading
+    import time
+
+    import export_formatos
+    from csv_ui import PRODUTOS_COLUNAS
+    from export_arquivos import ExportacaoMaterializada
+    from migrations import migrar
+
+    db_path = str(tmp_path / "app.db")
+    migrar(db_path)
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.execute("INSERT INTO produtos(nome, sku) VALUES ('A', 'A')")
+        conn.commit()
+    exportacao = ExportacaoMaterializada(
+        db_path=db_path,
+        diretorio=str(tmp_path / "exports"),
+        nome="produtos",
+        colunas=PRODUTOS_COLUNAS,
+        sql="SELECT sku, nome, categoria, fornecedor, custo, preco, "
+        "quantidade_atual, estoque_minimo FROM produtos",
+        segundo_plano=False,
+    )
+    csv_formato = export_formatos.FORMATOS["csv"]
+
+    def gerar_devagar(colunas, linhas):
+        time.sleep(0.2)
+        return csv_formato.gerar(colunas, linhas)
+
+    monkeypatch.setitem(
+        export_formatos.FORMATOS,
+        "csv",
+        export_formatos.Formato("csv", csv_formato.mimetype, gerar_devagar),
+    )
+    resultados = []
+    threads = [
+        threading.Thread(target=lambda: resultados.append(exportacao.arquivo("csv")))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert exportacao.geracoes == 1
+    assert len(resultados) == 8 and len(set(resultados)) == 1
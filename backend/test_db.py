@@ -0,0 +1,56 @@
+import sqlite3
+import time
+from contextlib import closing
+
+import pytest
+
+import db
+from app import create_app
+
+
+def test_leituras_usam_pool_somente_leitura_em_wal(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "app.db")
+    monkeypatch.setenv("DB_PATH", db_path)
+    client = create_app().test_client()
+    client.post("/produtos/novo", data={"nome": "Caderno", "sku": "CAD-01"})
+
+    with closing(sqlite3.connect(db_path)) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    # Leitura que tenta escrever falha, sem pegar o lock de escrita.
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        db.query_one(db_path, "INSERT INTO produtos(nome, sku) VALUES ('x', 'x')")
+
+    # Com uma transação de escrita aberta, as páginas de leitura não esperam.
+    escritor = sqlite3.connect(db_path, timeout=0)
+    try:
+        db.begin_immediate(escritor)
+        escritor.execute("INSERT INTO produtos(nome, sku) VALUES ('Lápis', 'LAP')")
+        inicio = time.perf_counter()
+        res = client.get("/produtos")
+        assert res.status_code == 200
+        assert time.perf_counter() - inicio < 1
+        assert b"CAD-01" in res.data and b"LAP" not in res.data
+        assert client.get("/movimentacoes").status_code == 200
+        assert client.get("/csv/export/movimentacoes.csv").status_code == 200
+    finally:
+        escritor.rollback()
+        escritor.close()
+
+
+def test_pool_reaproveita_e_limita_conexoes(tmp_path):
+    db_path = str(tmp_path / "app.db")
+    sqlite3.connect(db_path).close()
+    pool = db.PoolLeitura(db_path, 1, espera=0.05)
+
+    with pool.conexao() as primeira:
+        with pytest.raises(sqlite3.OperationalError, match="esgotado"):
+            with pool.conexao():
+                pass
+    with pool.conexao() as segunda:
+        assert segunda is primeira
+        assert segunda.execute("PRAGMA query_only").fetchone()[0] == 1
+
+    pool.fechar()
+    with pytest.raises(sqlite3.ProgrammingError):
+        primeira.execute("SELECT 1")
@@ -0,0 +1,74 @@
+from app import create_app
+from events import Assinatura, Barramento, barramento
+
+
+def test_eventos_filtrados_por_produto(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "app.db"))
+    client = create_app().test_client()
+    client.post("/produtos/novo", data={"nome": "A", "sku": "A"})
+    client.post("/produtos/novo", data={"nome": "B", "sku": "B"})
+
+    res = client.get("/eventos?produto_id=2", buffered=False)
+    assert res.mimetype == "text/event-stream"
+    stream = iter(res.response)
+    assert next(stream).startswith(b"retry:")
+
+    for produto_id in (1, 2):
+        client.post(
+            "/movimentacoes/nova",
+            data={"produto_id": produto_id, "tipo": "entrada", "quantidade": 5},
+        )
+    evento = next(stream).decode()
+    assert "event: movimentacao" in evento
+    assert '"produto_id": 2' in evento and '"quantidade_atual": 5' in evento
+
+    res.close()
+    assert not barramento.assinaturas
+
+    # Cliente que cai antes do primeiro bloco também sai do barramento.
+    client.get("/eventos", buffered=False).close()
+    assert not barramento.assinaturas
+
+
+def test_reconexao_com_last_event_id(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "app.db"))
+    client = create_app().test_client()
+    client.post("/produtos/novo", data={"nome": "A", "sku": "A"})
+    ultimo = barramento.historico[-1][0]
+    client.post(
+        "/movimentacoes/nova",
+        data={"produto_id": 1, "tipo": "entrada", "quantidade": 2},
+    )
+
+    res = client.get("/eventos", headers={"Last-Event-ID": str(ultimo)}, buffered=False)
+    stream = iter(res.response)
+    next(stream)
+    evento = next(stream).decode()
+    assert f"id: {ultimo + 1}" in evento and "event: movimentacao" in evento
+    res.close()
+
+
+def test_cliente_lento_recebe_perdidos():
+    bus = Barramento()
+    assinatura = bus.assinar(Assinatura(tamanho=2))
+    for i in range(5):
+        bus.publicar("produto", produto_id=i)
+
+    eventos, perdidos = assinatura.proximos(0)
+    assert [dados["produto_id"] for _, _, dados in eventos] == [3, 4]
+    assert perdidos == 3
+
+
+def test_last_event_id_fora_do_historico_recebe_perdidos():
+    bus = Barramento(historico=2)
+    for i in range(5):
+        bus.publicar("produto", produto_id=i)
+
+    eventos, perdidos = bus.assinar(Assinatura(), desde=3).proximos(0)
+    assert [evento_id for evento_id, _, _ in eventos] == [4, 5] and perdidos == 0
+
+    eventos, perdidos = bus.assinar(Assinatura(), desde=1).proximos(0)
+    assert [evento_id for evento_id, _, _ in eventos] == [4, 5] and perdidos == 2
+
+    # Id maior que o último publicado: o processo reiniciou.
+    assert bus.assinar(Assinatura(), desde=99).proximos(0) == ([], 1)
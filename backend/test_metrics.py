@@ -0,0 +1,48 @@
+import io
+
+import metrics
+from app import create_app
+
+
+def test_metrics_desligado_por_padrao(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "app.db"))
+    monkeypatch.delenv("METRICS_ENABLED", raising=False)
+
+    client = create_app().test_client()
+    assert client.get("/metrics").status_code == 404
+    assert metrics.enabled is False
+
+
+def test_metrics_expoe_rotas_sql_csv_e_movimentacoes(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "app.db"))
+    monkeypatch.setenv("METRICS_ENABLED", "1")
+    # create_app liga o flag global; o monkeypatch o restaura ao final.
+    monkeypatch.setattr(metrics, "enabled", False)
+
+    client = create_app().test_client()
+    client.post("/produtos/novo", data={"nome": "Caderno", "sku": "CAD-01"})
+    client.get("/produtos/1")
+    client.post(
+        "/movimentacoes/nova",
+        data={"produto_id": "1", "tipo": "entrada", "quantidade": "2"},
+    )
+    csv_text = "sku,nome,categoria,fornecedor,custo,preco,quantidade_atual,estoque_minimo\nS2,B,,,1,1,1,1\n"
+    client.post(
+        "/csv/import/produtos",
+        data={"arquivo": (io.BytesIO(csv_text.encode()), "p.csv")},
+        content_type="multipart/form-data",
+    )
+
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    text = res.data.decode()
+
+    assert (
+        'estoque_http_requests_total{method="GET",route="/produtos/<int:produto_id>",status="200"}'
+        in text
+    )
+    assert 'estoque_http_request_duration_seconds_bucket{method="GET"' in text
+    assert "estoque_sql_query_duration_seconds_count{query=" in text
+    assert "estoque_db_connections_opened_total" in text
+    assert 'estoque_csv_rows_total{operation="import",entity="produtos"}' in text
+    assert "estoque_movement_commit_duration_seconds_count" in text
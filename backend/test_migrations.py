@@ -0,0 +1,134 @@
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from migrations import MIGRACOES, Backfill, Migracao, migrar
+
+
+def _banco_com_produtos(tmp_path, n):
+    db_path = str(tmp_path / "app.db")
+    migrar(db_path)
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.executemany(
+            "INSERT INTO produtos(nome, sku, preco, quantidade_atual) VALUES(?, ?, ?, ?)",
+            [(f"P{i}", f"S{i}", 2.0, i) for i in range(n)],
+        )
+        conn.commit()
+    return db_path
+
+
+def test_migrar_e_idempotente(tmp_path):
+    db_path = str(tmp_path / "app.db")
+    versoes = [m.versao for m in MIGRACOES]
+    assert migrar(db_path) == versoes
+    assert migrar(db_path) == []
+    with closing(sqlite3.connect(db_path)) as conn:
+        assert conn.execute("SELECT versao FROM schema_migrations").fetchall() == [
+            (v,) for v in versoes
+        ]
+
+
+def test_backfill_em_lotes_retoma_apos_falha(tmp_path):
+    db_path = _banco_com_produtos(tmp_path, 25)
+    nova = Migracao(
+        99,
+        "valor em estoque",
+        [
+            "ALTER TABLE produtos ADD COLUMN valor_estoque REAL",
+            Backfill("produtos", "valor_estoque = preco * quantidade_atual", lote=10),
+            "CREATE INDEX idx_produtos_valor ON produtos(valor_estoque)",
+        ],
+    )
+
+    msgs: list[str] = []
+
+    def cai_no_segundo_lote(msg: str) -> None:
+        msgs.append(msg)
+        if "rowid 20/" in msg:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        migrar(db_path, [*MIGRACOES, nova], progresso=cai_no_segundo_lote)
+
+    with closing(sqlite3.connect(db_path)) as conn:
+        preenchidos = conn.execute(
+            "SELECT COUNT(*) FROM produtos WHERE valor_estoque IS NOT NULL"
+        ).fetchone()[0]
+        assert preenchidos == 20
+        assert conn.execute(
+            "SELECT ultimo_id FROM schema_migrations_progresso WHERE versao=99 AND passo=1"
+        ).fetchone() == (20,)
+
+    msgs.clear()
+    assert migrar(db_path, [*MIGRACOES, nova], progresso=msgs.append) == [99]
+    # O ALTER TABLE (passo 0) não é repetido; o backfill continua do rowid 20.
+    assert not any("até rowid 10/" in m for m in msgs)
+    assert any("até rowid 25/25" in m for m in msgs)
+
+    with closing(sqlite3.connect(db_path)) as conn:
+        assert conn.execute(
+            "SELECT COUNT(*) FROM produtos WHERE valor_estoque = preco * quantidade_atual"
+        ).fetchone() == (25,)
+        assert conn.execute(
+            "SELECT COUNT(*) FROM schema_migrations_progresso"
+        ).fetchone() == (0,)
+
+
+def test_migradores_concorrentes_nao_repetem_passos(tmp_path):
+    db_path = _banco_com_produtos(tmp_path, 5)
+    nova = Migracao(
+        99,
+        "coluna nova",
+        [
+            "ALTER TABLE produtos ADD COLUMN marca TEXT",
+            Backfill("produtos", "marca = 'x'", lote=2),
+        ],
+    )
+
+    def outro_migrador_no_meio(msg: str) -> None:
+        # Simula outro processo aplicando a mesma migração depois que este já
+        # leu as versões pendentes, mas antes de executar os passos.
+        if msg.startswith("aplicando migração v99"):
+            assert migrar(db_path, [*MIGRACOES, nova]) == [99]
+
+    # Quem aplicou foi o outro: este não a relata como sua.
+    assert migrar(db_path, [*MIGRACOES, nova], progresso=outro_migrador_no_meio) == []
+    with closing(sqlite3.connect(db_path)) as conn:
+        assert conn.execute("SELECT versao FROM schema_migrations").fetchall() == [
+            *((m.versao,) for m in MIGRACOES),
+            (99,),
+        ]
+        assert conn.execute(
+            "SELECT COUNT(*) FROM produtos WHERE marca = 'x'"
+        ).fetchone() == (5,)
+
+
+def test_backfill_aplicado_por_outro_migrador_nao_recomeca(tmp_path):
+    db_path = _banco_com_produtos(tmp_path, 5)
+    nova = Migracao(99, "só backfill", [Backfill("produtos", "preco = 3.0", lote=2)])
+
+    msgs: list[str] = []
+
+    def outro_migrador_no_meio(msg: str) -> None:
+        msgs.append(msg)
+        if msg.startswith("aplicando migração v99"):
+            assert migrar(db_path, [*MIGRACOES, nova]) == [99]
+
+    assert migrar(db_path, [*MIGRACOES, nova], progresso=outro_migrador_no_meio) == []
+    assert not any("passo 0" in m for m in msgs)
+    with closing(sqlite3.connect(db_path)) as conn:
+        assert conn.execute(
+            "SELECT COUNT(*) FROM schema_migrations_progresso"
+        ).fetchone() == (0,)
+
+
+def test_status_nao_escreve_no_banco(tmp_path, monkeypatch, capsys):
+    import migrations
+
+    db_path = tmp_path / "novo.db"
+    monkeypatch.setattr("sys.argv", ["migrations.py", "--db", str(db_path), "--status"])
+    migrations.main()
+    assert "[ ] v1" in capsys.readouterr().out
+    with closing(sqlite3.connect(db_path)) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone() == (0,)
@@ -0,0 +1,55 @@
+import logging
+
+import db
+from app import create_app
+
+
+def test_slow_query_log_com_plano(tmp_path, monkeypatch, caplog):
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "app.db"))
+    monkeypatch.setenv("SLOW_QUERY_MS", "0")
+    monkeypatch.setattr(db, "slow_query_ms", None)
+
+    client = create_app().test_client()
+    with caplog.at_level(logging.WARNING, logger="estoque.sql"):
+        client.get("/produtos?categoria=Papelaria")
+
+    msgs = [r.getMessage() for r in caplog.records if r.name == "estoque.sql"]
+    lenta = next(m for m in msgs if "FROM produtos WHERE categoria = ?" in m)
+    assert "params=(str)" in lenta
+    assert "Papelaria" not in lenta
+    assert "plano: SCAN produtos" in lenta
+
+
+def test_perfil_por_requisicao(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "app.db"))
+    monkeypatch.setenv("PROFILING_ENABLED", "1")
+    monkeypatch.setattr(db, "slow_query_ms", None)
+
+    client = create_app().test_client()
+    client.post("/produtos/novo", data={"nome": "Caderno", "sku": "CAD-01"})
+
+    sem = client.get("/produtos/1")
+    assert "Server-Timing" not in sem.headers
+
+    res = client.get("/produtos/1", headers={"X-Profile": "1"})
+    timing = res.headers["Server-Timing"]
+    assert 'desc="3 consultas"' in timing
+    assert "render;dur=" in timing
+    assert "python;dur=" in timing
+
+    assert "Server-Timing" in client.get("/produtos?_profile=1").headers
+
+
+def test_perfil_exige_debug_ou_flag(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "app.db"))
+    monkeypatch.delenv("PROFILING_ENABLED", raising=False)
+
+    client = create_app().test_client()
+    res = client.get("/produtos", headers={"X-Profile": "1"})
+    assert "Server-Timing" not in res.headers
+
+    # Debug ligado depois do create_app (app.run(debug=True)) vale na hora.
+    app = create_app()
+    app.debug = True
+    res = app.test_client().get("/produtos", headers={"X-Profile": "1"})
+    assert "Server-Timing" in res.headers
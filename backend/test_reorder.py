@@ -0,0 +1,55 @@
+import csv
+import io
+import sqlite3
+from contextlib import closing
+
+from app import create_app
+from rollup import atualizar_diarias
+
+
+def test_reposicao_por_consumo_e_csv_por_fornecedor(tmp_path, monkeypatch):
+    db_path = tmp_path / "app.db"
+    monkeypatch.setenv("DB_PATH", str(db_path))
+    client = create_app().test_client()
+    for sku, fornecedor in (("A", "F2"), ("B", "F2"), ("C", "F1")):
+        client.post(
+            "/produtos/novo", data={"nome": sku, "sku": sku, "fornecedor": fornecedor}
+        )
+
+    # A: 2 por dia, constante. B: mesmo consumo, mas estoque alto. C: um pico
+    # de 10 num único dia (média 1, desvio 3).
+    movs = []
+    for dia in range(1, 11):
+        movs += [(1, 2, f"2025-03-{dia:02d} 10:00:00"), (2, 2, f"2025-03-{dia:02d}")]
+    movs.append((3, 10, "2025-03-05 10:00:00"))
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.executemany(
+            "INSERT INTO movimentacoes(produto_id, tipo, quantidade, criado_em) "
+            "VALUES(?, 'saida', ?, ?)",
+            movs,
+        )
+        conn.execute("UPDATE produtos SET quantidade_atual=5 WHERE id=1")
+        conn.execute("UPDATE produtos SET quantidade_atual=1000 WHERE id=2")
+        conn.commit()
+        # Inserções por fora: põe os totais diários em dia (`python rollup.py`).
+        atualizar_diarias(conn)
+
+    params = "dias=10&ate=2025-03-10&prazo=7&revisao=14&nivel=0.95"
+    itens = client.get(f"/api/v1/reposicao?{params}").json["itens"]
+    assert [(i["fornecedor"], i["sku"]) for i in itens] == [("F1", "C"), ("F2", "A")]
+    c, a = itens
+    assert (a["consumo_medio_diario"], a["desvio_diario"]) == (2.0, 0.0)
+    assert (a["ponto_pedido"], a["sugerido"]) == (14, 37)  # 2·21 − 5
+    assert (c["consumo_medio_diario"], c["desvio_diario"]) == (1.0, 3.0)
+    assert (c["estoque_seguranca"], c["ponto_pedido"], c["sugerido"]) == (14, 21, 35)
+
+    so_f2 = client.get(f"/api/v1/reposicao?{params}&fornecedor=F2").json
+    assert [i["sku"] for i in so_f2["itens"]] == ["A"]
+
+    res = client.get(f"/csv/export/reposicao.csv?{params}")
+    linhas = list(csv.DictReader(io.StringIO(res.data.decode())))
+    assert [(r["fornecedor"], r["sku"], r["sugerido"]) for r in linhas] == [
+        ("F1", "C", "35"),
+        ("F2", "A", "37"),
+    ]
+    assert client.get("/api/v1/reposicao?nivel=2").status_code == 400